@@ -16,10 +16,10 @@ class OPLProg:
     
     def Process(self, entity): 
         # If this person doesn't already have the 'natHist' list created, create it for them
-        if getattr(entity, "natHist", 0) == 0:                     
+        if entity.natHist is None:                     
              entity.natHist = []
              
-        if hasattr(entity, 'age') == 0:
+        if entity.age is None:
             entity.age = entity.startAge
 
         t_OPL_NED = self._estimates.NatHist_timeOPL_NED.sample()
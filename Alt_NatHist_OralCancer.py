@@ -42,12 +42,16 @@ class NatHistOCa:
     def __init__(self, estimates, regcoeffs):
         self._estimates = estimates
         self._regcoeffs = regcoeffs
-        
+        self.Sample()
+
+    def Sample(self):
+        # Sample the model time horizon
+        estimates = self._estimates
         self.timehorizon = 365*estimates.timehorizon.sample()
     
     def Process(self, entity, natHist):   
         
-        if getattr(entity, "natHist", 0) == 0:                     # If this person doesn't already have the 'natHist' field created, create it for them
+        if entity.natHist is None:                     # If this person doesn't already have the 'natHist' field created, create it for them
             entity.natHist = []
         
         from NatHist_DevOPL import DevOPL                     # Assign OPL status based on age/sex prevalence
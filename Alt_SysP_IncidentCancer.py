@@ -5,17 +5,20 @@ of incoming incident cancers, does a diagnostic workup, and then directs them to
 
 @author: icromwell
 """
-from copy import deepcopy
-import math
 
 class IncidentCancerScen:
     def __init__(self, estimates, regcoeffs, alt_estimates):
         self._estimates = estimates
-        self._regcoeffs = deepcopy(regcoeffs)
-        self.int_adj = alt_estimates.RR_HPVsurv.sample()
+        self._regcoeffs = regcoeffs
+        self._alt_estimates = alt_estimates
+        self.Sample()
+
+    def Sample(self):
+        # Sample the survival adjustment for HPV-positive cancers
+        self.int_adj = self._alt_estimates.RR_HPVsurv.sample()
 
     def Process(self, entity):       
-        if getattr(entity, "sympt", 0) == 1:                        # People who present through symptoms have to get a biopsy before their workup
+        if entity.sympt == 1:                        # People who present through symptoms have to get a biopsy before their workup
             entity.resources.append(("Biopsy", entity.allTime))              # Add biopsy into resources list
             entity.sympt = 9                                            # Set symptomatic flag to placeholder value
     
@@ -23,12 +26,14 @@ class IncidentCancerScen:
         entity.resources.append(("Diagnostic Workup", entity.allTime))
         
         if entity.OPLHPV != 'HPV':
-            # Entities with a cancer that is unrelated to HPV have longer survival 
-            self._regcoeffs['FirstEvent']['Intercept']['mean'] -= self.int_adj
-            self._regcoeffs['FirstEvent_death']['Intercept']['mean'] -= self.int_adj
+            # Entities with a cancer that is unrelated to HPV have longer survival. The adjustment
+            # to the intercept of the survival regressions is passed to the treatment processes.
+            int_adj = self.int_adj
+        else:
+            int_adj = 0
 
         # Determine treatment eligibility for first cancers
-        if hasattr(entity, 'tx_prim') == False: 
+        if entity.tx_prim is None: 
             from Glb_CancerFlags import CancerFlags
             cancerflags = CancerFlags(entity, self._estimates)
             cancerflags.Process(entity)                         # Apply some disease and treatment flags 
@@ -48,21 +53,21 @@ class IncidentCancerScen:
         elif entity.cancerStage == 'I':
             entity.firstcancer = 'I'
             from SysP_StageOneTx import StageOneTx
-            stageonetx = StageOneTx(self._estimates, self._regcoeffs)
+            stageonetx = StageOneTx(self._estimates, self._regcoeffs, int_adj)
             stageonetx.Process(entity)
             
         # Stage II
         elif entity.cancerStage == 'II':
             entity.firstcancer = 'II'
             from SysP_StageTwoTx import StageTwoTx
-            stagetwotx = StageTwoTx(self._estimates, self._regcoeffs)
+            stagetwotx = StageTwoTx(self._estimates, self._regcoeffs, int_adj)
             stagetwotx.Process(entity)
                         
         # Advanced (III/IV)
         elif entity.cancerStage == 'Adv':
             entity.firstcancer = 'Adv'
             from SysP_StageAdvTx import StageAdvTx
-            stageadvtx = StageAdvTx(self._estimates, self._regcoeffs)
+            stageadvtx = StageAdvTx(self._estimates, self._regcoeffs, int_adj)
             stageadvtx.Process(entity)
                       
         # Recurrence        
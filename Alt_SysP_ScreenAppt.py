@@ -17,14 +17,20 @@ They will proceed to the "OPL Management" stage at that point.
 
 """
 
-import random
+from Glb_RandomStreams import Uniform
 
 class ScreenApptScen:
     
     def __init__(self, estimates, regcoeffs, alt_estimates):
         self._estimates = estimates
         self._regcoeffs = regcoeffs
+        self._alt_estimates = alt_estimates
+        self.Sample()
         
+    def Sample(self):
+        # Sample the screening parameters, using the scenario's sensitivity and biopsy rate
+        estimates = self._estimates
+        alt_estimates = self._alt_estimates
         self.anyLesion = estimates.Screen_anylesion.sample()
         self.appInt = int(estimates.Screen_appint.sample())
         self.screenReturnInt = estimates.Screen_returnint.sample()
@@ -35,7 +41,7 @@ class ScreenApptScen:
         
     def Process(self, entity): 
         scenario = 0
-        if hasattr(entity, "count_DentAppt") == False:              # If this person doesn't already have the 'DentAppt' field created, create it for them
+        if entity.count_DentAppt is None:              # If this person doesn't already have the 'DentAppt' field created, create it for them
             entity.count_DentAppt = 0                               # Start the tally of appointments at zero
             entity.count_ScreenAppt = 0
             entity.count_ScreenInt = 0                              # Start a count for the screening interval
@@ -43,7 +49,7 @@ class ScreenApptScen:
             entity.screened = 1
             entity.tottime_OPLfu = 0.0
             
-        if hasattr(entity, "flsPosCount") == False:
+        if entity.flsPosCount is None:
             entity.flsNegCount = 0
             entity.flsPosCount = 0
 
@@ -90,7 +96,7 @@ class ScreenApptScen:
             
             elif entity.OPLStatus == 1:
                 if entity.screenReturn == 0:
-                    detectDisease = random.random()
+                    detectDisease = Uniform()
                     scenario = 1
                     if detectDisease < self.detectOPL:
                         # An additional screening cost may be incurred
@@ -133,12 +139,12 @@ class ScreenApptScen:
                         
             else:
                 if entity.screenReturn == 0: # Regular appointment
-                    hasLesion = random.random() # A non-premalignant lesion may be present
+                    hasLesion = Uniform() # A non-premalignant lesion may be present
                     if hasLesion < self.anyLesion:
                         # Non-premalignant lesion may be recommended to return
                         # An additional screening cost may be incurred
                         entity.resources.append(("Cancer Screening", entity.allTime))
-                        willReturn = random.random()
+                        willReturn = Uniform()
                         if willReturn < self.willReturn:
                             entity.screenReturn = 1
                             entity.time_Sysp += self.screenReturnInt
@@ -152,7 +158,7 @@ class ScreenApptScen:
                 else:
                     entity.screenReturn = 0     # Entity is returning, screenReturn status is reset
                     # Has lesion resolved?
-                    lesionResolved = random.random()
+                    lesionResolved = Uniform()
                     if lesionResolved < self.lesionResolves: # Lesion persists
                         scenario = 1
                         # An additional screening cost may be incurred
@@ -160,7 +166,7 @@ class ScreenApptScen:
                         # Refer to specialist for further screening
                         entity.resources.append(("Specialist Appointment", entity.allTime))                    
     
-                        biopsyLesion = random.random()
+                        biopsyLesion = Uniform()
                         if biopsyLesion < self.needsBiopsy: # non-OPL is suspicious
                             entity.flsPosCount += 1
                             # Add biopsy into resources list
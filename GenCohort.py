@@ -10,83 +10,16 @@ from openpyxl import load_workbook                  # Load the import function
 import numpy
 from collections import Counter
 
-# Import Parameter Estimates from the table"
+# Import Parameter Estimates, Regression Coefficients and Costs from the tables"
+# The workbook is only read when it has changed since the last run; otherwise the checked
+# bundle of inputs saved by the last run is loaded (see 'Glb_InputBundle.py')
 
-from Glb_Estimates import Estimates
-from Glb_Estimates import Estimate
+from Glb_InputBundle import LoadInputs
 
-inbook = load_workbook('Chap6_InputParameters.xlsx')
-sheet = inbook["Inputs"]
-estimates = Estimates()
-
-for line in sheet.rows:
-    if not line[0].value:
-        # There's no estimate name in this row.
-        continue
-    setattr(estimates, line[0].value, Estimate(line[1].value, line[2].value, line[3].value))
-
-del(estimates.Parameter)
-
-with open('estimates.pickle', 'wb') as inputs:
-    pickle.dump(estimates, inputs, pickle.HIGHEST_PROTOCOL)
-    
-# Import Regression Coefficients from the table
-
-regsheet = inbook["RegCoeffs"]
-source = []                                           # A list to hold data
-
-"Convert the openpyxl object into a useable form"
-
-for row in list(regsheet.rows)[1:]:
-    args = [cell.value for cell in row]
-    source.append(args)
-    
-for row in range(len(source)):
-    source[row][0] = str(source[row][0])
-    source[row][1] = str(source[row][1])
-
-"Create a multi-level dictionary to hold each parameter from the regression model:"
-    
-config = {}         # creates the blank dictionary
-for param, factor, vartype, level, mean, SE in source:
-    SE = SE if SE else 0    # If SE is blank, enter zero
-    vartype = vartype if vartype else 0
-    mean = mean if mean not in ("ref", None) else 0     # Reference category = 0
-    if param not in config:
-        config[param] = {}
-    
-    if level:
-        if factor not in config[param]:
-            config[param][factor] = {"vartype": vartype}
-        config[param][factor][level] = {"mean": mean, "SE": SE}
-    else:
-        config[param][factor] = {"vartype": vartype, "mean": mean, "SE": SE}
-
-with open('regcoeffs.pickle', 'wb') as regcoeffs:
-    pickle.dump(config, regcoeffs, pickle.HIGHEST_PROTOCOL)
-
-# Import cost estimates from the table
-
-costsheet = inbook["Costs"]
-cost_estimates = Estimates()
-for line in costsheet.rows:
-    if not line[0].value:
-        # There's no estimate name in this row.
-        continue
-    setattr(cost_estimates, line[0].value, Estimate(line[1].value, line[2].value, line[3].value))
-del(cost_estimates.Parameter)
-
-# Create a dictionary of unit costs that the program will read from
-CostDict = {}
-
-for i in range(0, costsheet.max_row):
-    cost_name = str(costsheet.cell(row = i+1, column = 1).value)
-    cost_type = costsheet.cell(row = i+1, column = 2).value
-    cost_mean = costsheet.cell(row = i+1, column = 3).value
-    cost_se = costsheet.cell(row = i+1, column = 4).value
-    CostDict[cost_name] = (cost_type, cost_mean, cost_se)
-del(CostDict['Parameter'])
-#del(CostDict['None'])
+inputs = LoadInputs('Chap6_InputParameters.xlsx', None, 'Chap6_InputBundle.pickle')
+estimates = inputs['estimates']
+regcoeffs = inputs['regcoeffs']
+CostDict = inputs['CostDict']
 
 # A program to produce mean estimates of Cost, LYG, and QALY
 from Glb_AnalyzeOutput import Analyze_Output
@@ -95,7 +28,7 @@ from Glb_AnalyzeOutput import Analyze_Output
 def genVarList(entityrecord, var):
         retvar = []
         for i in range(0, len(entityrecord)):
-            if hasattr(entityrecord[i], var) == True:
+            if getattr(entityrecord[i], var, None) is not None:
                 retvar.append(getattr(entityrecord[i], var))
         return retvar
         
@@ -121,11 +54,6 @@ def CostEst(unit, costdict):
 
 #############################################################################################
 
-with open('estimates.pickle', 'rb') as f:
-    estimates = pickle.load(f)
-
-with open('regcoeffs.pickle', 'rb') as f:
-    regcoeffs = pickle.load(f)
 
 # Load SA values from Excel sheet
 
@@ -11,11 +11,7 @@ list of discounted costs
 ############################################################################################
 # Load some necessary packages and functions
 
-from openpyxl import load_workbook                  # Load the import function
 import numpy
-import math
-import random
-import simpy
 
 "Import values from the table"
 
@@ -40,11 +36,213 @@ for line in costsheet.rows:
 # Load in the resource utilization list from the model run
 from Glb_Estimates import Estimates
 from Glb_Estimates import Estimate
+from Glb_EntityLog import Resources
+
+def DailyDiscount(estimates):
+    """The daily discount rate that is equivalent to the annual rate 'DiscountRate'"""
+    return DailyRate(estimates.DiscountRate.mean)
+
+def DailyRate(discountrate):
+    """The daily discount rate used for an annual discount rate of 'discountrate'"""
+    return 1 - (1 - discountrate)**(1 / 365)
+
+def DiscountedYears(start, stop, disc_rate):
+    """The sum of (1/365)*(1+disc_rate)^(-day) for day = start, ..., stop-1 (zero if stop <= start)"""
+    # Each day is discounted as a term of a geometric series, so the sum over any run of days
+    #   has a closed form
+    start = numpy.asarray(start, dtype=float)
+    stop = numpy.maximum(numpy.asarray(stop, dtype=float), start)
+    if disc_rate == 0:
+        return (stop - start)/365
+    v = 1/(1 + disc_rate)
+    return (v**start - v**stop)/((1 - v)*365)
+
+def SurvivalKernel(ent, time, value, size, disc_rate):
+    """LYG and QALY for each of 'size' entities from their utility logs, calculated the same way
+    as 'Analyze_Output.EntitySurvival'. 'ent', 'time' and 'value' hold one row per utility
+    log entry: the entity's number (0 to size-1), the time and the utility value. The rows of
+    each entity must be in the order they were logged."""
+    ent = numpy.asarray(ent, dtype=numpy.int64)
+    day = numpy.rint(time).astype(numpy.int64)
+    value = numpy.asarray(value, dtype=float)
+    order = numpy.argsort(ent, kind='stable')
+    ent, day, value = ent[order], day[order], value[order]
+
+    # It's possible for an entity to live less than a day. A row at day 1 with zero
+    #   utility is added so the math doesn't crap out on us
+    counts = numpy.bincount(ent, minlength=size)
+    ends = numpy.cumsum(counts)[counts > 0] - 1
+    closing = ent[ends][day[ends] == 0]
+    ent = numpy.concatenate((ent, closing))
+    day = numpy.concatenate((day, numpy.ones(len(closing), dtype=numpy.int64)))
+    value = numpy.concatenate((value, numpy.zeros(len(closing))))
+    order = numpy.argsort(ent, kind='stable')
+    ent, day, value = ent[order], day[order], value[order]
+    counts = numpy.bincount(ent, minlength=size)
+    starts = numpy.cumsum(counts) - counts
+    pos = numpy.arange(len(ent)) - starts[ent]
+
+    # If entity has multiple utility values at t0, use only the last one
+    later = (pos >= 1) & (day != 0)
+    first_later = numpy.full(size, numpy.iinfo(numpy.int64).max)
+    numpy.minimum.at(first_later, ent[later], pos[later])
+    lead = first_later[ent] - 1
+
+    # Of the rows with the same day in a row, only the first one is kept
+    repeat = numpy.zeros(len(ent), dtype=bool)
+    repeat[1:] = (day[1:] == day[:-1]) & (ent[1:] == ent[:-1])
+    keep = (pos == lead) | ((pos > lead) & ~repeat)
+    ent, day, value = ent[keep], day[keep], value[keep]
+    counts = numpy.bincount(ent, minlength=size)
+    first = numpy.cumsum(counts) - counts
+    last = first + counts - 1
+
+    # Each day and quality-adjusted day is discounted at a daily rate. Only the first
+    #   and last utility values are read (the same rows that 'EntitySurvival' reads)
+    years_first = DiscountedYears(0, day[first + 1], disc_rate)
+    years_last = DiscountedYears(day[first + 1], day[last], disc_rate)
+    LYG = years_first + years_last
+    QALY = value[first]*years_first + value[last - 1]*years_last
+    return LYG, QALY
+
+# The utility parameter used for each health state in the entities' utility logs (the states
+#   and parameters used by the model processes). Dead entities have a utility of zero.
+UTILITY_STATES = {'Well': 'Util_Well',
+                  'No disease': 'Util_Well',
+                  'Undetected OPL': 'Util_OPL_Undetected',
+                  'Detected OPL': 'Util_OPL_Detected',
+                  'Undetected Stage I': 'Util_StageI_Undetected',
+                  'Undetected Stage II': 'Util_StageII_Undetected',
+                  'Undetected Stage III': 'Util_StageIII_Undetected',
+                  'Undetected Stage IV': 'Util_StageIV_Undetected',
+                  'Stage I Cancer Under Treatment': 'Util_StageI_Tx',
+                  'Stage II Cancer Under Treatment': 'Util_StageI_Tx',
+                  'Advanced Cancer Under Treatment': 'Util_StageI_Tx',
+                  'Followup for Stage I cancer': 'Util_StageI_FU',
+                  'Followup for Stage II cancer': 'Util_StageII_FU',
+                  'Followup for Advanced cancer': 'Util_Advanced_FU',
+                  'Followup for Recurring cancer': 'Util_Recur_FU',
+                  'Cancer in remission': 'Util_Remission',
+                  'Recurrence Under Treatment': 'Util_Recur_Tx',
+                  'Recurring Cancer In Remission': 'Util_Recur_FU',
+                  'Second Recurrence Under Treatment': 'Util_2Recur_Tx',
+                  'Incurable disease': 'Util_Incurable',
+                  'End of life': 'Util_EOL',
+                  'Dead': None}
+
+def ExpectedValue(estimate):
+    """The mean of the distribution of a utility 'Estimate'"""
+    if estimate.type == 8:
+        # Beta distribution with direct parameters
+        return estimate.mean/(estimate.mean + estimate.se)
+    return estimate.mean
+
+class UtilityTable:
+    """The utility of each health state, from the utility parameters in 'estimates' (the Inputs
+    sheet, or one PSA draw of it; see 'Glb_PSA.DrawEstimates'). 'names' gives the health state
+    of each code (e.g., 'Glb_EntityLog.Utilities.names')."""
+    def __init__(self, estimates, names):
+        self.names = list(names)
+        self.estimates = []                 # None - the state has a utility of zero
+        self.missing = set()                # Codes of the states that have no utility parameter
+        for code, name in enumerate(self.names):
+            param = UTILITY_STATES.get(name, name)
+            if param is not None and not hasattr(estimates, param):
+                self.missing.add(code)
+                param = None
+            self.estimates.append(None if param is None else getattr(estimates, param))
+
+    def Values(self, codes, sample=True):
+        """A utility value for each health state in 'codes'. Each value is drawn from the state's
+        parameter (or, with 'sample = False', set to its mean)."""
+        codes = numpy.asarray(codes, dtype=numpy.int64)
+        values = numpy.zeros(len(codes))
+        for code in numpy.unique(codes).tolist():
+            if code in self.missing:
+                raise KeyError(self.names[code])
+            estimate = self.estimates[code]
+            if estimate is None:
+                continue
+            rows = codes == code
+            values[rows] = estimate.sample(rows.sum()) if sample else ExpectedValue(estimate)
+        return values
+
+class CostTable:
+    """The unit costs in 'costdict', compiled into arrays with one entry for each resource code.
+    'names' gives the resource name of each code (e.g., 'Glb_EntityLog.Resources.names')."""
+    def __init__(self, costdict, names):
+        self.names = list(names)
+        n = len(self.names)
+        self.type = numpy.zeros(n, dtype=numpy.int64)       # 0 - the resource is not in 'costdict'
+        self.mean = numpy.zeros(n)
+        self.shape = numpy.ones(n)
+        self.scale = numpy.zeros(n)
+        for code, name in enumerate(self.names):
+            if name not in costdict:
+                continue
+            ctype, x, y = costdict[name]
+            self.type[code] = ctype if ctype in (1, 2) else -1
+            if ctype in (1, 2):
+                self.mean[code] = x
+            if ctype == 2:
+                # The gamma distribution's shape and scale, from the mean and sd
+                self.shape[code] = x**2/y**2
+                self.scale[code] = y**2/x
+        # Apply a discount rate for future costs
+        self.discount = costdict['Discount'][1]
+
+    def UnitCosts(self, codes, sample=True):
+        """A unit cost for each resource in 'codes'. Gamma-distributed costs are drawn together, in
+        the order the resources are listed (or, with 'sample = False', set to their mean)."""
+        codes = numpy.asarray(codes, dtype=numpy.int64)
+        types = self.type[codes]
+        if (types <= 0).any():
+            code = codes[types <= 0][0]
+            if self.type[code] == 0:
+                raise KeyError(self.names[code])
+            print("Please specify a variable TypeNo for", self.names[code], "in the parameter table")
+        unitcost = numpy.where(types > 0, self.mean[codes], numpy.nan)
+        gamma = types == 2
+        if sample and gamma.any():
+            unitcost[gamma] = numpy.random.gamma(self.shape[codes[gamma]], self.scale[codes[gamma]])
+        return unitcost
+
+    def Discounts(self, times):
+        """The discount factor for a resource used at each of 'times' (in days)"""
+        year = numpy.asarray(times, dtype=float)/365
+        return 1 / (1 + self.discount)**year
+
+def CostKernel(ent, code, time, deathage, size, table, sample=True):
+    """Discounted costs for each of 'size' entities from their resource logs, calculated the same
+    way as 'Analyze_Output.EntityCost'. 'ent', 'code' and 'time' hold one row per resource used:
+    the entity's number (0 to size-1), the resource code (see 'CostTable') and the time. The rows
+    of each entity must be in the order they were logged. 'deathage' is each entity's
+    'natHist_deathAge'. 'sample' is passed to 'CostTable.UnitCosts'."""
+    ent = numpy.asarray(ent, dtype=numpy.int64)
+    order = numpy.argsort(ent, kind='stable')
+    ent, code, time = ent[order], numpy.asarray(code)[order], numpy.asarray(time, dtype=float)[order]
+
+    # The last resource is removed if it occurs after the entity's death
+    counts = numpy.bincount(ent, minlength=size)
+    ends = numpy.cumsum(counts)[counts > 0] - 1
+    keep = numpy.ones(len(ent), dtype=bool)
+    keep[ends[time[ends] > numpy.asarray(deathage, dtype=float)[ent[ends]]]] = False
+    ent, code, time = ent[keep], code[keep], time[keep]
+
+    cost = table.UnitCosts(code, sample)*table.Discounts(time)
+    return numpy.bincount(ent, weights=cost, minlength=size)
 
 class Analyze_Output:
     def __init__(self, estimates, costdict):
         self._estimates = estimates
         self._CostDict = costdict
+        self._table = None
+
+    def Table(self):
+        """The unit costs compiled for the resource codes used so far (see 'CostTable')"""
+        if self._table is None or len(self._table.names) < len(Resources):
+            self._table = CostTable(self._CostDict, Resources.names)
+        return self._table
 
     def CostEst(self, unit):
         """A function to estimate the unit cost from a mean and standard error"""
@@ -76,19 +274,25 @@ class Analyze_Output:
         else: 
             if resourcelist[maxlen][1] > entity.natHist_deathAge:
                 del(resourcelist[maxlen])
-        costList = []
-        for j in range(0, len(resourcelist)):
-            if resourcelist == []:   # If no costs have been generated
-                costlist.append(0)
-            else:
-                for i in range((len(resourcelist[j])-1)):
-                    unit = resourcelist[j][i]
-                    # Years elapsed for the discounting function
-                    year = float(resourcelist[j][1]/365)     
-                    # Apply a discount rate for future costs
-                    discRate_cost = 1 / (1 + self._CostDict['Discount'][1])**year              
-                    costList.append(self.CostEst(unit)*discRate_cost)
-        return sum(costList)
+        if len(resourcelist) == 0:   # If no costs have been generated
+            return 0
+        # Each resource's unit cost is looked up by its code, and gamma-distributed costs are drawn
+        #   together, in the same order as one at a time (see 'CostTable')
+        table = self.Table()
+        costList = table.UnitCosts(resourcelist.Codes())*table.Discounts(resourcelist.Times())
+        return sum(costList.tolist())
+    
+    def CohortCost(self, entities):
+        """Discounted costs for each entity in a list, as an array (see 'CostKernel'). Unlike
+        'EntityCost', the entities' resource logs are not changed."""
+        codes = [entity.resources.Codes() for entity in entities]
+        times = [entity.resources.Times() for entity in entities]
+        if not entities:
+            return numpy.zeros(0)
+        ent = numpy.repeat(numpy.arange(len(entities)), [len(x) for x in codes])
+        deathage = [entity.natHist_deathAge for entity in entities]
+        return CostKernel(ent, numpy.concatenate(codes), numpy.concatenate(times), deathage,
+                          len(entities), self.Table())
     
     def EntitySurvival(self, entity):
         """A function to calculate LYG and QALY for each entity"""
@@ -103,7 +307,6 @@ class Analyze_Output:
             ent_util.append([1,0])
         while ent_util[1][0] == 0:
             del(ent_util[0])
-        testset = []
         
         # This is a kludge to remove circumstances where an entity has multiple utility values
         #   as they persist in a single state. This finds duplicate sequential utility states
@@ -111,31 +314,29 @@ class Analyze_Output:
         #   the first one. This is more consistent with how probabilistic sampling is supposed
         #   to work in modeling theory. The 'better' way to do this is to fix the way "estimates"
         #   does probabilistic sampling, but it will work for now.
-        for i in range(1,len(ent_util)):
-            if ent_util[i][0] == ent_util[i-1][0]:
-                ent_util[i] = 'Delete'
-        while 'Delete' in ent_util:
-            ent_util.remove('Delete')
-            for i in range(1,len(ent_util)):
-                if ent_util[i][0] == ent_util[i-1][0]:
-                    ent_util[i] = 'Delete'
+        ent_util = [ent_util[0]] + [ent_util[i] for i in range(1, len(ent_util)) if ent_util[i][0] != ent_util[i-1][0]]
 
         # Define the daily discount rate
-        discountrate = self._estimates.DiscountRate.mean
-        disc_rate = 1 - (1 - discountrate)**(1 / 365)
+        disc_rate = DailyDiscount(self._estimates)
         
-        day = 0
-        LYG = 0
-        QALY = 0
-        # For each row in the survival/utility list 'ent_util'
-        for h in (1,len(ent_util)-1):
-            # The utility value is read from the second column
-            Util = ent_util[h-1][1]
-            # Each day and quality-adjusted day is discounted at a daily rate
-            while day < ent_util[h][0]:
-                LYG += (1/365)*(1+disc_rate)**(-day)
-                QALY += (Util/365)*(1+disc_rate)**(-day)
-                day +=1
+        # Each day and quality-adjusted day is discounted at a daily rate. The days in each row of
+        #   the survival/utility list 'ent_util' are added up in one step (see 'DiscountedYears').
+        #   Only the rows h = 1 and h = len(ent_util)-1 are read, as they always have been.
+        years_first = float(DiscountedYears(0, ent_util[1][0], disc_rate))
+        years_last = float(DiscountedYears(ent_util[1][0], ent_util[-1][0], disc_rate))
+        LYG = years_first + years_last
+        QALY = ent_util[0][1]*years_first + ent_util[-2][1]*years_last
         
         return [LYG, QALY]
 
+    def CohortSurvival(self, entities):
+        """LYG and QALY for each entity in a list, as two arrays (see 'SurvivalKernel')"""
+        times = [entity.utility.Times() for entity in entities]
+        values = [entity.utility.Values() for entity in entities]
+        counts = [len(x) for x in times]
+        if not entities:
+            return numpy.zeros(0), numpy.zeros(0)
+        ent = numpy.repeat(numpy.arange(len(entities)), counts)
+        return SurvivalKernel(ent, numpy.concatenate(times), numpy.concatenate(values),
+                              len(entities), DailyDiscount(self._estimates))
+
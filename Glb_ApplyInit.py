@@ -5,23 +5,23 @@ Apply initial demographic characteristics to a newly-created entity
 
 ############################################################################################
 # Load some necessary packages and functions
-import random
-import pickle
-import numpy
+from Glb_RandomStreams import Uniform
 
-############################################################################################
+from Glb_LifeTable import LoadLifeTable
 
-"Assign a date of natural death"
-with open('deathm.pickle', 'rb') as f:  # Load previously-created arrays
-    deathage_M = pickle.load(f)
-with open('deathf.pickle', 'rb') as f:
-    deathage_F = pickle.load(f)
+############################################################################################
 
 class ApplyInit:
     def __init__(self, estimates):
     
         self._estimates = estimates
-        
+        # The life tables, from the bundle of model inputs (see 'Glb_LifeTable.py')
+        self._lifetable = LoadLifeTable()
+        self.Sample()
+
+    def Sample(self):
+        # Sample the prevalence of risk factors and dental access
+        estimates = self._estimates
         self.alcprevM = estimates.Prev_alcohol_M.sample()
         self.alcprevF = estimates.Prev_alcohol_F.sample()
         self.smokeprevM = estimates.Prev_smoking_M.sample()
@@ -39,7 +39,7 @@ class ApplyInit:
         entity.startAge = self._estimates.Prev_startage.sample()
         
         # Sex: 1 = female, 0 = male
-        makeSex = random.random()
+        makeSex = Uniform()
         if makeSex < 0.5:
             entity.sex = 'F'
         else:
@@ -47,8 +47,8 @@ class ApplyInit:
         
         # Smoking status: 1 = ever smoker, 0 = never smoker
         # Alcohol use: 1 = heavy user, 0 = not heavy user
-        makeSmoker = random.random()
-        makeAlc = random.random()
+        makeSmoker = Uniform()
+        makeAlc = Uniform()
         
         if entity.sex == 'M':
             if makeSmoker < self.smokeprevM:
@@ -73,7 +73,7 @@ class ApplyInit:
                 entity.alcStatus = 'Nonheavy'
             
         "Access to a dentist: 1 = yes, 0 = no"
-        makeDentist = random.random()
+        makeDentist = Uniform()
         if makeDentist < self.dentprev*self.compliance:
             entity.hasDentist = 1
         else:
@@ -89,12 +89,11 @@ class ApplyInit:
         entity.cancerDetected = 0
         entity.utility.append(("Well", self._estimates.Util_Well.sample(), 0.0))
         
-        if entity.sex == 'F':  
-            nh_deathage = numpy.random.choice(deathage_F) + random.random()         # Sample an age at death from natural causes
-        elif entity.sex == 'M':
-            nh_deathage = numpy.random.choice(deathage_M) + random.random()
+        "Assign a date of natural death"
+        # Sample an age at death from natural causes, given that the entity has lived to its starting age
+        nh_deathage = self._lifetable.DeathAge(entity.sex, entity.startAge, Uniform())
         nh_deathspan = nh_deathage - entity.startAge                     # Calculate the amount of time remaining before entity creation and death
-        entity.natHist_deathAge = abs(nh_deathspan)*365        # Convert years to days
+        entity.natHist_deathAge = nh_deathspan*365             # Convert years to days
 
         "Assign OPL status based on age- and sex-adjusted prevalence estimates"
 
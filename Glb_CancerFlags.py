@@ -16,7 +16,8 @@ through screening.
 
 """
 
-import random
+from Glb_RandomStreams import Uniform
+from Glb_Estimates import DirichletCategory
 
 class CancerFlags:
     def __init__(self, entity, estimates):
@@ -25,7 +26,7 @@ class CancerFlags:
        
         # Treatment Eligibility Flags
         
-        self.Txprob = random.random()
+        self.Txprob = Uniform()
         self.SCC = estimates.OPLfu_SCC.sample()
         
         # Treatment Type Flags
@@ -37,38 +38,31 @@ class CancerFlags:
     def Process(self, entity):
         entity.time_Cancer = entity.allTime
         
-        from Glb_Estimates import diriSample
-        # A 'names' vector for the dirichlet sampling process
-        Txprob_names = ["Tx_probSurgery", "Tx_probSurgeryRT", "Tx_probOther"]
+        # Treatment types, in the order of the Dirichlet-distributed probabilities of each stage
+        Tx_names = ['Surgery', 'SurgeryRT', 'Other']
         
         # ASSIGN TREATMENT TYPE
 
         # Stage I Cancer
         if entity.cancerStage == 'I':
-            if hasattr(entity, 'cancer_screenDetected') == True:
-                HGL = random.random()
+            if entity.cancer_screenDetected is not None:
+                HGL = Uniform()
                 if HGL > self.SCC:
                     entity.cancerStage = 'HGL'
                     entity.firstCancer = 'HGL'
 
-            # A 'values' vector for the dirichlet sampling process
-            Txprob_probs = [self._estimates.Tx_stageI_probSurgery.mean, 
-                            self._estimates.Tx_stageI_probSurgeryRT.mean, 
-                            self._estimates.Tx_stageI_probOther.mean]   
+            # The probabilities of each treatment type (see 'DIRICHLET_BLOCKS' in 'Glb_Estimates.py')
+            Txprob_block = 'Tx_stageI'
             
         # Stage II cancer
         elif entity.cancerStage == 'II':
-            # A 'values' vector for the dirichlet sampling process
-            Txprob_probs = [self._estimates.Tx_stageII_probSurgery.mean, 
-                            self._estimates.Tx_stageII_probSurgeryRT.mean, 
-                            self._estimates.Tx_stageII_probOther.mean]   
+            # The probabilities of each treatment type
+            Txprob_block = 'Tx_stageII'
         
         # Advanced (STAGE III/IV) cancer
         elif entity.cancerStage == 'Adv':
-            # A 'values' vector for the dirichlet sampling process
-            Txprob_probs = [self._estimates.Tx_adv_probSurgery.mean, 
-                            self._estimates.Tx_adv_probSurgeryRT.mean, 
-                            self._estimates.Tx_adv_probOther.mean]   
+            # The probabilities of each treatment type
+            Txprob_block = 'Tx_adv'
                                 
         # Every person with an HGL gets surgery        
         if entity.cancerStage == 'HGL':
@@ -76,29 +70,10 @@ class CancerFlags:
         
         # Everyone else gets treatment assigned probabilistically    
         else:
-            # Generate random value for treatment type
-            diriSample(self._estimates, Txprob_names, Txprob_probs)      
-                
-            # Entity receives surgery alone
-            if self.Txprob <= self._estimates.Tx_probSurgery:
-                entity.tx_prim = 'Surgery'
-                
-            # Entity receives surgery + RT
-            elif self._estimates.Tx_probSurgery \
-                    < self.Txprob <= \
-                    (self._estimates.Tx_probSurgeryRT + self._estimates.Tx_probSurgery):
-                entity.tx_prim = 'SurgeryRT'
-                    
-            # Entity receives other adjuvant treatment
-            elif (self._estimates.Tx_probSurgeryRT + self._estimates.Tx_probSurgery) <\
-                    self.Txprob <= \
-                    (self._estimates.Tx_probSurgeryRT + self._estimates.Tx_probSurgery + 
-                        self._estimates.Tx_probOther):
-                entity.tx_prim = 'Other'
-                
-            else:
-                entity.currentState = "ERROR - Something has gone wrong in the treatment assignment process. Check 'Glb_CancerFlags'"
-                entity.stateNum = 99
+            # Generate random value for treatment type: surgery alone, surgery + RT, or other
+            # adjuvant treatment
+            tx = DirichletCategory(self._estimates, Txprob_block, self.Txprob)
+            entity.tx_prim = Tx_names[tx]
                
         "A count of the number of courses of RT/chemo"
         
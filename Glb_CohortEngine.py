@@ -0,0 +1,1134 @@
+# -*- coding: utf-8 -*-
+"""
+A vectorized version of the Sequencer. Instead of creating one entity at a time and
+running it through the model, the cohort engine stores the whole population as a set of
+NumPy columns (one array per entity attribute, one element per entity) and advances
+every living entity at once.
+
+Each loop of the engine does the same things as one loop of 'Sequencer.py':
+
+    1 - Check the passage of time for every entity (Glb_CheckTime)
+    2 - Run the process for each model state, in the order the Sequencer checks them
+        (ScreenAppt, No dentist, OPLmanage, IncidentCancer, Followup, Remission,
+        Terminal, Dead, Error)
+
+Entities that die (or reach the time horizon) or encounter an error are removed from the
+set of active entities. The loop ends when no active entities remain.
+
+Resources and utility values are not stored in per-entity lists. Each one is added as a
+row to a cohort-wide log (entity number, resource/utility code, time), which is read by
+'Output' to produce the same LYG, QALY and cost values as 'Glb_AnalyzeOutput.py'.
+
+Text attributes (sex, cancerStage, tx_prim, etc.) are stored as integer codes that point
+to the labels in the tuples below. Parameter estimates are sampled once per entity that
+passes through a process, which is equivalent to the Sequencer creating a new process
+object (and sampling new estimates) for every entity.
+
+The HPV vaccination scenario is not available in the cohort engine.
+
+"""
+
+import numpy
+
+from Glb_LifeTable import LoadLifeTable
+from Glb_AnalyzeOutput import DiscountedYears, DailyDiscount, SurvivalKernel, CostTable, CostKernel
+from Glb_GenTime import RegModel
+from Glb_CompTime import CompetingEvents
+from Glb_Estimates import DirichletCategories
+from Glb_States import (STATE_SCREEN, STATE_NODENTIST, STATE_OPL, STATE_CANCER,
+                        STATE_FOLLOWUP, STATE_REMISSION, STATE_TERMINAL, STATE_DEAD,
+                        STATE_ERROR)
+
+# Labels for the attributes that are stored as integer codes
+SEX_LEVELS = ('M', 'F')
+SMOKE_LEVELS = ('Never', 'Ever')
+ALC_LEVELS = ('Nonheavy', 'Heavy')
+RISK_LEVELS = ('Lo', 'Med', 'Hi')
+STAGE_LEVELS = ('I', 'II', 'Adv', 'HGL', 'Recur', 'recur')
+TXPRIM_LEVELS = ('Surgery', 'SurgeryRT', 'Other')
+TXRECUR_LEVELS = ('Surgery', 'Nonsurgery', 'Palliative', 'Notx')
+
+# Regression factors: factor name -> (column name, labels of the column's codes)
+REG_FACTORS = {'age': ('age', None),
+               'sex': ('sex', SEX_LEVELS),
+               'smokeStatus': ('smokeStatus', SMOKE_LEVELS),
+               'alcStatus': ('alcStatus', ALC_LEVELS),
+               'OPLRisk': ('OPLRisk', RISK_LEVELS),
+               'cancerStage': ('cancerStage', STAGE_LEVELS),
+               'tx_prim': ('tx_prim', TXPRIM_LEVELS),
+               'tx_recur': ('tx_recur', TXRECUR_LEVELS)}
+
+# The utility states that entities pass through
+UTILITY_LABELS = ('Well', 'No disease', 'Undetected OPL', 'Detected OPL', 'Undetected Stage I',
+                  'Undetected Stage II', 'Undetected Stage III', 'Undetected Stage IV',
+                  'Stage I Cancer Under Treatment', 'Stage II Cancer Under Treatment',
+                  'Advanced Cancer Under Treatment', 'Followup for Stage I cancer',
+                  'Followup for Stage II cancer', 'Followup for Advanced cancer',
+                  'Followup for Recurring cancer', 'Cancer in remission',
+                  'Recurrence Under Treatment', 'Recurring Cancer In Remission',
+                  'Second Recurrence Under Treatment', 'Incurable disease', 'End of life',
+                  'Dead')
+UTILITY_CODES = dict((label, code) for code, label in enumerate(UTILITY_LABELS))
+
+NH_ROWS = 5     # The largest number of natural history events an entity can have
+
+
+class CohortLog:
+    """A cohort-wide log of resources or utility values. Each row records the entity, the
+    code of the resource/utility state, the time, and (optionally) a value"""
+    def __init__(self):
+        self._entity = []
+        self._code = []
+        self._time = []
+        self._value = []
+
+    def Add(self, entity, code, time, value=None):
+        n = len(entity)
+        if n == 0:
+            return
+        self._entity.append(numpy.asarray(entity, dtype=numpy.int64))
+        self._code.append(numpy.broadcast_to(numpy.asarray(code, dtype=numpy.int32), (n,)))
+        self._time.append(numpy.broadcast_to(numpy.asarray(time, dtype=float), (n,)))
+        self._value.append(numpy.broadcast_to(numpy.asarray(0.0 if value is None else value,
+                                                            dtype=float), (n,)))
+
+    def Columns(self):
+        """Return the log as (entity, code, time, value) arrays, grouped by entity. Rows for
+        the same entity stay in the order they were added"""
+        if len(self._entity) == 0:
+            empty = numpy.zeros(0)
+            return empty.astype(numpy.int64), empty.astype(numpy.int32), empty, empty
+        entity = numpy.concatenate(self._entity)
+        order = numpy.argsort(entity, kind='stable')
+        return (entity[order], numpy.concatenate(self._code)[order],
+                numpy.concatenate(self._time)[order], numpy.concatenate(self._value)[order])
+
+    def __len__(self):
+        return sum(len(x) for x in self._entity)
+
+
+class Cohort:
+    """An empty population of 'size' entities, stored as one array per attribute"""
+    def __init__(self, size):
+        self.size = size
+        f = lambda fill: numpy.full(size, fill, dtype=float)
+        i = lambda fill: numpy.full(size, fill, dtype=numpy.int8)
+
+        self.state = i(STATE_NODENTIST)
+        self.allTime = f(0)
+        self.time_Sysp = f(0)
+        self.startAge = f(0)
+        self.age = f(0)
+        self.natHist_deathAge = f(0)
+        self.horizon_censor = i(0)
+        self.altscen = i(0)
+
+        # Demographics and risk factors
+        self.sex = i(0)
+        self.smokeStatus = i(0)
+        self.alcStatus = i(0)
+        self.hasDentist = i(0)
+        self.probOPL = f(0)
+
+        # Disease status flags
+        self.OPLStatus = i(0)
+        self.hasCancer = i(0)
+        self.hasOPL = i(0)
+        self.OPLflag = i(0)
+        self.OPLDetected = i(0)
+        self.cancerDetected = i(0)
+        self.cancer_screenDetected = i(0)
+        self.sympt = i(0)
+        self.OPLRisk = i(-1)                    # -1: not assigned
+        self.cancerStage = i(-1)
+        self.tx_prim = i(-1)
+        self.tx_recur = i(-1)
+        self.prevRecur = i(-1)
+        self.recurrence = i(-1)
+        self.endOfLife = i(0)
+        self.hiriskdet = i(0)
+
+        # Natural history events, one row per entity
+        self.nh_status = numpy.full((size, NH_ROWS), numpy.nan)
+        self.nh_time = numpy.full((size, NH_ROWS), numpy.inf)
+        self.nh_count = numpy.zeros(size, dtype=numpy.int8)
+        self.nhnum = numpy.zeros(size, dtype=numpy.int8)
+        self.timestageIV = f(numpy.nan)
+
+        # Clinical event times
+        self.time_DeadofDisease = f(99999)
+        self.time_Recurrence = f(99999)
+        self.time_Folup = f(0)
+        self.loopcount = numpy.zeros(size, dtype=numpy.int32)
+
+        # Screening and OPL surveillance
+        self.screened = numpy.zeros(size, dtype=bool)
+        self.screenReturn = i(0)
+        self.count_DentAppt = numpy.zeros(size, dtype=numpy.int32)
+        self.flsNegCount = numpy.zeros(size, dtype=numpy.int32)
+        self.flsPosCount = numpy.zeros(size, dtype=numpy.int32)
+        self.tottime_OPLfu = f(0)
+        self.time_OPLfu = f(numpy.nan)          # nan: surveillance clock not started
+        self.time_Dentist = f(numpy.nan)
+        self.firstOPL = i(0)
+        self.discharge = i(0)
+
+        # Treatment
+        self.RR_Surgery = f(0)
+        self.RR_Chemo = f(0)
+        self.palliativeMonth = numpy.ones(size, dtype=numpy.int32)
+        self.notxMonth = numpy.ones(size, dtype=numpy.int32)
+
+        # Death
+        self.time_death = f(numpy.nan)
+        self.death_type = i(0)                  # 1: disease, 2: natural causes, 3: censored
+
+        # Cohort-wide logs
+        self.resources = CohortLog()
+        self.utility = CohortLog()
+        self.errors = []
+
+
+class CohortEngine:
+    def __init__(self, estimates, regcoeffs, alt_estimates, scenario):
+        self._estimates = estimates
+        self._regcoeffs = regcoeffs
+        self._alt_estimates = alt_estimates
+        self._scenario = scenario
+
+        if scenario.get('HPV', 0) == 1:
+            raise ValueError("The HPV vaccination scenario is not available in the cohort engine")
+
+        # Natural death ages (life tables)
+        self._lifetable = LoadLifeTable()
+
+        # Resources are logged by code, and named in the order they are first used
+        self.resource_names = []
+        self._resource_codes = {}
+
+        # Read the regression models into arrays of coefficients
+        self._regmodels = {}
+        for param in regcoeffs:
+            self._regmodels[param] = self._ReadRegression(regcoeffs[param])
+
+        # The state processes, in the order they are checked by the Sequencer
+        self._processes = ((STATE_SCREEN, self._ScreenAppt),
+                           (STATE_NODENTIST, self._NoDentist),
+                           (STATE_OPL, self._OPLManage),
+                           (STATE_CANCER, self._IncidentCancer),
+                           (STATE_FOLLOWUP, self._Followup),
+                           (STATE_REMISSION, self._Remission),
+                           (STATE_TERMINAL, self._Terminal),
+                           (STATE_DEAD, self._Dead),
+                           (STATE_ERROR, self._Report))
+
+    ############################################################################################
+    # UTILITY FUNCTIONS
+
+    def _ResourceCode(self, name):
+        if name not in self._resource_codes:
+            self._resource_codes[name] = len(self.resource_names)
+            self.resource_names.append(name)
+        return self._resource_codes[name]
+
+    def _AddResource(self, co, idx, name):
+        co.resources.Add(idx, self._ResourceCode(name), co.allTime[idx])
+
+    def _AddUtility(self, co, idx, label, estimate, time=None):
+        if len(idx) == 0:
+            return
+        value = 0 if estimate is None else estimate.sample(len(idx))
+        co.utility.Add(idx, UTILITY_CODES[label], co.allTime[idx] if time is None else time, value)
+
+    def _Error(self, co, idx, message):
+        if len(idx) > 0:
+            co.state[idx] = STATE_ERROR
+            co.errors.append((idx, message))
+
+    def _ReadRegression(self, coeffs):
+        """Convert the regression coefficients for one parameter into arrays (see 'Glb_GenTime.RegModel')"""
+        model = RegModel(coeffs)
+        terms = []
+        for factor, vartype, coeff in model.factors:
+            if factor in REG_FACTORS:
+                column, levels = REG_FACTORS[factor]
+                if vartype == 2:
+                    terms.append((column, coeff))
+                else:
+                    # Levels that are missing from the table produce 'nan'
+                    terms.append((column, model.Table(factor, levels)))
+            else:
+                terms.append((factor, None))
+        return model.intercept, model.sigma, terms
+
+    def _GenTime(self, co, idx, param, int_adj=None):
+        """Return the Weibull shape and scale of 'param' for each entity (see Glb_GenTime)"""
+        intercept, sigma, terms = self._regmodels[param]
+        mu = numpy.full(len(idx), float(intercept))
+        if int_adj is not None:
+            mu -= int_adj
+        for column, coeff in terms:
+            if coeff is None:
+                raise KeyError("Could not estimate %s as entities are missing %s"%(param, column))
+            if numpy.ndim(coeff) == 0:
+                mu += coeff*getattr(co, column)[idx]
+            else:
+                mu += coeff[getattr(co, column)[idx]]
+        return 1/sigma, numpy.exp(mu)
+
+    def _CompTime(self, co, idx, tte1, tte2, int_adj=None):
+        """Competing risks between two time-to-event regressions (see Glb_CompTime)"""
+        probEst = numpy.random.random_sample(len(idx))
+        shape1, scale1 = self._GenTime(co, idx, tte1, int_adj)
+        shape2, scale2 = self._GenTime(co, idx, tte2, int_adj)
+        event_time, event_type = CompetingEvents(shape1, scale1, shape2, scale2, probEst)
+        self._Error(co, idx[event_type == 0], "Error - something has gone wrong in Glb_CompTime")
+        # As in 'CompTime.Process', these entities are otherwise treated as having the first event
+        event_type[event_type == 0] = 1
+        return event_time, event_type
+
+    def _Categories(self, block, u):
+        """Assign a category to each entity from Dirichlet-sampled probabilities (see
+        'Glb_Estimates.DirichletCategories')"""
+        return DirichletCategories(self._estimates, block, u)
+
+    ############################################################################################
+    # RUN THE MODEL
+
+    def Run(self, num_entities, altscen):
+        """Run 'num_entities' entities through the model and return the cohort"""
+        co = Cohort(num_entities)
+        everyone = numpy.arange(num_entities)
+
+        # Apply Demographic Characteristics and Natural History to the newly-created entities
+        self._ApplyInit(co, everyone)
+        if self._scenario.get('Prevention', 0) == 1:
+            self._Prevention(co, everyone)
+        self._NatHist(co, everyone)
+        co.OPLflag[:] = co.hasOPL
+
+        # Entities who regularly see a dentist start in state 1.0, the rest in state 1.8
+        co.altscen[:] = altscen
+        co.state[:] = numpy.where(co.hasDentist == 1, STATE_SCREEN, STATE_NODENTIST)
+
+        active = everyone
+        while len(active) > 0:
+            ### Advance the clock to next scheduled event (NatHist, Sysp, Recurrence, Death) ###
+            self._CheckTime(co, active)
+
+            ### Run next scheduled event/process according to state ###
+            for code, process in self._processes:
+                idx = active[co.state[active] == code]
+                if len(idx) > 0:
+                    process(co, idx)
+
+            finished = (co.state[active] == STATE_DEAD) | (co.state[active] == STATE_ERROR)
+            active = active[~finished]
+
+        return co
+
+    ############################################################################################
+    # ENTITY CREATION (Glb_ApplyInit, SysP_Prevention, Alt_NatHist_OralCancer)
+
+    def _ApplyInit(self, co, idx):
+        est = self._estimates
+        n = len(idx)
+
+        co.startAge[idx] = est.Prev_startage.sample(n)
+        co.sex[idx] = numpy.where(numpy.random.random_sample(n) < 0.5, 1, 0)
+        male = co.sex[idx] == 0
+
+        makeSmoker = numpy.random.random_sample(n)
+        makeAlc = numpy.random.random_sample(n)
+        smokeprev = numpy.where(male, est.Prev_smoking_M.sample(n), est.Prev_smoking_F.sample(n))
+        alcprev = numpy.where(male, est.Prev_alcohol_M.sample(n), est.Prev_alcohol_F.sample(n))
+        co.smokeStatus[idx] = makeSmoker < smokeprev
+        co.alcStatus[idx] = makeAlc < alcprev
+
+        "Access to a dentist: 1 = yes, 0 = no"
+        makeDentist = numpy.random.random_sample(n)
+        co.hasDentist[idx] = makeDentist < est.Prev_dentist.sample(n)*est.Screen_compliance.sample(n)
+
+        self._AddUtility(co, idx, 'Well', est.Util_Well, 0.0)
+
+        # Sample an age at death from natural causes, given that the entity has lived to its starting age
+        nh_deathage = numpy.empty(n)
+        u = numpy.random.random_sample(n)
+        for sex in (0, 1):
+            group = co.sex[idx] == sex
+            nh_deathage[group] = self._lifetable.DeathAges('MF'[sex], co.startAge[idx][group], u[group])
+        co.natHist_deathAge[idx] = (nh_deathage - co.startAge[idx])*365
+
+        "Assign OPL status based on age- and sex-adjusted prevalence estimates"
+        bins = numpy.digitize(co.startAge[idx], (50, 60, 70, 80))
+        prevalence = (('under50m', '5059m', '6069m', '7079m', '80plusm'),
+                      ('under50f', '5059f', '6069f', '7079f', '80plusf'))
+        probOPL = numpy.empty(n)
+        for sex in (0, 1):
+            for b in range(5):
+                group = (co.sex[idx] == sex) & (bins == b)
+                probOPL[group] = getattr(est, 'NatHist_prevOPL' + prevalence[sex][b]).sample(group.sum())
+        co.probOPL[idx] = probOPL*est.NatHist_prevOPLconversion.sample(n)
+
+    def _Prevention(self, co, idx):
+        n = len(idx)
+        changeSmoke = numpy.random.random_sample(n)
+        changeAlc = numpy.random.random_sample(n)
+        smoking_reduc = self._alt_estimates.Smoking_Reduc.sample(n)
+        alcohol_reduc = self._alt_estimates.Alcohol_Reduc.sample(n)
+
+        smoker = co.smokeStatus[idx] == 1
+        self._AddResource(co, idx[smoker], 'Experimental Smoking Cessation')
+        co.smokeStatus[idx[smoker & (changeSmoke < smoking_reduc)]] = 0
+
+        heavy = co.alcStatus[idx] == 1
+        self._AddResource(co, idx[heavy], 'Experimental Alcohol Cessation')
+        co.alcStatus[idx[heavy & (changeAlc < alcohol_reduc)]] = 0
+
+    def _AddNatHist(self, co, idx, status, time):
+        k = co.nh_count[idx]
+        co.nh_status[idx, k] = status
+        co.nh_time[idx, k] = time
+        co.nh_count[idx] += 1
+
+    def _NatHist(self, co, idx):
+        est = self._estimates
+        n = len(idx)
+        timehorizon = 365*est.timehorizon.sample(n)
+
+        # OPL status and risk group (NatHist_DevOPL)
+        hasOPL = numpy.random.random_sample(n) < co.probOPL[idx]
+        OPLRisk = numpy.random.random_sample(n)
+        opl = idx[hasOPL]
+        co.OPLStatus[opl] = 1
+        co.hasOPL[opl] = 1
+        self._AddUtility(co, opl, 'Undetected OPL', est.Util_OPL_Undetected)
+
+        risk = self._Categories('OPLRisk', OPLRisk[hasOPL])
+        co.OPLRisk[opl] = risk
+
+        # Natural death is censored at the model time horizon
+        censor = co.natHist_deathAge[idx] > timehorizon
+        co.natHist_deathAge[idx[censor]] = timehorizon[censor]
+        co.horizon_censor[idx] = censor
+
+        # Entities without an OPL only experience natural death
+        noopl = idx[~hasOPL]
+        self._AddNatHist(co, noopl, 9.0, co.natHist_deathAge[noopl])
+
+        # Progression of OPL to stage I cancer, or resolution (Alt_NatHist_OPLProg)
+        m = len(opl)
+        t_OPL_NED = est.NatHist_timeOPL_NED.sample(m)
+        OPL_samptime = numpy.empty(m)
+        for code, name in enumerate(('time_OPLCan_lo', 'time_OPLCan_med', 'time_OPLCan_hi')):
+            group = co.OPLRisk[opl] == code
+            OPL_samptime[group] = getattr(est, name).sample(group.sum())
+        with numpy.errstate(divide='ignore'):
+            rate_StageOne = -1/5*numpy.log(1 - OPL_samptime)
+            prob_StageOne = 1 - numpy.exp(-rate_StageOne)
+            lmbd_StageOne = -(numpy.log(1.0 - prob_StageOne)/365.0)
+            beta_StageOne = 1/lmbd_StageOne
+        t_OPL_StageOne = numpy.random.exponential(beta_StageOne)
+
+        stageone = t_OPL_StageOne < t_OPL_NED
+        death = ~stageone & (co.natHist_deathAge[opl] < t_OPL_NED)
+        ned = ~stageone & ~death
+        self._AddNatHist(co, opl[stageone], 2.0, t_OPL_StageOne[stageone])
+        self._AddNatHist(co, opl[death], 9.0, co.natHist_deathAge[opl[death]])
+        self._AddNatHist(co, opl[ned], 0.0, t_OPL_NED[ned])
+        self._AddNatHist(co, opl[ned], 9.0, co.natHist_deathAge[opl[ned]])
+
+        # Progression of undetected oral cancer (NatHist_UnDet)
+        self._UnDet(co, opl[stageone], t_OPL_StageOne[stageone])
+
+    def _UnDet(self, co, idx, nh_time):
+        est = self._estimates
+        n = len(idx)
+        nh_time = nh_time.copy()
+        t_Sympt = (est.NatHist_timeSympt_stageone.sample(n), est.NatHist_timeSympt_stagetwo.sample(n),
+                   est.NatHist_timeSympt_stagethree.sample(n))
+        t_Progress = (est.NatHist_timeStageone_stagetwo.sample(n), est.NatHist_timeStagetwo_stagethree.sample(n),
+                      est.NatHist_timeStagethree_stagefour.sample(n))
+        t_StageFour_Sympt = est.NatHist_timeSympt_stagefour.sample(n)
+
+        # Stage one to three cancers are either detected symptomatically or progress to the next stage
+        undetected = numpy.ones(n, dtype=bool)
+        for t_sympt, t_progress, status_det, status_next in zip(t_Sympt, t_Progress, (2.1, 3.1, 4.1), (3.0, 4.0, 5.0)):
+            detect = undetected & (t_sympt < t_progress)
+            undetected &= ~detect
+            nh_time[detect] += t_sympt[detect]
+            nh_time[undetected] += t_progress[undetected]
+            self._AddNatHist(co, idx[detect], status_det, nh_time[detect])
+            self._AddNatHist(co, idx[undetected], status_next, nh_time[undetected])
+
+        "Stage Four Cancers"
+        s4 = numpy.flatnonzero(undetected)
+        stIVage = (co.startAge[idx[s4]]*365.25 - nh_time[s4])/365.25
+        bins = numpy.digitize(stIVage, (50, 60, 70, 80))
+        mortality = (('under50m', '5059m', '6069m', '7079m', '80plusm'),
+                     ('under50f', '5059f', '6069f', '7079f', '80plusf'))
+        t_StageFour_Death = numpy.empty(len(s4))
+        for sex in (0, 1):
+            for b in range(5):
+                group = (co.sex[idx[s4]] == sex) & (bins == b)
+                t_StageFour_Death[group] = getattr(est, 'NatHist_timeStagefour_death' +
+                                                   mortality[sex][b]).sample(group.sum())
+        detect = t_StageFour_Sympt[s4] < t_StageFour_Death
+        nh_time[s4] += numpy.where(detect, t_StageFour_Sympt[s4], t_StageFour_Death)
+        self._AddNatHist(co, idx[s4[detect]], 5.1, nh_time[s4[detect]])
+        self._AddNatHist(co, idx[s4[~detect]], 100, nh_time[s4[~detect]])
+
+    ############################################################################################
+    # CHECK THE PASSAGE OF TIME (Glb_CheckTime)
+
+    def _CheckTime(self, co, idx):
+        est = self._estimates
+
+        "Update entity age"
+        co.age[idx] = co.startAge[idx] + numpy.trunc(co.allTime[idx]/365.25)
+
+        "Check for natural death"
+        co.allTime[idx] = numpy.minimum(co.allTime[idx], co.natHist_deathAge[idx])
+        natural = numpy.trunc(numpy.round(co.allTime[idx] - co.natHist_deathAge[idx], 3)) == 0
+        dead = idx[natural]
+        co.allTime[dead] = co.natHist_deathAge[dead]
+        co.time_death[dead] = co.allTime[dead]
+        co.death_type[dead] = 2
+        co.state[dead] = STATE_DEAD
+
+        idx = idx[~natural]
+        und = idx[co.cancerDetected[idx] == 0]
+        det = idx[co.cancerDetected[idx] == 1]
+
+        # If the entity does not have detected disease, perform the natural history check
+        nhnum = co.nhnum[und]
+        nextNat_status = co.nh_status[und, nhnum]
+        nextNat_time = co.nh_time[und, nhnum]
+
+        # The next event to occur is a system process event
+        sysp = co.time_Sysp[und] <= nextNat_time
+        co.allTime[und[sysp]] = co.time_Sysp[und[sysp]]
+
+        # The next event to occur is a natural history event that hasn't happened yet
+        wait = ~sysp & (co.allTime[und] < nextNat_time)
+        co.allTime[und[wait]] = nextNat_time[wait]
+
+        # The natural history event has occurred
+        occurred = ~sysp & ~wait
+        ev = und[occurred]
+        status = nextNat_status[occurred]
+        nt = nextNat_time[occurred]
+        co.nhnum[ev] += 1
+
+        # NED - No Evidence of Disease
+        m = status == 0.0
+        self._AddUtility(co, ev[m], 'No disease', est.Util_Well)
+        co.OPLStatus[ev[m]] = 0
+
+        # Oral Premalignancy
+        m = status == 1.0
+        self._AddUtility(co, ev[m], 'Undetected OPL', est.Util_OPL_Undetected)
+        co.OPLStatus[ev[m]] = 1
+
+        m = status == 1.1
+        self._AddUtility(co, ev[m], 'Detected OPL', est.Util_OPL_Detected, nt[m])
+        co.state[ev[m]] = STATE_OPL
+
+        # Undetected cancer
+        m = status == 2.0
+        self._AddUtility(co, ev[m], 'Undetected Stage I', est.Util_StageI_Undetected)
+        co.hasCancer[ev[m]] = 1
+        co.cancerStage[ev[m]] = 0
+        co.OPLStatus[ev[m]] = 9
+
+        m = status == 3.0
+        self._AddUtility(co, ev[m], 'Undetected Stage II', est.Util_StageII_Undetected)
+        co.cancerStage[ev[m]] = 1
+
+        m = status == 4.0
+        self._AddUtility(co, ev[m], 'Undetected Stage III', est.Util_StageIII_Undetected)
+        co.cancerStage[ev[m]] = 2
+
+        m = status == 5.0
+        self._AddUtility(co, ev[m], 'Undetected Stage IV', est.Util_StageIV_Undetected)
+        co.timestageIV[ev[m]] = nt[m]
+
+        # Symptomatic cancer is detected and the entity moves to the "detected cancer" state
+        m = numpy.isin(status, (2.1, 3.1, 4.1, 5.1))
+        co.cancerDetected[ev[m]] = 1
+        co.sympt[ev[m]] = 1
+        co.state[ev[m]] = STATE_CANCER
+
+        co.allTime[ev] = nt
+
+        # Dead of Disease: undetected terminal stage IV disease is detected before death and
+        #   treated as incurable
+        m = status == 100
+        dod = ev[m]
+        co.cancerDetected[dod] = 1
+        co.time_DeadofDisease[dod] = nt[m]
+        co.state[dod] = STATE_TERMINAL
+        co.endOfLife[dod] = 1
+        """The time of cancer detection is 90 days before death or
+            the time that the entity progresses to stage IV,
+            whichever comes first"""
+        co.allTime[dod] = numpy.where(nt[m] - co.timestageIV[dod] < 90, co.timestageIV[dod], nt[m] - 90)
+
+        self._Error(co, ev[~numpy.isin(status, (0.0, 1.0, 1.1, 2.0, 2.1, 3.0, 3.1, 4.0, 4.1, 5.0, 5.1, 100))],
+                    "ERROR - nextNat sequencing")
+
+        # If the entity has detected disease, check for disease events
+        allTime = co.allTime[det]
+        time_Sysp = co.time_Sysp[det]
+        time_DoD = co.time_DeadofDisease[det]
+        time_Recurrence = co.time_Recurrence[det]
+        time_EOL = time_DoD - 90                    # Disease within last 3 months of life
+        remaining = numpy.ones(len(det), dtype=bool)
+
+        def Case(condition):
+            case = remaining & condition
+            remaining[case] = False
+            return case
+
+        # Check for death from oral cancer
+        m = Case(allTime >= time_DoD)
+        co.allTime[det[m]] = time_DoD[m]
+        co.time_death[det[m]] = time_DoD[m]
+        co.death_type[det[m]] = 1
+        co.state[det[m]] = STATE_DEAD
+
+        # If entity has reached end of life state (last 3 months of life)
+        m = Case(allTime >= time_EOL)
+        co.state[det[m]] = STATE_TERMINAL
+        co.endOfLife[det[m]] = 1
+
+        # Next system event is scheduled after entity's death from natural causes
+        m = Case(time_Sysp >= co.natHist_deathAge[det])
+        co.allTime[det[m]] = co.natHist_deathAge[det[m]]
+
+        # Recurrence happens before the next system process event, and before EOL
+        m = Case(time_Sysp >= time_Recurrence)
+        recur = m & (time_Recurrence < time_EOL)
+        co.allTime[det[recur]] = time_Recurrence[recur]
+        co.recurrence[det[recur]] = 1
+        co.cancerStage[det[recur]] = 4
+        co.state[det[recur]] = STATE_CANCER
+        # EOL occurs before recurrence (the clock is moved to the EOL date)
+        eol = m & ~recur
+        co.allTime[det[eol]] = time_EOL[eol]
+        co.state[det[eol]] = STATE_TERMINAL
+        co.endOfLife[det[eol]] = 1
+        co.time_Recurrence[det[m]] = 666666     # Future recurrence set to impossible date
+
+        # Next scheduled system process event occurs before recurrence but after EOL
+        m = Case(time_Sysp >= time_EOL)
+        co.allTime[det[m]] = time_EOL[m]
+        co.time_Recurrence[det[m]] = 666666
+        co.state[det[m]] = STATE_TERMINAL
+        co.endOfLife[det[m]] = 1
+
+        # If no disease event is scheduled before next system process event
+        m = Case(allTime < time_Sysp)
+        co.loopcount[det[m]] = 0
+        co.allTime[det[m]] = time_Sysp[m]
+
+        # Neither clock has moved: this is caught if it happens too many times in a row
+        m = Case(allTime == time_Sysp)
+        co.loopcount[det[m]] += 1
+        self._Error(co, det[m][co.loopcount[det[m]] > 1000],
+                    "ERROR - entity caught in Sysp/allTime loop - look at Glb_Checktime.py")
+
+        self._Error(co, det[remaining], "ERROR - time_Sysp conflict - look at Glb_Checktime.py")
+
+    ############################################################################################
+    # SYSTEM PROCESSES
+
+    def _ScreenAppt(self, co, idx):
+        """Regular dental appointments (SysP_ScreenAppt, or Alt_SysP_ScreenAppt if the
+        improved screening scenario is being analyzed)"""
+        est = self._estimates
+        n = len(idx)
+        anyLesion = est.Screen_anylesion.sample(n)
+        appInt = est.Screen_appint.sample(n).astype(int)
+        screenReturnInt = est.Screen_returnint.sample(n)
+        willReturn = est.Screen_willreturn.sample(n)
+        lesionResolves = est.Screen_lesionresolves.sample(n)
+        if self._scenario.get('Screen', 0) == 1:
+            detectOPL = self._alt_estimates.Screen_sensitivity.sample(n)
+            needsBiopsy = self._alt_estimates.Screen_needsbiopsy.sample(n)
+        else:
+            detectOPL = est.Screen_sensitivity.sample(n)
+            needsBiopsy = est.Screen_needsbiopsy.sample(n)
+
+        # Start the tally of appointments for first-time visitors
+        new = idx[~co.screened[idx]]
+        co.screened[new] = True
+        co.screenReturn[new] = 0
+        co.tottime_OPLfu[new] = 0.0
+
+        allTime = co.allTime[idx]
+        folup = (allTime >= co.tottime_OPLfu[idx]) & (co.tottime_OPLfu[idx] > 0)
+        due = ~(co.time_Sysp[idx] > allTime)
+        scenario = numpy.zeros(n, dtype=bool)
+
+        # Regular appointment
+        m = due & ~folup
+        self._AddResource(co, idx[m], 'Dental Appointment')
+        co.count_DentAppt[idx[m]] += 1
+        co.time_Dentist[idx[m]] = allTime[m] + appInt[m]
+
+        # Entity is due for OPL follow-up
+        co.state[idx[due & folup]] = STATE_OPL
+
+        # Entity has a previously-detected OPL
+        m = due & ~folup & (co.OPLDetected[idx] == 1)
+        nc = idx[m & (co.hasCancer[idx] == 0)]
+        co.time_Sysp[nc] += appInt[m & (co.hasCancer[idx] == 0)]
+        nc = nc[co.time_Sysp[nc] > co.tottime_OPLfu[nc]]
+        co.time_Sysp[nc] = co.tottime_OPLfu[nc]
+        co.state[nc] = STATE_OPL
+        ca = idx[m & (co.hasCancer[idx] == 1)]
+        co.cancer_screenDetected[ca] = 1
+        co.cancerDetected[ca] = 1
+        co.state[ca] = STATE_CANCER
+
+        # Entity has an undetected OPL
+        m = due & ~folup & (co.OPLDetected[idx] != 1) & (co.OPLStatus[idx] == 1)
+        first = m & (co.screenReturn[idx] == 0)
+        ret = idx[m & (co.screenReturn[idx] != 0)]
+        scenario |= first
+        detect = first & (numpy.random.random_sample(n) < detectOPL)
+        miss = first & ~detect
+        self._AddResource(co, idx[detect], 'Cancer Screening')
+        co.screenReturn[idx[detect]] = 1
+        co.time_Sysp[idx[detect]] += screenReturnInt[detect]
+        co.flsNegCount[idx[miss]] += 1
+        co.time_Sysp[idx[miss]] += appInt[miss]
+
+        self._AddResource(co, ret, 'Cancer Screening')
+        self._AddResource(co, ret, 'Specialist Appointment')
+        self._AddResource(co, ret, 'Biopsy')
+        nc = ret[co.hasCancer[ret] == 0]
+        co.state[nc] = STATE_OPL
+        self._AddUtility(co, nc, 'Detected OPL', est.Util_OPL_Detected)
+        ca = ret[co.hasCancer[ret] != 0]
+        co.cancer_screenDetected[ca] = 1
+        co.cancerDetected[ca] = 1
+        co.state[ca] = STATE_CANCER
+
+        # Entity has no OPL
+        m = due & ~folup & (co.OPLDetected[idx] != 1) & (co.OPLStatus[idx] != 1)
+        regular = m & (co.screenReturn[idx] == 0)
+        ret = m & (co.screenReturn[idx] != 0)
+        lesion = regular & (numpy.random.random_sample(n) < anyLesion)
+        self._AddResource(co, idx[lesion], 'Cancer Screening')
+        back = lesion & (numpy.random.random_sample(n) < willReturn)
+        co.screenReturn[idx[back]] = 1
+        co.time_Sysp[idx[back]] += screenReturnInt[back]
+        co.time_Sysp[idx[regular & ~back]] += appInt[regular & ~back]
+
+        # Entity is returning, screenReturn status is reset
+        co.screenReturn[idx[ret]] = 0
+        persists = ret & (numpy.random.random_sample(n) < lesionResolves)
+        scenario |= persists
+        self._AddResource(co, idx[persists], 'Cancer Screening')
+        self._AddResource(co, idx[persists], 'Specialist Appointment')
+        biopsy = persists & (numpy.random.random_sample(n) < needsBiopsy)
+        co.flsPosCount[idx[biopsy]] += 1
+        self._AddResource(co, idx[biopsy], 'Biopsy')
+        co.time_Sysp[idx[ret]] += appInt[ret]
+
+        if self._scenario.get('Screen', 0) == 1:
+            self._AddResource(co, idx[scenario], 'Experimental Cancer Screening')
+
+    def _NoDentist(self, co, idx):
+        co.time_Sysp[idx] += 1000      #Move system process clock forward by 1000 days
+
+    def _OPLManage(self, co, idx):
+        """OPL follow-up and management (SysP_OPLmanage)"""
+        est = self._estimates
+        n = len(idx)
+        appInt_med = 365*est.Appint_med.sample(n)
+        appInt_lo = 365*est.Appint_lo.sample(n)
+        appInt_gen = 365*est.Appint_gen.sample(n)
+        sensitivity = est.OPLfu_sensitivity.sample(n)
+        specificity = est.OPLfu_specificity.sample(n)
+        dischargetime = 365*est.time_Discharge.sample(n)
+        biopsytime_med = 365*est.time_Biopsy_med.sample(n)
+        biopsytime_lo = 365*est.time_Biopsy_lo.sample(n)
+        biopsytime_gen = 365*est.time_Biopsy_gen.sample(n)
+
+        co.OPLDetected[idx] = 1
+        first = idx[co.firstOPL[idx] == 0]
+        self._AddResource(co, first, 'Biopsy')
+        co.firstOPL[first] = 1
+        self._AddUtility(co, first, 'Detected OPL', est.Util_OPL_Detected)
+        self._AddResource(co, first[co.altscen[first] == 1], 'OPL genomic test')
+
+        # Surveillance schedule, by scenario and (if the genomic test is used) risk group
+        alt = co.altscen[idx] == 1
+        risk = co.OPLRisk[idx]
+        appInt = numpy.where(alt, numpy.where(risk == 0, appInt_lo, appInt_med), appInt_gen)
+        biopsytime = numpy.where(alt, numpy.where(risk == 0, biopsytime_lo, biopsytime_med), biopsytime_gen)
+
+        # High-risk lesions are referred for immediate treatment
+        hi = alt & (risk == 2)
+        co.hasCancer[idx[hi]] = 1
+        co.hiriskdet[idx[hi]] = 1
+        hi = co.hiriskdet[idx] == 1
+        co.cancer_screenDetected[idx[hi]] = 1
+        co.cancerDetected[idx[hi]] = 1
+        co.state[idx[hi]] = STATE_CANCER
+        co.cancerStage[idx[hi]] = 3
+
+        due = ~hi & ~(co.time_Sysp[idx] > co.allTime[idx])
+
+        "How long has the entity been undergoing OPL surveillance?"
+        start = due & numpy.isnan(co.time_OPLfu[idx])
+        co.time_OPLfu[idx[start]] = 0
+        co.tottime_OPLfu[idx[start]] = 0
+        discharge = due & ~start & (co.tottime_OPLfu[idx] >= dischargetime)
+        co.discharge[idx[discharge]] = 1
+        co.OPLStatus[idx[discharge]] = 9
+        co.state[idx[discharge]] = STATE_NODENTIST
+
+        # The entity is not yet due for a biopsy
+        surv = due & (co.discharge[idx] == 0) & (co.time_OPLfu[idx] < biopsytime)
+        self._AddResource(co, idx[surv], 'OPL surveillance appointment')
+        nc = surv & (co.hasCancer[idx] == 0)
+        falsePos = nc & ~(co.time_OPLfu[idx] > 0) & (numpy.random.random_sample(n) > specificity)
+        self._AddResource(co, idx[falsePos], 'Biopsy')
+        co.time_Sysp[idx[nc]] += appInt[nc]
+        ca = surv & (co.hasCancer[idx] != 0)
+        falseNeg = ca & (numpy.random.random_sample(n) > sensitivity)
+        co.time_Sysp[idx[falseNeg]] += appInt[falseNeg]
+        detect = idx[ca & ~falseNeg]
+        self._AddResource(co, detect, 'Biopsy')
+        co.cancer_screenDetected[detect] = 1
+        co.cancerDetected[detect] = 1
+        co.state[detect] = STATE_CANCER
+
+        # Once the biopsy time is reached
+        biopsy = due & (co.discharge[idx] == 0) & ~surv
+        co.time_OPLfu[idx[biopsy]] = 0
+        self._AddResource(co, idx[biopsy], 'OPL surveillance appointment')
+        self._AddResource(co, idx[biopsy], 'Biopsy')
+        detect = idx[biopsy & (co.hasCancer[idx] == 1)]
+        co.cancer_screenDetected[detect] = 1
+        co.cancerDetected[detect] = 1
+        co.state[detect] = STATE_CANCER
+        nc = biopsy & (co.hasCancer[idx] != 1)
+        co.time_Sysp[idx[nc]] += appInt[nc]
+
+        # Entities without cancer return for their next surveillance or dental appointment
+        m = co.cancerDetected[idx] == 0
+        co.time_OPLfu[idx[m]] += appInt[m]
+        co.tottime_OPLfu[idx[m]] += appInt[m]
+        disc = idx[m & (co.discharge[idx] == 1)]
+        co.time_OPLfu[disc] = 555555
+        co.tottime_OPLfu[disc] = 555555
+        dent = idx[m & (co.discharge[idx] == 0) & (co.hasDentist[idx] == 1)]
+        co.time_Dentist[dent] = numpy.where(numpy.isnan(co.time_Dentist[dent]), 90, co.time_Dentist[dent])
+        dent = dent[co.time_Sysp[dent] > co.time_Dentist[dent]]
+        co.time_Sysp[dent] = co.time_Dentist[dent]
+        co.state[dent] = STATE_SCREEN
+
+    def _IncidentCancer(self, co, idx):
+        """Diagnostic workup and treatment by stage (SysP_IncidentCancer)"""
+        n = len(idx)
+        if self._scenario.get('Surg', 0) == 1:
+            co.RR_Surgery[idx] = self._alt_estimates.RR_Surgery.sample(n)
+        if self._scenario.get('Chemo', 0) == 1:
+            co.RR_Chemo[idx] = self._alt_estimates.RR_Chemo.sample(n)
+
+        # People who present through symptoms have to get a biopsy before their workup
+        sympt = idx[co.sympt[idx] == 1]
+        self._AddResource(co, sympt, 'Biopsy')
+        co.sympt[sympt] = 9
+
+        "Diagnostic workup of incoming cancer"
+        self._AddResource(co, idx, 'Diagnostic Workup')
+
+        self._CancerFlags(co, idx[co.tx_prim[idx] < 0])
+        co.time_Folup[idx] = 0
+
+        "Treat cancer by stage"
+        stage = co.cancerStage[idx]
+        self._HGLTx(co, idx[stage == 3])
+        for code in (0, 1, 2):
+            self._StageTx(co, idx[stage == code], code)
+        self._RecurTx(co, idx[stage == 4])
+        self._Error(co, idx[(stage < 0) | (stage > 4)],
+                    "Error - the entity's cancer was not assigned a valid stage number - see Sysp_IncidentCancer.py")
+
+    def _CancerFlags(self, co, idx):
+        """Assign treatment type to newly-diagnosed cancers (Glb_CancerFlags)"""
+        est = self._estimates
+        n = len(idx)
+        Txprob = numpy.random.random_sample(n)
+        SCC = est.OPLfu_SCC.sample(n)
+
+        # Screen-detected stage I cancers may be high-grade lesions
+        stage = co.cancerStage[idx]
+        hgl = (stage == 0) & (co.cancer_screenDetected[idx] == 1)
+        hgl[hgl] = numpy.random.random_sample(hgl.sum()) > SCC[hgl]
+        co.cancerStage[idx[hgl]] = 3
+        co.tx_prim[idx[hgl]] = 0
+
+        for code, name in ((0, 'stageI'), (1, 'stageII'), (2, 'adv')):
+            group = (stage == code) & ~hgl
+            tx = self._Categories('Tx_%s'%name, Txprob[group])
+            co.tx_prim[idx[group]] = tx
+
+    def _HGLTx(self, co, idx):
+        """Surgical treatment of high-grade lesions (SysP_HGLTx)"""
+        co.time_DeadofDisease[idx] = 99999
+        co.time_Recurrence[idx] = 99999
+        self._AddResource(co, idx, 'Treatment - HGL - Surgery')
+        co.state[idx] = STATE_FOLLOWUP
+        co.time_Sysp[idx] += self._estimates.Tx_time_treatment.sample(len(idx))
+
+    def _StageTx(self, co, idx, stage):
+        """Treatment of incident stage I, II and advanced cancers (SysP_StageOneTx,
+        SysP_StageTwoTx, SysP_StageAdvTx)"""
+        est = self._estimates
+        n = len(idx)
+        if n == 0:
+            return
+        tx_time_treatment = est.Tx_time_treatment.sample(n)
+        prob_other_chemo = est.Tx_other_chemo.sample(n)
+
+        start = co.allTime[idx]
+        co.time_Sysp[idx] = start
+        tx_prim = co.tx_prim[idx]
+
+        # New treatments reduce the risk of recurrence and death (via the regression intercept)
+        int_adj = numpy.zeros(n)
+        if stage == 0:
+            scenario = (self._scenario.get('Surg', 0) == 1) & (tx_prim == 0)
+            int_adj[scenario] = co.RR_Surgery[idx[scenario]]
+        elif stage == 2:
+            probChemo = numpy.random.random_sample(n)
+            scenario = ((self._scenario.get('Chemo', 0) == 1) & (tx_prim == 2) &
+                        (probChemo < prob_other_chemo))
+            int_adj[scenario] = co.RR_Chemo[idx[scenario]]
+
+        t, event_type = self._CompTime(co, idx, 'FirstEvent', 'FirstEvent_death', int_adj)
+
+        # Entity experiences some event within 10 years
+        event = t < 3650
+        label = ('Stage I Cancer Under Treatment', 'Stage II Cancer Under Treatment',
+                 'Advanced Cancer Under Treatment')[stage]
+        self._AddUtility(co, idx[event], label, est.Util_StageI_Tx)
+        recur = event & (event_type == 1)
+        death = event & (event_type == 2)
+        co.time_Recurrence[idx] = numpy.where(recur, start + t, 99999)
+        co.time_DeadofDisease[idx] = numpy.where(death, start + t, 99999)
+
+        # If death or recurrence occurs before 3 months, schedule at that time (the entity
+        #   returns to this state when it occurs). Otherwise, follow-up starts at 3 months
+        early = event & (t < 90)
+        co.endOfLife[idx[early & recur]] = 1
+        co.time_Sysp[idx[early]] += t[early]
+        co.time_Sysp[idx[~early]] += tx_time_treatment[~early]
+        co.state[idx[~early]] = STATE_FOLLOWUP
+
+        name = ('Stage I', 'Stage II', 'Advanced')[stage]
+        self._AddResource(co, idx[tx_prim == 0], 'Treatment - %s - Surgery'%name)
+        if stage == 0:
+            self._AddResource(co, idx[scenario], 'Experimental Surgery')
+        self._AddResource(co, idx[tx_prim == 1], 'Treatment - %s - Surgery + RT'%name)
+        self._AddResource(co, idx[tx_prim == 2], 'Treatment - %s - Other'%name)
+        if stage == 2:
+            self._AddResource(co, idx[scenario], 'Experimental Chemo')
+        self._Error(co, idx[tx_prim < 0], "Error: Entity has not been assigned a valid treatment")
+
+    def _RecurTx(self, co, idx):
+        """Treatment of recurrent cancer (SysP_RecurTx)"""
+        est = self._estimates
+        n = len(idx)
+        if n == 0:
+            return
+        tx_time_treatment = est.Tx_time_treatment.sample(n)
+        Txprob = numpy.random.random_sample(n)
+        co.prevRecur[idx[co.prevRecur[idx] < 0]] = 0
+
+        # Assign treatment type for the first recurrence
+        first = co.prevRecur[idx] == 0
+        tx = self._Categories('Tx_recurrence', Txprob[first])
+        co.tx_recur[idx[first]] = tx
+
+        start = co.allTime[idx]
+        co.time_Sysp[idx] = start
+        co.state[idx] = STATE_FOLLOWUP
+        self._AddUtility(co, idx, 'Recurrence Under Treatment', est.Util_Recur_Tx)
+
+        # First recurrence
+        f = idx[first]
+        tx_recur = co.tx_recur[f]
+        for code, name in ((0, 'Surgery'), (1, 'Nonsurgery')):
+            self._AddResource(co, f[tx_recur == code], 'Treatment - Recurrence - %s'%name)
+        cured = tx_recur <= 1
+        co.time_Sysp[f[cured]] += tx_time_treatment[first][cured]
+        self._AddUtility(co, f[cured], 'Recurring Cancer In Remission', est.Util_Recur_FU)
+        self._AddResource(co, f[tx_recur == 2], 'Treatment - Recurrence - Palliative')
+        self._AddResource(co, f[tx_recur == 3], 'Treatment - Recurrence - No Treatment')
+        no2recur = tx_recur >= 2
+        co.state[f[no2recur]] = STATE_TERMINAL
+        self._AddUtility(co, f[no2recur], 'Incurable disease', est.Util_Incurable)
+
+        t, event_type = self._CompTime(co, f, 'SecondEvent', 'SecondEvent_death')
+        event = t < 3650
+        recur = event & (event_type == 1)
+        death = event & (event_type == 2)
+        co.time_Recurrence[f] = numpy.where(recur, start[first] + t, 99999)
+        co.time_DeadofDisease[f] = numpy.where(death, start[first] + t, 99999)
+        early = event & (t < 90)
+        co.endOfLife[f[early & recur]] = 1
+        co.state[f[early & death]] = STATE_FOLLOWUP
+        co.time_Sysp[f[early]] = start[first][early] + t[early]
+        co.time_Recurrence[f[no2recur]] = 99999
+        co.time_DeadofDisease[f[no2recur]] = start[first][no2recur] + t[no2recur]
+        co.recurrence[f] = 0
+        co.prevRecur[f] = 1
+        self._Error(co, f[tx_recur < 0], "Error: Entity has not been assigned a valid treatment")
+
+        # Second recurrence
+        s = idx[~first]
+        self._AddUtility(co, s, 'Second Recurrence Under Treatment', est.Util_2Recur_Tx)
+        self._AddResource(co, s, 'Treatment - Second Recurrence')
+        co.time_Sysp[s] += tx_time_treatment[~first]
+        shape, scale = self._GenTime(co, s, 'TSRD')
+        time_DoD = start[~first] + numpy.random.weibull(shape, len(s))*scale
+        co.time_DeadofDisease[s] = numpy.where(time_DoD > 3650, 99999, time_DoD)
+        co.recurrence[s] = 0
+
+    def _Followup(self, co, idx):
+        """Post-treatment follow-up (SysP_Followup)"""
+        est = self._estimates
+        n = len(idx)
+        appInt = (est.Folup_time_appInt0to3.sample(n), est.Folup_time_appInt3to5.sample(n),
+                  est.Folup_time_appInt5to10.sample(n))
+
+        due = ~(co.time_Sysp[idx] > co.allTime[idx])
+        idx = idx[due]
+        appInt = [x[due] for x in appInt]
+        co.recurrence[idx[co.recurrence[idx] < 0]] = 0
+
+        stage = co.cancerStage[idx]
+        for codes, label, estimate in (((0, 3), 'Followup for Stage I cancer', est.Util_StageI_FU),
+                                       ((1,), 'Followup for Stage II cancer', est.Util_StageII_FU),
+                                       ((2,), 'Followup for Advanced cancer', est.Util_Advanced_FU),
+                                       ((4,), 'Followup for Recurring cancer', est.Util_Recur_FU)):
+            self._AddUtility(co, idx[numpy.isin(stage, codes)], label, estimate)
+        invalid = idx[(stage < 0) | (stage > 4)]
+
+        time_Folup = co.time_Folup[idx]
+        recurrence = co.recurrence[idx] == 1
+        bands = ((time_Folup <= 3*365.25, 'Follow-up appointment - 1 to 3'),
+                 ((3*365 < time_Folup) & (time_Folup <= 5*365.25), 'Follow-up appointment - 3 to 5'),
+                 ((5*365 < time_Folup) & (time_Folup <= 10*365.25), 'Follow-up appointment - 5 to 10'))
+        remaining = numpy.ones(len(idx), dtype=bool)
+        for (band, name), interval in zip(bands, appInt):
+            band &= remaining
+            remaining &= ~band
+            self._AddResource(co, idx[band], name)
+            # Entity has a detected recurrence
+            co.cancerStage[idx[band & recurrence]] = 5
+            co.state[idx[band & recurrence]] = STATE_CANCER
+            nxt = band & ~recurrence
+            co.time_Folup[idx[nxt]] += interval[nxt]
+            co.time_Sysp[idx[nxt]] += interval[nxt]
+
+        # Entity is in remission and receives no more care
+        final = idx[remaining & (time_Folup >= 10*365.25)]
+        self._AddResource(co, final, 'Follow-up appointment - final')
+        self._AddUtility(co, final, 'Cancer in remission', est.Util_Remission)
+        co.state[final] = STATE_REMISSION
+        co.time_Recurrence[final] = 666666
+        co.time_Sysp[final] = 555555
+
+        self._Error(co, invalid, "Error - Followup - entity does not have valid stage - see Sysp_Followup.py")
+
+    def _Remission(self, co, idx):
+        #entity is in remission, no further events occur
+        co.allTime[idx] = co.natHist_deathAge[idx] + 0.0001
+
+    def _Terminal(self, co, idx):
+        """Palliative care and end of life (SysP_Terminal)"""
+        est = self._estimates
+        co.time_Sysp[idx] = co.allTime[idx]
+
+        eol = idx[co.endOfLife[idx] == 1]
+        self._AddResource(co, eol, 'Treatment - End of Life')
+        self._AddUtility(co, eol, 'End of life', est.Util_EOL)
+        co.allTime[eol] = co.time_DeadofDisease[eol]      # Advance clock to death
+
+        idx = idx[co.endOfLife[idx] == 0]
+        incurable = idx[co.recurrence[idx] >= 0]
+        self._AddUtility(co, incurable, 'Incurable disease', est.Util_Incurable)
+        for code, month, name in ((2, co.palliativeMonth, 'Treatment - Palliative'),
+                                  (3, co.notxMonth, 'Treatment - Recurrence - No Treatment')):
+            group = incurable[co.tx_recur[incurable] == code]
+            # After 520 months, the entity is in remission and receives no more care
+            done = group[month[group] >= 520]
+            co.state[done] = STATE_REMISSION
+            co.time_Recurrence[done] = 666666
+            group = group[month[group] < 520]
+            self._AddResource(co, group, name)
+            month[group] += 1
+        co.time_Sysp[incurable] += 30                # Advance clock one month
+
+        self._Error(co, idx[co.recurrence[idx] < 0], "ERROR - Terminal Disease - entity is in the Terminal disease state, but has not recurred or been assigned an end of life flag. Check 'SysP_RecurTx' or 'Glb_Checktime'")
+
+    def _Dead(self, co, idx):
+        self._AddUtility(co, idx, 'Dead', None)
+        co.horizon_censor[idx[co.death_type[idx] == 1]] = 0
+        co.death_type[idx[co.horizon_censor[idx] == 1]] = 3
+
+    def _Report(self, co, idx):
+        for entities, message in co.errors:
+            for i in entities[numpy.isin(entities, idx)]:
+                print(i, "An error has occurred and the simulation must end")
+                print(message)
+
+    ############################################################################################
+    # MODEL OUTPUTS
+
+    def Survival(self, co):
+        """LYG and QALY for each entity, calculated the same way as 'Analyze_Output.EntitySurvival'"""
+        ent, code, time, value = co.utility.Columns()
+        return SurvivalKernel(ent, time, value, co.size, DailyDiscount(self._estimates))
+
+    def Cost(self, co, costdict):
+        """Discounted costs for each entity, calculated the same way as 'Analyze_Output.EntityCost'"""
+        ent, code, time, value = co.resources.Columns()
+        return CostKernel(ent, code, time, co.natHist_deathAge, co.size,
+                          CostTable(costdict, self.resource_names))
+
+    def Output(self, co, costdict):
+        """Return one row per entity of [LYG, QALY, Cost, OPL flag], entities who had an OPL
+        first, in the same layout as 'Sequencer.py'"""
+        LYG, QALY = self.Survival(co)
+        cost = self.Cost(co, costdict)
+
+        # Entities without an OPL who reach the time horizon live the maximum discounted LYG
+        discountrate = self._estimates.DiscountRate.mean
+        disc_rate = 1 - (1 - discountrate)**(1 / 365)
+        maxdays = self._estimates.timehorizon.mean*365
+        maxLYG = DiscountedYears(0, numpy.ceil(maxdays), disc_rate)
+        full = (co.OPLflag == 0) & (co.time_death == maxdays)
+        LYG[full] = maxLYG
+        QALY[full] = maxLYG*self._estimates.Util_Well.sample(full.sum())
+
+        order = numpy.concatenate((numpy.flatnonzero(co.OPLflag == 1), numpy.flatnonzero(co.OPLflag == 0)))
+        return numpy.c_[LYG, QALY, cost, co.OPLflag][order]
+
+
+####################################################
+# VARIABLES CREATED IN THIS STEP:
+#
+#   Cohort - the population, stored as one array per entity attribute
+#   resources - a cohort-wide log of resource use (entity, resource code, time)
+#   utility - a cohort-wide log of utility states (entity, utility code, time, value)
+#   resource_names - the name of each resource code, in the order they were first used
@@ -22,26 +22,49 @@ The program does the following:
     
     6 - Returns the event time and the type of event
 
+'CompTime.Batch' does the same for many entities at once, from arrays of their characteristics
+(see 'GenTime.Batch'), and 'CompetingEvents' does steps 1 to 5 for arrays of Weibull shapes and
+scales (it is also used by the cohort engine, 'Glb_CohortEngine.py').
+
 @author: icromwell
 """
 
 from Glb_GenTime import GenTime
-import random
+from Glb_RandomStreams import Uniform
+import numpy
+
+def CompetingEvents(shape1, scale1, shape2, scale2, probEst):
+    """Returns arrays of the event time and event type (1 - first event, 2 - competing event) for
+    each entity, from the Weibull shape and scale of the two events and a random probability for
+    each entity. Entities whose relative probability can't be worked out get event type 0."""
+    # 1 - Draw random value for time to next event
+    event_time = numpy.random.weibull(shape1, len(probEst))*scale1
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        # 2, 3 - Estimate probability of that value occurring within each event
+        prob1 = 1 - numpy.exp(-(event_time/scale1)**shape1)
+        prob2 = 1 - numpy.exp(-(event_time/scale2)**shape2)
+        # 4 - Calculate relative probability that event is the competing event
+        event_prob = prob2/prob1
+    # 5 - Evaluate relative probability against random probability
+    event_type = numpy.where(probEst < event_prob, 2, 1)
+    event_type[numpy.isnan(event_prob)] = 0
+    return event_time, event_type
 
 class CompTime:
     def __init__(self, estimates, regcoeffs):
         self._estimates = estimates
         self._regcoeffs = regcoeffs
-        self.probEst = random.random()
+        self.probEst = Uniform()
         
-    def Process(self, entity, tte1, tte2):
-        # Draw two survival functions for the entity
+    def Process(self, entity, tte1, tte2, int_adj=0):
+        # Draw two survival functions for the entity. 'int_adj' is subtracted from the intercept of
+        # both (e.g., the relative risk of a scenario; see 'GenTime.readVal')
         event1 = GenTime(self._estimates, self._regcoeffs)
         event2 = GenTime(self._estimates, self._regcoeffs)
         # Any event
-        event1.readVal(entity, str(tte1))
+        event1.readVal(entity, str(tte1), int_adj)
         # Competing event
-        event2.readVal(entity, str(tte2))
+        event2.readVal(entity, str(tte2), int_adj)
         
         # 1 - Draw random value for time to next event        
         event_time = event1.estTime()
@@ -61,4 +84,17 @@ class CompTime:
             entity.currentState = "Error - something has gone wrong in Glb_CompTime"
         
         return (event_time, event_type)
-        
\ No newline at end of file
+        
+
+    def Batch(self, covariates, tte1, tte2, int_adj=None):
+        """Returns arrays of the event time and event type for many entities at once. 'covariates'
+        is a dictionary of arrays of the entities' characteristics (see 'GenTime.Batch'), and
+        'int_adj' is each entity's adjustment to the intercepts (e.g., 'RR_Surgery'). Each entity
+        draws its own random probability. Event type 0 marks entities whose event couldn't be
+        worked out (the error state of 'Process')."""
+        events = GenTime(self._estimates, self._regcoeffs)
+        n = len(next(iter(covariates.values())))
+        probEst = numpy.random.random_sample(n)
+        mu1, shape1, scale1 = events.Batch(str(tte1), covariates, int_adj)
+        mu2, shape2, scale2 = events.Batch(str(tte2), covariates, int_adj)
+        return CompetingEvents(shape1, scale1, shape2, scale2, probEst)
@@ -1,36 +1,120 @@
 # -*- coding: utf-8 -*-
 """
-This code creates an entity with an expandable list of characteristics.
+This code creates an entity with a fixed list of characteristics.
 
 The entity is the main simulation unit.
+
+Every characteristic that the model can give an entity is declared in 'FIELDS', which is collected
+from the 'VARIABLES CREATED IN THIS STEP' notes at the end of each program (and from the programs
+that create variables without listing them). The entity stores its characteristics in slots
+rather than in a dictionary, which makes each entity several times smaller and speeds up reading
+and writing its characteristics. A new characteristic must be added to 'FIELDS' before a model
+process can use it.
+
+Characteristics that have not been created yet have the value None. Check for this value
+(e.g., 'if entity.firstOPL is None') instead of using 'hasattr'.
 """
 
+from Glb_EntityLog import ResourceLog, EventLog, UtilityLog
+
+FIELDS = (
+    # Glb_CreateEntity
+    'currentState', 'stateNum', 'allTime', 'time_Sysp', 'nh_status', 'nh_time', 'nh_det',
+    'natHist', 'resources', 'events', 'utility',
+    # Sequencer (policy scenario being analyzed)
+    'altscen', 'Scenario_Prev', 'Scenario_Prevention', 'Scenario_Screen', 'Scenario_Surg',
+    'Scenario_Chemo', 'Scenario_HPV', 'scenario_desc', 'OPLflag', 'RR_Surgery', 'RR_Chemo',
+    # Glb_ApplyInit, SysP_Prevention
+    'startAge', 'sex', 'smokeStatus', 'alcStatus', 'OPLStatus', 'hasDentist', 'hasCancer',
+    'hasOPL', 'diseaseDetected', 'diseaseDetectable', 'OPLDetected', 'cancerDetected',
+    'natHist_deathAge', 'probOPL',
+    # NatHist programs
+    'age', 'horizon_censor', 'OPLRisk', 'OPLHPV',
+    # Glb_CheckTime, Glb_EventQueue
+    'nhnum', 'loopcount', 'time_OPL', 'time_Cancer', 'time_cancerDetected', 'cancerStage',
+    'time_death', 'death_type', 'death_desc', 'recurrence', 'endOfLife', 'time_EOL',
+    'time_DeadofDisease', 'time_Recurrence', 'timestageIV', 'diagnosed', 'time_diagnosed',
+    'NEstatus', 'sympt', 'firstcancer',
+    # SysP_ScreenAppt
+    'count_DentAppt', 'count_ScreenAppt', 'count_ScreenInt', 'screenReturn', 'screened',
+    'flsNegCount', 'flsPosCount', 'time_Dentist', 'time_detectOPL', 'time_OPLDetected',
+    'OPLdetected', 'OPL_screenDetected', 'cancer_screenDetected', 'cancer_intervalDentist',
+    # SysP_OPLmanage
+    'firstOPL', 'time_OPLfu', 'tottime_OPLfu', 'discharge', 'hiriskdet', 'firstCancer',
+    # SysP_IncidentCancer, Glb_CancerFlags
+    'tx_prim', 'txType', 'hadSurgery', 'hadRT', 'hadChemo', 'RTCount', 'chemoCount',
+    'time_Folup', 'folupTime', 'time_recur',
+    # SysP_StageOneTx, SysP_StageTwoTx, SysP_StageAdvTx, SysP_RecurTx ('statenum' and
+    # 'time_deadOfDisease' are written under those names by the treatment programs)
+    'surgery', 'statenum', 'prevRecur', 'tx_recur', 'time_deadOfDisease',
+    # SysP_Terminal
+    'palliativeMonth', 'notxMonth', 'adv_hadSalvage', 'adv_reirrad', 'adv_chemoCount',
+    'chemoLimit', 'EoLMonth',
+    # Model Outputs
+    'age_Cancer', 'age_Diagnosed', 'age_death',
+    )
+
 class Entity(object):
+   __slots__ = FIELDS
+
    def __init__(self, **kwargs):
-       #This step allows the class to adopt any characteristic defined within the model       
-       self.__dict__.update(kwargs)
+       # Every characteristic starts out as "not yet created"
+       for field in FIELDS:
+           setattr(self, field, None)
+       #This step allows the class to adopt any characteristic defined in 'FIELDS'
+       for field, value in kwargs.items():
+           setattr(self, field, value)
        # These variables allow you to track where the entity is within the model
            # "currentState" is a text description of the state
            # "stateNum" is used by the sequencer to determine what action to take
        self.currentState = "Newly created entity"
        self.stateNum = 0.0
-       
+
        # "allTime" is a running counter of the amount of time elapsed within the simulation (i.e., survival time)
        self.allTime = 0
-       
+
        # "syspTime" denotes the time at which the next system process is scheduled to occur
-       self.time_Sysp = 0       
-       
-       # "nh_" refers to Natural History processes used in the "NatHist" programs to set out the 
+       self.time_Sysp = 0
+
+       # "nh_" refers to Natural History processes used in the "NatHist" programs to set out the
        self.nh_status = 0.0
        self.nh_time = 0
        self.nh_det = 0
-       
-       # Create lists to hold natural history, events, resources, and utility data
+
+       # Create a list to hold natural history data, and logs to hold events, resources, and utility data
+       # (see 'Glb_EntityLog.py')
        self.natHist = []
-       self.resources = []
-       self.events = []
-       self.utility = []
+       self.resources = ResourceLog()
+       self.events = EventLog()
+       self.utility = UtilityLog()
+
+   # Entities are saved (pickled) and copied as a tuple of values in the order of 'FIELDS'
+   def __getstate__(self):
+       return tuple([getattr(self, field) for field in FIELDS])
+
+   def __setstate__(self, state):
+       if isinstance(state, dict):
+           # Entities saved before they had a fixed list of characteristics (e.g., the
+           # 'Chap6_population' files) were saved as a dictionary of the characteristics they had
+           unknown = sorted(set(state) - set(FIELDS))
+           if unknown:
+               raise ValueError("The saved entity has characteristics that are not in FIELDS: %s"
+                                % ", ".join(unknown))
+           for field in FIELDS:
+               setattr(self, field, state.get(field))
+           # Their logs were lists of tuples
+           for field, log in (('resources', ResourceLog), ('events', EventLog), ('utility', UtilityLog)):
+               entries = getattr(self, field)
+               if isinstance(entries, list):
+                   setattr(self, field, log())
+                   for entry in entries:
+                       getattr(self, field).append(entry)
+           return
+       if len(state) != len(FIELDS):
+           raise ValueError("The saved entity has %d characteristics, but FIELDS lists %d"
+                            % (len(state), len(FIELDS)))
+       for field, value in zip(FIELDS, state):
+           setattr(self, field, value)
 
 
 # VARIABLES CREATED IN THIS STEP:
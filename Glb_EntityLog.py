@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Logs of the resources, events and utility values that an entity experiences.
+
+The model processes record what happens to an entity by appending tuples to its logs:
+
+    entity.resources.append(("Biopsy", entity.allTime))
+    entity.events.append(("Cancer first detected at OPL followup", entity.allTime))
+    entity.utility.append(("Detected OPL", value, entity.allTime))
+
+Storing each of these as a tuple holding a string and a float takes about 90 bytes per entry.
+Instead, each name is given a small integer code the first time it is used (a 'Registry' is kept
+for resources, events and utility states), and the log stores the codes, values and times in a
+single typed array (16 or 24 bytes per entry). The logs still accept the same tuples, and reading an
+entry (e.g., 'entity.resources[0]') gives back the tuple, so the rest of the model does not need
+to know how the entries are stored.
+
+'Codes()', 'Times()' and 'Values()' return copies of the columns of a log as numpy arrays, so
+that costing, survival and path analysis can work on a whole log at once. The resource names are
+the same as the keys of 'CostDict'.
+
+Example:
+    codes = entity.resources.Codes()
+    names = [Resources.Name(code) for code in codes]
+
+"""
+
+from array import array
+import numpy
+
+class Registry:
+    """Gives each name a code (0, 1, 2, ...) in the order that names are first used"""
+    def __init__(self, names=()):
+        self.names = []
+        self.codes = {}
+        for name in names:
+            self.Code(name)
+
+    def Code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.codes[name] = code
+            self.names.append(name)
+        return code
+
+    def Name(self, code):
+        return self.names[code]
+
+    def __len__(self):
+        return len(self.names)
+
+# One registry for each kind of log. Codes are only meaningful within one Python process; logs
+# that are saved to disk (pickled) store their names instead (see '__reduce__').
+Resources = Registry()
+Events = Registry()
+Utilities = Registry()
+
+class ResourceLog(object):
+    """A log of (name, time) entries"""
+    __slots__ = ('data',)
+    registry = Resources
+    width = 2           # The number of numbers stored for each entry
+
+    def __init__(self):
+        # The entries are stored one after the other in a single array: code, time, code, time, ...
+        self.data = array('d')
+
+    def append(self, entry):
+        name, time = entry
+        self.data.extend((self.registry.Code(name), time))
+
+    def __getitem__(self, i):
+        j = self._Start(i)
+        return (self.registry.names[int(self.data[j])], self.data[j+1])
+
+    def __delitem__(self, i):
+        j = self._Start(i)
+        del self.data[j:j + self.width]
+
+    def __len__(self):
+        return len(self.data)//self.width
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _Start(self, i):
+        # The position in 'data' of the first number of entry 'i'
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("log index out of range")
+        return i*self.width
+
+    def _Column(self, col):
+        return numpy.frombuffer(self.data, dtype=numpy.float64)[col::self.width].copy()
+
+    def Codes(self):
+        return self._Column(0).astype(numpy.uint16)
+
+    def Times(self):
+        return self._Column(self.width - 1)
+
+    def copy(self):
+        """Returns a new log holding the same entries"""
+        log = type(self).__new__(type(self))
+        log.data = array('d', self.data)
+        return log
+
+    # Logs are saved (pickled) as their list of entries, and re-coded when they are loaded
+    def __reduce__(self):
+        return (type(self), (), list(self))
+
+    def __setstate__(self, state):
+        self.__init__()
+        for entry in state:
+            self.append(entry)
+
+class EventLog(ResourceLog):
+    """A log of (name, time) entries"""
+    __slots__ = ()
+    registry = Events
+
+class UtilityLog(ResourceLog):
+    """A log of (name, utility value, time) entries"""
+    __slots__ = ()
+    registry = Utilities
+    width = 3
+
+    def append(self, entry):
+        name, value, time = entry
+        self.data.extend((self.registry.Code(name), value, time))
+
+    def __getitem__(self, i):
+        j = self._Start(i)
+        return (self.registry.names[int(self.data[j])], self.data[j+1], self.data[j+2])
+
+    def Values(self):
+        return self._Column(1)
@@ -19,6 +19,7 @@ Variable Type:
     7 - Exponential distribution (transition probability)
     8 - Beta distribution where values lie close to 1.0 or 0.0 (direct parameters)
     9 - Static value (i.e., does not vary)
+    10 - Exponential distribution with a fixed transition probability (see 'fixed' below)
     
 Dirichlet-distributed variables must be 
     
@@ -27,7 +28,22 @@ Code provided by Stavros Korokithakis of Stochastic Technologies (www.stavros.io
 """
 
 import numpy
-import math
+
+from Glb_RandomStreams import Buffer
+
+# Variable types whose single samples are drawn from a buffer. Weibull (3) and static (9) values,
+#   and Dirichlet counts (5), are used as they are.
+BUFFERED_TYPES = (1, 2, 4, 6, 7, 8, 10)
+
+# Groups of Dirichlet-distributed parameters (type 5), whose counts give the probabilities of a set
+#   of categories (see 'DirichletCategory'). A block whose parameters are all static values (type 9,
+#   e.g., after 'FixDirichlet') uses them as the probabilities.
+DIRICHLET_BLOCKS = {'OPLRisk': ('NatHist_OPLrisk_low', 'NatHist_OPLrisk_med', 'NatHist_OPLrisk_hi'),
+                    'Tx_stageI': ('Tx_stageI_probSurgery', 'Tx_stageI_probSurgeryRT', 'Tx_stageI_probOther'),
+                    'Tx_stageII': ('Tx_stageII_probSurgery', 'Tx_stageII_probSurgeryRT', 'Tx_stageII_probOther'),
+                    'Tx_adv': ('Tx_adv_probSurgery', 'Tx_adv_probSurgeryRT', 'Tx_adv_probOther'),
+                    'Tx_recurrence': ('Tx_recurrence_probSurgery', 'Tx_recurrence_probNonsurgery',
+                                      'Tx_recurrence_probPalliative', 'Tx_recurrence_probNoTx')}
 
 class Estimates:                                    # An empty class to hold data
     pass
@@ -38,34 +54,61 @@ class Estimate:                                     # A class to process the dat
         self.mean = mean                            # Define mean value
         self.se = se                                # Define standard error
 
-    def sample(self):                               # A function that checks variable type and samples a value accordingly
-        if self.type == 1:                                              # Beta-distributed variables (probabilities)
+    def sample(self, size=None):                    # A function that checks variable type and samples a value accordingly
+                                                    # 'size' returns an array of that many independent samples
+        # Single values are handed out from a buffer of values drawn together (see
+        #   'Glb_RandomStreams.Buffer'). The buffer is started again if the estimate is changed.
+        if size is None and self.type in BUFFERED_TYPES:
+            key = (self.type, self.mean, self.se)
+            buffer = self.__dict__.get('_buffer')
+            if buffer is None or buffer.key != key:
+                buffer = Buffer(self._draw, key)
+                self._buffer = buffer
+            return buffer.draw()
+        return self._draw(size)
+
+    def _params(self):
+        # The parameters of the distribution, worked out once from the mean and standard error
+        key = (self.type, self.mean, self.se)
+        params = self.__dict__.get('_distparams')
+        if params is None or params[0] != key:
             x = self.mean
             y = self.se
-            # Parameterization of the beta distribution
-            bdist_alpha = x*((x*(1-x)/y**2) - 1)
-            bdist_beta = (1-x)*(x*(1-x)/y**2 - 1)
-            
-            samp_value = numpy.random.beta(bdist_alpha, bdist_beta)
+            if self.type == 1:
+                # Parameterization of the beta distribution
+                params = (key, x*((x*(1-x)/y**2) - 1), (1-x)*(x*(1-x)/y**2 - 1))
+            elif self.type == 4:
+                # A formula to produce the shape and scale parameters
+                params = (key, x**2/y**2, y**2/x)
+            elif self.type == 7:
+                params = (key, x*((x*(1-x)/y**2) - 1), (1-x)*(x/y**2*(1-x) - 1))
+            elif self.type == 10:
+                params = (key, 1/(-(numpy.log(1.0 - x)/365.0)), None)
+            else:
+                params = (key, None, None)
+            self._distparams = params
+        return params[1], params[2]
+
+    def _draw(self, size=None):
+        if self.type == 1:                                              # Beta-distributed variables (probabilities)
+            bdist_alpha, bdist_beta = self._params()
+            samp_value = numpy.random.beta(bdist_alpha, bdist_beta, size)
             return samp_value
             
         elif self.type == 2:                                            # Normally-distributed variables
-            samp_value = numpy.random.normal(self.mean, self.se)
+            samp_value = numpy.random.normal(self.mean, self.se, size)
             if self.mean > 0:
                 return abs(samp_value)
             else:
                 return samp_value
             
         elif self.type == 3:                                            # Weibull-distributed variables
-            samp_value = numpy.random.weibull(self.mean, self.se)
+            samp_value = numpy.random.weibull(self.mean, self.se if size is None else size)
             return samp_value
             
         elif self.type == 4:                                            # Gamma-distributed variables
-            x = self.mean
-            y = self.se
-            gdist_shape = x**2/y**2                                    # A formula to produce the shape parameter
-            gdist_scale = y**2/x                                       # A formula to produce the scale parameter
-            samp_value = numpy.random.gamma(gdist_shape, gdist_scale)
+            gdist_shape, gdist_scale = self._params()
+            samp_value = numpy.random.gamma(gdist_shape, gdist_scale, size)
             return samp_value
             
         elif self.type == 5:
@@ -74,46 +117,250 @@ class Estimate:                                     # A class to process the dat
         elif self.type == 6:
             x = self.mean
             y = self.se
-            sampodds = numpy.random.normal(x, y)        # Randomly sample the log odds based on normally-distributed standard error
-            samp_value = math.exp(sampodds)/(1 + math.exp(sampodds))    # Convert odds back to probability
+            sampodds = numpy.random.normal(x, y, size)  # Randomly sample the log odds based on normally-distributed standard error
+            samp_value = numpy.exp(sampodds)/(1 + numpy.exp(sampodds))  # Convert odds back to probability
             return samp_value
             
         elif self.type == 7:
             # Step 1: generate random estimate of the transition probability
-            x = self.mean
-            y = self.se
-            bdist_alpha = x*((x*(1-x)/y**2) - 1)
-            bdist_beta = (1-x)*(x/y**2*(1-x) - 1)
-            est_tp = numpy.random.beta(bdist_alpha, bdist_beta)
-            if est_tp < 1.0:
-                pass
-            else:
-                est_tp = 0.9999
+            bdist_alpha, bdist_beta = self._params()
+            est_tp = numpy.random.beta(bdist_alpha, bdist_beta, size)
+            est_tp = numpy.where(est_tp < 1.0, est_tp, 0.9999)
             
             # Step 2: generate random draw from exponential distribution
                 # NOTE: probabilities must be entered into the table as year-long cycle lengths
-            lmbd = -(math.log(1.0 - est_tp)/365.0)
+            lmbd = -(numpy.log(1.0 - est_tp)/365.0)
             beta = 1/lmbd
-            samp_value = numpy.random.exponential(beta)
+            samp_value = numpy.random.exponential(beta, size)
             return samp_value
             
         elif self.type == 8:
-            samp_value = numpy.random.beta(self.mean, self.se)
+            samp_value = numpy.random.beta(self.mean, self.se, size)
             return samp_value
             
         elif self.type == 9:
-            samp_value = self.mean
+            if size is None:
+                samp_value = self.mean
+            else:
+                samp_value = numpy.full(size, self.mean, dtype=float)
+            return samp_value
+            
+        elif self.type == 10:
+            # Random draw from an exponential distribution with a known transition probability
+            beta, _ = self._params()
+            samp_value = numpy.random.exponential(beta, size)
             return samp_value
             
         else:
             print("Please specify a variable type in the input table")
 
+    # The buffers and worked-out parameters aren't saved (pickled) or copied with the estimate
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('_buffer', None)
+        state.pop('_distparams', None)
+        return state
+
+    def fixed(self):                                # Returns an Estimate that is fixed at one random draw of this parameter
+                                                    # Used by probabilistic sensitivity analysis (see 'Glb_PSA.py')
+        if self.type == 7:
+            # Only the transition probability is drawn. Times to event are still drawn for each entity.
+            x = self.mean
+            y = self.se
+            bdist_alpha = x*((x*(1-x)/y**2) - 1)
+            bdist_beta = (1-x)*(x/y**2*(1-x) - 1)
+            est_tp = min(numpy.random.beta(bdist_alpha, bdist_beta), 0.9999)
+            return Estimate(10, est_tp, 0)
+        
+        elif self.type in (3, 5, 9, 10) or not self.se:
+            # Weibull times to event, Dirichlet counts, static values and parameters without a
+            # standard error are used as they are
+            return self
+        
+        else:
+            return Estimate(9, float(self.sample()), 0)
 
     def __str__(self):
         return "<Estimate: %s, %s, %s>" % (self.type, self.mean, self.se)
     __repr__ = __str__
-    
+
+class _Parameter(Estimate):
+    # An estimate held in a 'ParameterVector'. It works like any other estimate, but tells the
+    #   vector when its type, mean or standard error is changed, so the vector's arrays are redone.
+    def __init__(self, vector, etype, mean, se):
+        object.__setattr__(self, '_vector', vector)
+        Estimate.__init__(self, etype, mean, se)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in ('type', 'mean', 'se'):
+            object.__setattr__(self._vector, '_arrays', None)
+
+    # Saved (pickled) or copied on its own, it is a plain estimate
+    def __reduce__(self):
+        return (Estimate, (self.type, self.mean, self.se))
+
+class ParameterVector(Estimates):
+    """An 'Estimates' object that also keeps the type, mean and standard error of its parameters as
+    arrays (in the order they were added), so that a whole set of parameters can be drawn at once.
+
+    The parameters are still attributes ('estimates.Util_Well.sample()', 'estimates.X.mean = 0.5'),
+    and other values (e.g., the probabilities set by 'diriSample') can be kept with them. The
+    arrays are worked out again the first time they are used after a parameter is added, removed
+    or changed.
+
+    Example:
+        estimates = ParameterVector(estimates)
+        values = estimates.Sample(1000)                 # One row of parameter values per set
+        values[:, estimates.Index('Util_Well')]
+        drawn = estimates.Draw()                        # 'Estimate.fixed' for every parameter
+    """
+    __slots__ = ('_arrays',)
+
+    def __init__(self, estimates=None):
+        object.__setattr__(self, '_arrays', None)
+        if estimates is not None:
+            for name, value in vars(estimates).items():
+                setattr(self, name, value)
+
+    def __setattr__(self, name, value):
+        if isinstance(value, Estimate):
+            value = _Parameter(self, value.type, value.mean, value.se)
+            object.__setattr__(self, '_arrays', None)
+        elif isinstance(self.__dict__.get(name), _Parameter):
+            object.__setattr__(self, '_arrays', None)
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        if isinstance(self.__dict__.get(name), _Parameter):
+            object.__setattr__(self, '_arrays', None)
+        object.__delattr__(self, name)
+
+    def _Arrays(self):
+        # (names, {name: index}, type, mean, se, {type: indices of the parameters of that type})
+        arrays = self._arrays
+        if arrays is None:
+            params = [(name, value) for name, value in self.__dict__.items() if isinstance(value, _Parameter)]
+            names = [name for name, _ in params]
+            nums = lambda x: numpy.nan if x is None else x
+            etype = numpy.array([nums(p.type) for _, p in params], dtype=float)
+            mean = numpy.array([nums(p.mean) for _, p in params], dtype=float)
+            se = numpy.array([nums(p.se) for _, p in params], dtype=float)
+            groups = {t: numpy.flatnonzero(etype == t) for t in numpy.unique(etype[~numpy.isnan(etype)]).tolist()}
+            arrays = (names, {name: i for i, name in enumerate(names)}, etype, mean, se, groups)
+            object.__setattr__(self, '_arrays', arrays)
+        return arrays
+
+    def Names(self):
+        """The names of the parameters, in the order of the arrays"""
+        return list(self._Arrays()[0])
+
+    def Index(self, name):
+        """The position of parameter 'name' in the arrays"""
+        return self._Arrays()[1][name]
+
+    def Arrays(self):
+        """Returns copies of the arrays of the parameters' type, mean and standard error (None is
+        shown as 'nan')"""
+        _, _, etype, mean, se, _ = self._Arrays()
+        return etype.copy(), mean.copy(), se.copy()
+
+    def _Values(self, k, fixed):
+        # One value of every parameter ('k = None') or 'k' rows of values, drawn with one call for
+        #   each variable type. With 'fixed = True', only the transition probability of times to
+        #   event (type 7) is drawn, as 'Estimate.fixed' does.
+        _, _, etype, mean, se, groups = self._Arrays()
+        shape = (len(etype),) if k is None else (k, len(etype))
+        values = numpy.full(shape, numpy.nan)
+        # Parameters without a standard error don't vary
+        nose = (se == 0) | numpy.isnan(se)
+        for t, idx in groups.items():
+            if t in (1, 2, 4, 6, 7, 8):
+                values[..., idx[nose[idx]]] = mean[idx[nose[idx]]]
+                idx = idx[~nose[idx]]
+            if len(idx) == 0:
+                continue
+            size = (len(idx),) if k is None else (k, len(idx))
+            x, y = mean[idx], se[idx]
+            if t in (1, 7):
+                # Parameterization of the beta distribution
+                samp = numpy.random.beta(x*((x*(1-x)/y**2) - 1), (1-x)*(x*(1-x)/y**2 - 1), size)
+                if t == 7:
+                    samp = numpy.where(samp < 1.0, samp, 0.9999)
+                    if not fixed:
+                        samp = numpy.random.exponential(1/(-(numpy.log(1.0 - samp)/365.0)), size)
+            elif t == 2:
+                samp = numpy.random.normal(x, y, size)
+                samp = numpy.where(x > 0, numpy.abs(samp), samp)
+            elif t == 4:
+                samp = numpy.random.gamma(x**2/y**2, y**2/x, size)
+            elif t == 6:
+                sampodds = numpy.random.normal(x, y, size)
+                samp = numpy.exp(sampodds)/(1 + numpy.exp(sampodds))
+            elif t == 8:
+                samp = numpy.random.beta(x, y, size)
+            elif t == 9:
+                samp = numpy.broadcast_to(x, size)
+            elif t == 10:
+                samp = numpy.random.exponential(1/(-(numpy.log(1.0 - x)/365.0)), size)
+            else:
+                # Weibull (3) and Dirichlet (5) parameters have no single value
+                continue
+            values[..., idx] = samp
+        return values
+
+    def Sample(self, k=None):
+        """One sampled value of every parameter, as an array in the order of 'Names' (or, with 'k',
+        an array of 'k' rows of values). Each value is drawn as 'Estimate.sample' would draw it;
+        parameters without a standard error are given their mean, and Weibull (3) and Dirichlet
+        (5) parameters are 'nan'."""
+        return self._Values(k, False)
+
+    def Draw(self, k=None):
+        """A new 'ParameterVector' in which every parameter is fixed at one random draw (see
+        'Estimate.fixed'), or, with 'k', a list of 'k' of them. The probabilities of each Dirichlet
+        block are fixed too (see 'FixDirichlet'). Values that aren't parameters are copied as they
+        are."""
+        _, index, etype, mean, se, _ = self._Arrays()
+        values = self._Values(1 if k is None else k, True)
+        # The parameters that 'Estimate.fixed' leaves as they are
+        keep = numpy.isin(etype, (3, 5, 9, 10)) | (se == 0) | numpy.isnan(se)
+        for names in DIRICHLET_BLOCKS.values():
+            cols = [index[name] for name in names if name in index]
+            if len(cols) == len(names) and not (etype[cols] == 9).all():
+                values[:, cols] = numpy.random.dirichlet(mean[cols], len(values))
+                keep[cols] = False
+        drawn = []
+        for row in values.tolist():
+            vector = ParameterVector()
+            i = 0
+            for name, value in self.__dict__.items():
+                if isinstance(value, _Parameter):
+                    if keep[i]:
+                        setattr(vector, name, value)
+                    elif value.type == 7:
+                        setattr(vector, name, Estimate(10, row[i], 0))
+                    else:
+                        setattr(vector, name, Estimate(9, row[i], 0))
+                    i += 1
+                else:
+                    setattr(vector, name, value)
+            drawn.append(vector)
+        return drawn[0] if k is None else drawn
+
+    # Saved (pickled) or copied as the parameters' type, mean and standard error, and the other values
+    def __getstate__(self):
+        return [(name, (value.type, value.mean, value.se) if isinstance(value, _Parameter) else value,
+                 isinstance(value, _Parameter)) for name, value in self.__dict__.items()]
+
+    def __setstate__(self, state):
+        object.__setattr__(self, '_arrays', None)
+        for name, value, isparam in state:
+            setattr(self, name, Estimate(*value) if isparam else value)
+
 def diriSample(estimates, names, values):
+    # Kept for older programs; the model processes use 'DirichletCategory', which doesn't change
+    #   'estimates'
 
     # A function that produces 'broken stick' estimates of probabilities from counts of >2 inputs           
     dirich = numpy.random.dirichlet(values)
@@ -121,6 +368,60 @@ def diriSample(estimates, names, values):
     # Produce an estimate of each variable, and assign it the name from the "names" string    
     for i in range(0,len(values)):
         setattr(estimates, names[i], dirich[i])     
+
+# Buffers of Dirichlet draws, one for each set of counts
+_dirichlet = {}
+
+def DirichletWeights(estimates, block, size=None):
+    """The probabilities of the categories of a Dirichlet block (see 'DIRICHLET_BLOCKS'), drawn from
+    the counts in 'estimates': one draw as a list, or 'size' draws as an array with one row each"""
+    params = [getattr(estimates, name) for name in DIRICHLET_BLOCKS[block]]
+    if all(param.type == 9 for param in params):
+        # The probabilities are fixed
+        weights = [param.mean for param in params]
+        return weights if size is None else numpy.tile(numpy.array(weights, dtype=float), (size, 1))
+    counts = tuple(param.mean for param in params)
+    if size is not None:
+        return numpy.random.dirichlet(counts, size)
+    buffer = _dirichlet.get(counts)
+    if buffer is None:
+        buffer = Buffer(lambda n: numpy.random.dirichlet(counts, n), counts)
+        _dirichlet[counts] = buffer
+    return buffer.draw()
+
+def DirichletCategory(estimates, block, u, weights=None):
+    """The category (0, 1, ...) of one entity with uniform random number 'u', from one draw of the
+    probabilities of a Dirichlet block (or the given 'weights'). If 'u' lies beyond the sum of the
+    probabilities (which, for probabilities that add up to 1, only happens through rounding), it
+    is in the last category."""
+    if weights is None:
+        weights = DirichletWeights(estimates, block)
+    bound = 0
+    for category, weight in enumerate(weights):
+        bound += weight
+        if u <= bound:
+            return category
+    return category
+
+def DirichletCategories(estimates, block, u, weights=None):
+    """The categories of a batch of entities (see 'DirichletCategory'), with a separate draw of the
+    probabilities for each entity. 'weights' gives one set of probabilities for every entity, or a
+    row for each one."""
+    u = numpy.asarray(u, dtype=float)
+    if weights is None:
+        weights = DirichletWeights(estimates, block, len(u))
+    bounds = numpy.cumsum(numpy.broadcast_to(weights, (len(u), len(DIRICHLET_BLOCKS[block]))), axis=1)
+    category = (u[:, None] > bounds).sum(axis=1)
+    return numpy.minimum(category, bounds.shape[1] - 1)
+
+def FixDirichlet(estimates):
+    """Fix the probabilities of every Dirichlet block in 'estimates' at one random draw, by replacing
+    its counts with static (type 9) values. Used for the parameter draws of a PSA iteration."""
+    for block, names in DIRICHLET_BLOCKS.items():
+        if all(hasattr(estimates, name) for name in names):
+            weights = DirichletWeights(estimates, block, 1)[0]
+            for name, weight in zip(names, weights.tolist()):
+                setattr(estimates, name, Estimate(9, weight, 0))
     
 """    
 workbook = load_workbook('ImportTest.xlsx')
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+A discrete-event scheduler for a single entity, used by the entity loop in 'Glb_SimEntity.py'
+when the SimEntity object is created with scheduler = 'queue'.
+
+This is an alternative timing model, not a faster version of 'Glb_CheckTime.py'. The model's
+scheduler is still 'CheckTime' (with its loop counter, which stops entities that are stuck in a
+Sysp/allTime loop), and the queue gives different results (see below).
+
+'CheckTime' is called at the start of every loop and compares all of the entity's clocks
+(time_Sysp, the next row of 'natHist', time_Recurrence, time_DeadofDisease, natHist_deathAge)
+to work out what happens next. Several loops are spent just moving the clock forward: a
+natural history event takes one loop to reach and another to apply, and entities with no
+dentist move their system process clock forward 1000 days at a time until something happens.
+
+Here, each of the entity's upcoming events is put into a priority queue (a heap) with its
+time and type. The loop takes the next event off the queue, applies it, and runs the process
+for the entity's state. Events are re-scheduled from the entity's clocks after every step, so
+the model processes can keep changing 'time_Sysp', 'time_Recurrence', etc. as they always have.
+
+Event types:
+    EV_NATDEATH     - Death from natural causes
+    EV_HORIZON      - The entity reaches the model time horizon
+    EV_DISEASEDEATH - Death from oral cancer
+    EV_EOL          - Start of end-of-life care (90 days before death from oral cancer)
+    EV_RECURRENCE   - Cancer recurs
+    EV_SYSP         - The next system process event (screening, follow-up, treatment, etc.)
+    EV_NATHIST      - The next natural history event (see 'Glb_CheckTime.NatHistEvent')
+
+Events that occur at the same time are applied in the order listed above.
+
+Differences from 'CheckTime':
+    The event queue does not give the same results as the 'CheckTime' loop, which is why it
+    is not used by default. 'CheckTime' doesn't apply events in time order: it compares the
+    clocks in a fixed order, counts natural death as reached within a day of it, takes two
+    passes to apply a natural history event and runs the processes on passes that only move
+    the clock. A queue that gave the same results would have to copy those rules one by one,
+    so the queue keeps to time order instead:
+    - the process for the entity's state is only run at its system process event or when the
+      entity changes state, so OPL surveillance counters don't advance on passes that only
+      move the clock (there are slightly fewer surveillance biopsies);
+    - entities with no dentist (state 1.8) have no system process events, instead of moving
+      their system process clock forward 1000 days at a time;
+    - clocks that have fallen behind are applied at the current time, rather than moving the
+      entity's clock backwards;
+    - recurrences and deaths from disease that occur before natural death are applied even
+      when the next system process event falls after natural death ('CheckTime' skips them).
+
+"""
+
+import heapq
+
+from Glb_CheckTime import NaturalDeath, DiseaseDeath, Recurrence, NatHistEvent
+
+EV_NATDEATH = 0
+EV_HORIZON = 1
+EV_DISEASEDEATH = 2
+EV_EOL = 3
+EV_RECURRENCE = 4
+EV_SYSP = 5
+EV_NATHIST = 6
+
+EventName = {EV_NATDEATH: "Natural death",
+             EV_HORIZON: "Model time horizon",
+             EV_DISEASEDEATH: "Death from oral cancer",
+             EV_EOL: "End of life",
+             EV_RECURRENCE: "Recurrence",
+             EV_SYSP: "System process",
+             EV_NATHIST: "Natural history"}
+
+class EventQueue:
+    def __init__(self):
+        self._heap = []
+        self._times = {}            # The time at which each type of event is currently scheduled
+
+    def Schedule(self, kind, time):
+        """Schedule the next event of type 'kind'. Replaces any earlier scheduling of that type."""
+        if self._times.get(kind) != time:
+            self._times[kind] = time
+            heapq.heappush(self._heap, (time, kind))
+
+    def Cancel(self, kind):
+        self._times.pop(kind, None)
+
+    def Pop(self):
+        """Remove and return the next event as (time, kind), or None if nothing is scheduled"""
+        while self._heap:
+            time, kind = heapq.heappop(self._heap)
+            # Entries that have since been re-scheduled or cancelled are skipped
+            if self._times.get(kind) == time:
+                del self._times[kind]
+                return time, kind
+        return None
+
+    def __len__(self):
+        return len(self._times)
+
+def ScheduleEvents(entity, queue):
+    """Put the entity's next event of each type into the queue, based on its current clocks"""
+    now = entity.allTime
+    # Events can't happen in the past. If a clock has fallen behind (e.g., 'Terminal' moves the
+    # clock to the time of death) the event happens now, in the order of the event types.
+
+    # Death from natural causes, or the end of the model time horizon
+    if entity.horizon_censor == 1:
+        queue.Cancel(EV_NATDEATH)
+        queue.Schedule(EV_HORIZON, max(entity.natHist_deathAge, now))
+    else:
+        queue.Cancel(EV_HORIZON)
+        queue.Schedule(EV_NATDEATH, max(entity.natHist_deathAge, now))
+
+    # Entities without detected disease follow their natural history
+    if entity.nhnum is None:
+        entity.nhnum = 0
+    if entity.cancerDetected == 0:
+        queue.Cancel(EV_DISEASEDEATH)
+        queue.Cancel(EV_EOL)
+        queue.Cancel(EV_RECURRENCE)
+        if entity.nhnum < len(entity.natHist):
+            queue.Schedule(EV_NATHIST, max(float(entity.natHist[entity.nhnum][2]), now))
+        else:
+            queue.Cancel(EV_NATHIST)
+
+    # Entities with detected disease can have a recurrence, reach end of life, or die of disease
+    elif entity.cancerDetected == 1:
+        queue.Cancel(EV_NATHIST)
+        time_DeadofDisease = entity.time_DeadofDisease
+        if time_DeadofDisease is not None:
+            queue.Schedule(EV_DISEASEDEATH, max(time_DeadofDisease, now))
+            # End of life starts once for each scheduled time of death
+            if entity.time_EOL != time_DeadofDisease - 90:
+                queue.Schedule(EV_EOL, max(time_DeadofDisease - 90, now))
+            else:
+                queue.Cancel(EV_EOL)
+        if entity.time_Recurrence is not None:
+            queue.Schedule(EV_RECURRENCE, max(entity.time_Recurrence, now))
+
+    # People with no dentist have no system process events; they wait for a disease event
+    if entity.stateNum == 1.8:
+        queue.Cancel(EV_SYSP)
+    else:
+        queue.Schedule(EV_SYSP, max(entity.time_Sysp, now))
+
+def ApplyEvent(entity, estimates, time, kind):
+    """Advance the entity's clock to 'time' and apply the event"""
+    entity.allTime = time
+    entity.age = entity.startAge + int(entity.allTime/365.25)
+
+    if kind == EV_NATDEATH or kind == EV_HORIZON:
+        NaturalDeath(entity)
+
+    elif kind == EV_DISEASEDEATH:
+        DiseaseDeath(entity)
+
+    # Entity is three months from death
+    elif kind == EV_EOL:
+        entity.time_EOL = entity.time_DeadofDisease - 90
+        entity.time_Recurrence = 666666     # Future recurrence set to impossible date
+        entity.stateNum = 5.0               # Entity is in the "terminal disease" health state
+        entity.currentState = "End of Life"
+        entity.endOfLife = 1
+
+    elif kind == EV_RECURRENCE:
+        Recurrence(entity)
+
+    elif kind == EV_NATHIST:
+        nextNatAr = entity.natHist[entity.nhnum]
+        entity.nhnum += 1
+        NatHistEvent(entity, estimates, float(nextNatAr[1]), float(nextNatAr[2]))
+
+    # EV_SYSP: the clock has reached the next system process, which is run by the entity's state
+
+####################################################
+# VARIABLES CREATED IN THIS STEP:
+#
+#   nhnum - the row of 'natHist' that holds the entity's next natural history event
+#   time_EOL - the time that the entity started end-of-life care
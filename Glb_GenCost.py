@@ -116,7 +116,7 @@ class GenCost:
                     Sigma = self._regcoeffs[param]['Sigma']['mean']
                 
                 # Identify values for all other coefficients
-                elif factor in entity.__dict__.keys():   
+                elif getattr(entity, factor, None) is not None:   
                     value = getattr(entity, factor)
                     
                     if self._regcoeffs[param][factor]['vartype'] == 2:
@@ -125,7 +125,7 @@ class GenCost:
                         coeff += self._regcoeffs[param][factor][value]['mean']
             
                 # If the entity doesn't have the required factor    
-                elif factor not in entity.__dict__.keys():                                  
+                elif getattr(entity, factor, None) is None:                                  
                     entity.stateNum = 99
                     entity.currentState = "Error - could not estimate %s as entity is missing %s"%(param, factor)
                 
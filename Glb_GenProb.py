@@ -62,7 +62,7 @@ class GenTime:
                     pass
                 
                 # Identify values for all coefficients
-                elif factor in entity.__dict__.keys():   
+                elif getattr(entity, factor, None) is not None:   
                     value = getattr(entity, factor)
                     
                     if regcoeffs[param][factor]['vartype'] == 2:
@@ -71,7 +71,7 @@ class GenTime:
                         coeff += regcoeffs[param][factor][value]['mean']
             
                 # If the entity doesn't have the required factor    
-                elif factor not in entity.__dict__.keys():                                  
+                elif getattr(entity, factor, None) is None:                                  
                     entity.stateNum = 99
                     entity.currentState = "Error - could not estimate %s as entity is missing %s"%(param, factor)                
                 
@@ -32,57 +32,135 @@ The function will also return an error if the entity does not have all of the Fa
 that are loaded into the regression. So, for example, if the entity does not have a value
 for "age", the function will return an error.
 
+The regression table is compiled the first time it is used (see 'RegModel'): each parameter's
+continuous coefficients are kept in a list, and each categorical factor gets a table of the
+coefficient for every level. 'readVal' reads the compiled model instead of searching the nested
+dictionaries, and 'Batch' works out mu, shape and scale (and 'BatchTimes' draws the times to event)
+for many entities at once, from arrays of their characteristics.
+
 @author: icromwell
 
 Code provided by Stavros Korokithakis of Stochastic Technologies (www.stavros.io)
 """
 
 import math
+from collections import OrderedDict
 import numpy
 
+class RegModel:
+    """The regression coefficients of one parameter, compiled for fast look-ups. The intercept
+    and sigma are read from the table each time they are used, so changes to the table after it
+    is compiled are still used. Scenario adjustments to the intercept (e.g., the relative risk of
+    the surgical scenario) are passed to 'readVal' and 'Mu' as 'int_adj' instead of being written
+    into the table."""
+    def __init__(self, coeffs):
+        self._intercept = coeffs['Intercept']
+        self._sigma = coeffs['Sigma']
+        self.factors = []           # (factor, vartype, coefficient) in the order of the table.
+        self.levels = {}            # For categorical factors, 'coefficient' is {level: coefficient}
+        for factor in coeffs:
+            if factor in ('Intercept', 'Sigma'):
+                continue
+            vartype = coeffs[factor]['vartype']
+            if vartype == 2:
+                self.factors.append((factor, vartype, coeffs[factor]['mean']))
+            else:
+                levels = {level: value['mean'] for level, value in coeffs[factor].items()
+                          if isinstance(value, dict)}
+                self.levels[factor] = levels
+                self.factors.append((factor, vartype, levels))
+
+    @property
+    def intercept(self):
+        return self._intercept['mean']
+
+    @property
+    def sigma(self):
+        return self._sigma['mean']
+
+    def Table(self, factor, levels):
+        """The coefficient of each level in 'levels' of a categorical factor, as an array (levels
+        that are missing from the regression table produce 'nan')"""
+        table = self.levels[factor]
+        return numpy.array([table.get(level, numpy.nan) for level in levels], dtype=float)
+
+    def Mu(self, covariates, int_adj=None):
+        """The linear predictor for each entity, from a dictionary of arrays of each factor
+        (the level of categorical factors, or the value of continuous factors)"""
+        n = len(next(iter(covariates.values()))) if covariates else 1
+        # The coefficients are added up in the same order as 'GenTime.readVal'
+        coeff = numpy.zeros(n)
+        for factor, vartype, value_coeff in self.factors:
+            if factor not in covariates:
+                raise KeyError("Could not estimate the regression as entities are missing %s"%factor)
+            values = numpy.asarray(covariates[factor])
+            if vartype == 2:
+                coeff += value_coeff*values
+            else:
+                # Each entity's level is matched to the coefficient table once per distinct level
+                levels, codes = numpy.unique(values, return_inverse=True)
+                coeff += self.Table(factor, levels.tolist())[codes.reshape(-1)]
+        intercept = self.intercept
+        if int_adj is not None:
+            intercept = intercept - numpy.asarray(int_adj, dtype=float)
+        return intercept + coeff
+
+# The compiled models of the regression tables used so far. The table itself is kept with its
+#   models, so that its 'id' isn't re-used while it is in the cache.
+_compiled = OrderedDict()
+
+def Compile(regcoeffs):
+    """The compiled 'RegModel' of every parameter in 'regcoeffs', as a dictionary"""
+    key = id(regcoeffs)
+    cached = _compiled.get(key)
+    if cached is not None and cached[0] is regcoeffs and len(cached[1]) == len(regcoeffs):
+        return cached[1]
+    models = {param: RegModel(coeffs) for param, coeffs in regcoeffs.items()}
+    _compiled[key] = (regcoeffs, models)
+    if len(_compiled) > 64:
+        _compiled.popitem(last=False)
+    return models
+
 "Define a function to draw estimates of time based on the regression coefficients"
 
 class GenTime:
     def __init__(self, estimates, regcoeffs):
         self._estimates = estimates
         self._regcoeffs = regcoeffs
+        self._models = Compile(regcoeffs)
 
-    def readVal(self, entity, param):
+    def readVal(self, entity, param, int_adj=0):
+        # 'int_adj' is subtracted from the intercept (e.g., the relative risk of a scenario)
         
         # Is the parameter being estimated contained within the Excel sheet?
-        if param in self._regcoeffs:
+        model = self._models.get(param)
+        if model is not None:
    
             # The sum of the coefficients starts at zero
             coeff = 0
      
             # For a given factor of a parameter within the Excel sheet
-            for factor in self._regcoeffs[param].keys():      
-                
-                # Identify the intercept
-                if factor == 'Intercept':            
-                    Intercept = self._regcoeffs[param]['Intercept']['mean']
-                    
-                # Identify the shape parameter from the output                 
-                elif factor == 'Sigma':                
-                    Sigma = self._regcoeffs[param]['Sigma']['mean']
+            for factor, vartype, value_coeff in model.factors:
+                value = getattr(entity, factor, None)
                 
                 # Identify values for all other coefficients
-                elif factor in entity.__dict__.keys():   
-                    value = getattr(entity, factor)
-                    
-                    if self._regcoeffs[param][factor]['vartype'] == 2:
-                        coeff += self._regcoeffs[param][factor]['mean'] * value
+                if value is not None:
+                    if vartype == 2:
+                        coeff += value_coeff * value
                     else:
-                        coeff += self._regcoeffs[param][factor][value]['mean']
+                        coeff += value_coeff[value]
             
                 # If the entity doesn't have the required factor    
-                elif factor not in entity.__dict__.keys():                                  
+                else:
                     entity.stateNum = 99
                     entity.currentState = "Error - could not estimate %s as entity is missing %s"%(param, factor)
                 
             # Produce an estimate of time from the regression
-            mu = Intercept + coeff         
-            shape = 1/Sigma
+            intercept = model.intercept
+            if int_adj:
+                intercept -= int_adj
+            mu = intercept + coeff         
+            shape = 1/model.sigma
             scale = math.exp(mu)
             
             self.mu = mu
@@ -100,5 +178,24 @@ class GenTime:
 
     # Estimate the probability (CDF) of being alive at a given time
     def estProb(self, time):
-        estimate_probability = numpy.math.exp(-(time/self.scale)**self.shape)
-        return estimate_probability
\ No newline at end of file
+        estimate_probability = math.exp(-(time/self.scale)**self.shape)
+        return estimate_probability
+
+    def Batch(self, param, covariates, int_adj=None):
+        """Returns arrays of mu, shape and scale of 'param' for many entities at once. 'covariates'
+        is a dictionary of arrays of the entities' characteristics (e.g., {'age': ages, 'sex':
+        sexes}; see 'Covariates'), and 'int_adj' is subtracted from each entity's intercept."""
+        model = self._models[param]
+        mu = model.Mu(covariates, int_adj)
+        shape = numpy.full(len(mu), 1/model.sigma)
+        return mu, shape, numpy.exp(mu)
+
+    def BatchTimes(self, param, covariates, int_adj=None):
+        """Randomly sample an event time for each entity from its Weibull distribution"""
+        mu, shape, scale = self.Batch(param, covariates, int_adj)
+        return numpy.random.weibull(shape)*scale
+
+def Covariates(entities, factors):
+    """A dictionary of arrays of the characteristics 'factors' of a list of entities, for
+    'GenTime.Batch'"""
+    return {factor: numpy.array([getattr(entity, factor) for entity in entities]) for factor in factors}
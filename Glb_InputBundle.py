@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Compile the model's input workbooks into a single checked bundle, and re-use it until the
+workbooks change.
+
+Every run of the Sequencer used to open 'InputParameters.xlsx' and 'Alt_Parameters.xlsx' with
+openpyxl, read the Inputs, RegCoeffs and Costs sheets row by row, write 'estimates.pickle',
+'regcoeffs.pickle' and 'costdict.pickle', and then read them straight back. 'LoadInputs' does this
+once: the workbooks and the life tables ('deathm.pickle', 'deathf.pickle') are read, checked and
+saved together in one file (the bundle). The bundle is saved with a hash of the contents of the
+files it was made from, and later runs load the bundle without opening the workbooks (or importing
+openpyxl) as long as none of those files has changed.
+
+Checking the inputs:
+    Each estimate is checked when the bundle is compiled, so that a mistake in the parameter table
+    (e.g., a beta-distributed estimate whose standard error is too large for its mean, which gives
+    a non-positive alpha) stops the model before it starts rather than hours into a run. All of
+    the problems that are found are listed together in the error.
+
+The bundle holds:
+    'estimates'     - the Inputs sheet, as a 'ParameterVector' (see 'Glb_Estimates.py')
+    'regcoeffs'     - the RegCoeffs sheet, as a dictionary of regression coefficients
+    'CostDict'      - the Costs sheet, as a dictionary of (type, mean, se) for each resource,
+                      with the costs of the experimental interventions from the alternative
+                      parameters (see 'ALT_COSTS')
+    'alt_estimates' - the Inputs sheet of the alternative parameters workbook (if one is given)
+    'deathage_M', 'deathage_F' - the life tables, as arrays of ages at death
+    'lifetable'     - the life tables, as the distribution of the age at death used to sample
+                      natural death (see 'Glb_LifeTable.py')
+
+Example:
+    inputs = LoadInputs('InputParameters.xlsx', 'Alt_Parameters.xlsx')
+    estimates = inputs['estimates']
+
+"""
+
+import hashlib
+import os
+import pickle
+import numpy
+
+from Glb_Estimates import ParameterVector, Estimate
+from Glb_LifeTable import LifeTable
+
+BUNDLE_VERSION = 3
+LIFE_TABLES = ('deathm.pickle', 'deathf.pickle')
+
+# The resources in 'CostDict' whose costs are given in the alternative parameters workbook. These
+# rows hold (cost type, mean, se) as in the Costs sheet, rather than a distribution.
+ALT_COSTS = {'Experimental Surgery': 'Alt_SurgCost',
+             'Experimental Chemo': 'Alt_ChemoCost',
+             'Experimental Alcohol Cessation': 'Alt_AlcCost',
+             'Experimental Smoking Cessation': 'Alt_SmokeCost',
+             'Experimental Cancer Screening': 'Alt_ScreenCost',
+             'Experimental HPV Vaccination': 'Alt_VaxCost'}
+
+class InputError(ValueError):
+    """Raised when the parameter tables have values that the model can't use"""
+    pass
+
+def SourceHash(filenames):
+    """A hash of the contents of 'filenames', used to tell whether a bundle is out of date"""
+    digest = hashlib.sha256(b'%d' % BUNDLE_VERSION)
+    for filename in filenames:
+        digest.update(os.path.basename(filename).encode('utf-8'))
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def _Sources(inputfile, altfile):
+    sources = [inputfile]
+    if altfile is not None:
+        sources.append(altfile)
+    return sources + [x for x in LIFE_TABLES]
+
+def LoadInputs(inputfile='InputParameters.xlsx', altfile='Alt_Parameters.xlsx',
+               bundlefile='InputBundle.pickle'):
+    """Returns the bundle of model inputs, compiling it from the workbooks if it is missing or out
+    of date"""
+    key = SourceHash(_Sources(inputfile, altfile))
+    if os.path.exists(bundlefile):
+        with open(bundlefile, 'rb') as f:
+            bundle = pickle.load(f)
+        if bundle.get('version') == BUNDLE_VERSION and bundle.get('key') == key:
+            return bundle
+
+    bundle = CompileInputs(inputfile, altfile)
+    bundle['key'] = key
+    with open(bundlefile, 'wb') as f:
+        pickle.dump(bundle, f, pickle.HIGHEST_PROTOCOL)
+    return bundle
+
+def CompileInputs(inputfile='InputParameters.xlsx', altfile='Alt_Parameters.xlsx'):
+    """Read and check the workbooks and life tables. Returns the bundle (without its hash)."""
+    from openpyxl import load_workbook
+    problems = []
+
+    inbook = load_workbook(inputfile)
+    estimates = ReadEstimates(inbook["Inputs"])
+    problems += CheckEstimates(estimates, inputfile)
+    regcoeffs = ReadRegCoeffs(inbook["RegCoeffs"])
+    problems += CheckRegCoeffs(regcoeffs, inputfile)
+    CostDict = ReadCostDict(inbook["Costs"])
+    problems += CheckCostDict(CostDict, inputfile)
+
+    if altfile is not None:
+        alt_estimates = ReadEstimates(load_workbook(altfile)["Inputs"])
+        # Add scenario-specific costs to Cost Dictionary
+        altcosts = {}
+        for unit, name in ALT_COSTS.items():
+            param = getattr(alt_estimates, name, None)
+            if param is None:
+                problems.append("%s: %s (the cost of %s) is missing" % (altfile, name, unit))
+            else:
+                altcosts[unit] = (param.type, param.mean, param.se)
+        problems += CheckCostDict(altcosts, altfile)
+        CostDict.update(altcosts)
+        problems += CheckEstimates(alt_estimates, altfile, ALT_COSTS.values())
+    else:
+        alt_estimates = None
+
+    lifetables = []
+    for filename in LIFE_TABLES:
+        with open(filename, 'rb') as f:
+            table = numpy.array(pickle.load(f), dtype=numpy.float64)
+        if table.size == 0 or not numpy.all(numpy.isfinite(table)) or table.min() < 0:
+            problems.append("%s: the life table must be a non-empty list of ages" % filename)
+        lifetables.append(table)
+
+    if problems:
+        raise InputError("The model inputs have %d problem(s):\n    " % len(problems) +
+                         "\n    ".join(problems))
+
+    return {'version': BUNDLE_VERSION,
+            'estimates': estimates,
+            'regcoeffs': regcoeffs,
+            'CostDict': CostDict,
+            'alt_estimates': alt_estimates,
+            'deathage_M': lifetables[0],
+            'deathage_F': lifetables[1],
+            'lifetable': LifeTable(lifetables[0], lifetables[1]),
+            'lifetables': SourceHash(LIFE_TABLES)}
+
+def LifeTables(bundlefile='InputBundle.pickle'):
+    """Returns the life tables (men, women) as arrays of ages at death. They are read from the
+    bundle if it was made from the current life table files, otherwise from the files."""
+    if os.path.exists(bundlefile) and all(os.path.exists(x) for x in LIFE_TABLES):
+        with open(bundlefile, 'rb') as f:
+            bundle = pickle.load(f)
+        if bundle.get('version') == BUNDLE_VERSION and bundle.get('lifetables') == SourceHash(LIFE_TABLES):
+            return bundle['deathage_M'], bundle['deathage_F']
+    tables = []
+    for filename in LIFE_TABLES:
+        with open(filename, 'rb') as f:
+            tables.append(numpy.array(pickle.load(f), dtype=numpy.float64))
+    return tables[0], tables[1]
+
+def LoadLifeTable(bundlefile='InputBundle.pickle'):
+    """Returns the distribution of the age at death (see 'Glb_LifeTable.py'). It is read from the
+    bundle if it was made from the current life table files, otherwise it is made from the files."""
+    if os.path.exists(bundlefile) and all(os.path.exists(x) for x in LIFE_TABLES):
+        with open(bundlefile, 'rb') as f:
+            bundle = pickle.load(f)
+        if bundle.get('version') == BUNDLE_VERSION and bundle.get('lifetables') == SourceHash(LIFE_TABLES):
+            return bundle['lifetable']
+    return LifeTable(*LifeTables(bundlefile))
+
+############################################################################################
+# Reading the sheets (the same steps the Sequencer has always used)
+
+def ReadEstimates(sheet):
+    estimates = ParameterVector()
+    for line in sheet.rows:
+        if not line[0].value:
+            # There's no estimate name in this row.
+            continue
+        setattr(estimates, line[0].value, Estimate(line[1].value, line[2].value, line[3].value))
+    del(estimates.Parameter)
+    return estimates
+
+def ReadRegCoeffs(regsheet):
+    "Convert the openpyxl object into a useable form"
+    source = []
+    for row in list(regsheet.rows)[1:]:
+        args = [cell.value for cell in row]
+        source.append(args)
+    for row in range(len(source)):
+        source[row][0] = str(source[row][0])
+        source[row][1] = str(source[row][1])
+
+    "Create a multi-level dictionary to hold each parameter from the regression model:"
+    config = {}
+    for param, factor, vartype, level, mean, SE in source:
+        SE = SE if SE else 0    # If SE is blank, enter zero
+        vartype = vartype if vartype else 0
+        mean = mean if mean not in ("ref", None) else 0     # Reference category = 0
+        if param not in config:
+            config[param] = {}
+        if level:
+            if factor not in config[param]:
+                config[param][factor] = {"vartype": vartype}
+            config[param][factor][level] = {"mean": mean, "SE": SE}
+        else:
+            config[param][factor] = {"vartype": vartype, "mean": mean, "SE": SE}
+    return config
+
+def ReadCostDict(costsheet):
+    CostDict = {}
+    for i in range(0, costsheet.max_row):
+        cost_name = str(costsheet.cell(row = i+1, column = 1).value)
+        cost_type = costsheet.cell(row = i+1, column = 2).value
+        cost_mean = costsheet.cell(row = i+1, column = 3).value
+        cost_se = costsheet.cell(row = i+1, column = 4).value
+        CostDict[cost_name] = (cost_type, cost_mean, cost_se)
+    del(CostDict['Parameter'])
+    return CostDict
+
+############################################################################################
+# Checking the inputs
+
+def _Number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool) and numpy.isfinite(x)
+
+def CheckEstimate(name, est):
+    """Returns a list of the problems with one estimate (empty if there are none)"""
+    etype, mean, se = est.type, est.mean, est.se
+    if etype not in (1, 2, 3, 4, 5, 6, 7, 8, 9, 10):
+        return ["%s: unknown variable type %r" % (name, etype)]
+    if etype == 9:
+        # Static values can be anything (e.g., text)
+        return []
+    if not _Number(mean):
+        return ["%s: the mean (%r) is not a number" % (name, mean)]
+    if etype in (1, 7):
+        # Beta distribution from a mean and standard error
+        if not 0 < mean < 1:
+            return ["%s: a beta-distributed mean must be between 0 and 1 (%r)" % (name, mean)]
+        if not _Number(se) or se <= 0:
+            return ["%s: a beta-distributed estimate needs a positive standard error (%r)" % (name, se)]
+        alpha = mean*((mean*(1-mean)/se**2) - 1)
+        beta = (1-mean)*(mean*(1-mean)/se**2 - 1)
+        if alpha <= 0 or beta <= 0:
+            return ["%s: the standard error (%r) is too large for the mean (%r); beta alpha = %.4g, beta = %.4g"
+                    % (name, se, mean, alpha, beta)]
+    elif etype in (2, 6):
+        if se is not None and (not _Number(se) or se < 0):
+            return ["%s: the standard error must be a non-negative number (%r)" % (name, se)]
+    elif etype == 3:
+        if mean <= 0:
+            return ["%s: the Weibull shape must be positive (%r)" % (name, mean)]
+    elif etype == 4:
+        if mean <= 0 or not _Number(se) or se <= 0:
+            return ["%s: a gamma-distributed estimate needs a positive mean and standard error (%r, %r)"
+                    % (name, mean, se)]
+    elif etype == 5:
+        if mean <= 0:
+            return ["%s: a Dirichlet count must be positive (%r)" % (name, mean)]
+    elif etype == 8:
+        if mean <= 0 or not _Number(se) or se <= 0:
+            return ["%s: beta parameters must be positive (%r, %r)" % (name, mean, se)]
+    elif etype == 10:
+        if not 0 <= mean < 1:
+            return ["%s: a transition probability must be at least 0 and below 1 (%r)" % (name, mean)]
+    return []
+
+def CheckEstimates(estimates, filename, skip=()):
+    # 'skip' - the names of rows that are not distributions (e.g., costs)
+    problems = []
+    for name, est in vars(estimates).items():
+        if isinstance(est, Estimate) and name not in skip:
+            problems += ["%s: %s" % (filename, x) for x in CheckEstimate(name, est)]
+    return problems
+
+def CheckRegCoeffs(regcoeffs, filename):
+    problems = []
+    for param, factors in regcoeffs.items():
+        for factor, coeff in factors.items():
+            entries = [coeff] if 'mean' in coeff else [x for x in coeff.values() if isinstance(x, dict)]
+            for entry in entries:
+                if not _Number(entry['mean']) or not _Number(entry['SE']) or entry['SE'] < 0:
+                    problems.append("%s: regression coefficient %s / %s has a mean or SE that is not a number (%r, %r)"
+                                    % (filename, param, factor, entry['mean'], entry['SE']))
+    return problems
+
+def CheckCostDict(CostDict, filename):
+    problems = []
+    for unit, (ctype, mean, se) in CostDict.items():
+        if ctype == 1:
+            if not _Number(mean):
+                problems.append("%s: the cost of %s (%r) is not a number" % (filename, unit, mean))
+        elif ctype == 2:
+            if not _Number(mean) or mean <= 0 or not _Number(se) or se <= 0:
+                problems.append("%s: the gamma-distributed cost of %s needs a positive mean and standard error (%r, %r)"
+                                % (filename, unit, mean, se))
+        else:
+            problems.append("%s: unknown cost type %r for %s" % (filename, ctype, unit))
+    return problems
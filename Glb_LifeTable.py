@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Sample the age at which an entity dies of natural causes, from the life tables.
+
+The life tables ('deathm.pickle' and 'deathf.pickle') are lists of about 19,600 ages at death (in
+whole years), for men and women. 'ApplyInit' used to pick one of the ages at random for each
+entity (converting the list to an array every time), add a random fraction of a year, and use the
+time between that age and the entity's starting age. The age it picked could be one the entity
+had already passed, in which case the time to death was the time since that age.
+
+'LifeTable' turns each list into the cumulative distribution (CDF) of the age at death, by year
+of age, with the deaths in each year spread evenly over the year (as the random fraction did).
+The age at death of an entity aged 'a' is drawn from the distribution of the people who live to
+'a', by inverting the conditional CDF at a uniform random number 'u':
+
+    F(x | a) = (F(x) - F(a))/(1 - F(a)) = u
+
+An entity older than every age in the table dies at its current age.
+
+The life table is compiled with the other model inputs (see 'Glb_InputBundle.py'), and
+'LoadLifeTable' reads it from the bundle the first time it is needed.
+
+Example:
+    lifetable = LoadLifeTable()
+    deathage = lifetable.DeathAge('F', 62.5, Uniform())
+    deathages = lifetable.DeathAges('M', startages, numpy.random.random_sample(len(startages)))
+
+"""
+
+from bisect import bisect_right
+import numpy
+
+class LifeTable:
+    def __init__(self, deathage_M, deathage_F):
+        """'deathage_M' and 'deathage_F' are the life tables, as lists of ages at death"""
+        self.ages = {}                  # The first age in each year of age, and the end of the last year
+        self.cdf = {}                   # The proportion of people who die before each of 'ages'
+        for sex, table in (('M', deathage_M), ('F', deathage_F)):
+            table = numpy.floor(numpy.asarray(table, dtype=numpy.float64))
+            first = int(table.min())
+            counts = numpy.bincount((table - first).astype(numpy.int64))
+            self.ages[sex] = numpy.arange(first, first + len(counts) + 1, dtype=numpy.float64)
+            self.cdf[sex] = numpy.concatenate(([0], numpy.cumsum(counts)))/len(table)
+            # The last value is set to exactly 1, so that 'u' close to 1 stays inside the table
+            self.cdf[sex][-1] = 1
+        self._lists = None
+
+    def DeathAge(self, sex, age, u):
+        """The age at death of one entity of 'sex' ('M' or 'F') who is 'age' years old now, from
+        the uniform random number 'u'"""
+        if self._lists is None:
+            # Single entities are looked up in lists, which is faster than using the arrays
+            self._lists = {sex: (self.ages[sex].tolist(), self.cdf[sex].tolist()) for sex in self.ages}
+        ages, cdf = self._lists[sex]
+        # The proportion of people who die before 'age'
+        if age <= ages[0]:
+            alive = 0
+        elif age >= ages[-1]:
+            return age
+        else:
+            j = bisect_right(ages, age) - 1
+            alive = cdf[j] + (age - ages[j])*(cdf[j + 1] - cdf[j])/(ages[j + 1] - ages[j])
+        p = alive + u*(1 - alive)
+        j = min(bisect_right(cdf, p) - 1, len(cdf) - 2)
+        deathage = ages[j] + (p - cdf[j])/(cdf[j + 1] - cdf[j])*(ages[j + 1] - ages[j])
+        return max(deathage, age)
+
+    def DeathAges(self, sex, age, u):
+        """The ages at death of a group of entities of 'sex' ('M' or 'F'), from arrays of their
+        current ages and uniform random numbers (see 'DeathAge')"""
+        ages, cdf = self.ages[sex], self.cdf[sex]
+        age = numpy.asarray(age, dtype=numpy.float64)
+        alive = numpy.interp(age, ages, cdf)
+        deathage = numpy.interp(alive + numpy.asarray(u)*(1 - alive), cdf, ages)
+        return numpy.maximum(deathage, age)
+
+# The life table of the model inputs, once it has been read
+_lifetable = []
+
+def LoadLifeTable():
+    """The life table of the current model inputs (see 'Glb_InputBundle.LifeTables'), read the first
+    time it is used"""
+    if not _lifetable:
+        from Glb_InputBundle import LoadLifeTable as ReadLifeTable
+        _lifetable.append(ReadLifeTable())
+    return _lifetable[0]
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Two-level probabilistic sensitivity analysis (PSA).
+
+In a normal run of the Sequencer, every call to 'Estimate.sample()' draws a new value of the
+parameter, so uncertainty about the parameters and the random paths of individual entities are
+mixed together. A PSA separates them:
+
+    Outer level - 'num_iterations' times, one value of every parameter in 'estimates',
+                  'alt_estimates' and 'CostDict' is drawn (see 'Estimate.fixed'), and one set of
+                  the Dirichlet-distributed treatment and risk group probabilities (see
+                  'FixDirichlet').
+    Inner level - 'num_entities' entities are run through each arm of the model with the
+                  parameters fixed at those values, and the mean LYG, QALY and cost are taken.
+
+The result has one row per outer iteration and three columns (LYG, QALY, Cost) per model arm, in
+the order given by 'arms'. The iterations are run in parallel, one per worker process at a time.
+
+Parameters that are not fixed:
+    Times to event (estimate type 7) have their transition probability fixed, but each entity
+    still draws its own time to event. The regression coefficients are used at their mean values,
+    as they are in the Sequencer.
+
+Random numbers:
+    Each outer iteration is given its own child of a numpy 'SeedSequence'. The parameter draws and
+    each arm's entities use separate streams spawned from it, so an analysis can be repeated
+    exactly with the same 'seed', whatever the number of processes. With 'crn = True', the
+    entities in each iteration use common random numbers instead, so entity 'i' has the same
+    random numbers in every arm (see 'Glb_RandomStreams.py').
+
+Example:
+    psa = PSARunner(estimates, regcoeffs, alt_estimates, CostDict, scenario)
+    OutputPSA = psa.Run(num_iterations, num_entities, seed = 1234)
+
+"""
+
+import multiprocessing
+import numpy
+
+from Glb_Estimates import Estimates, Estimate, ParameterVector, FixDirichlet
+
+def DrawEstimates(estimates):
+    """Returns a new 'Estimates' object in which every parameter is fixed at one random draw"""
+    if isinstance(estimates, ParameterVector):
+        # Every parameter is drawn at once (see 'ParameterVector.Draw')
+        return estimates.Draw()
+    drawn = Estimates()
+    for name, value in vars(estimates).items():
+        if isinstance(value, Estimate):
+            value = value.fixed()
+        setattr(drawn, name, value)
+    FixDirichlet(drawn)
+    return drawn
+
+def DrawCostDict(CostDict):
+    """Returns a copy of 'CostDict' in which every unit cost is fixed at one random draw"""
+    from Glb_AnalyzeOutput import Analyze_Output
+    output = Analyze_Output(None, CostDict)
+    drawn = {}
+    for unit in CostDict:
+        if CostDict[unit][0] == 2:
+            # Gamma-distributed costs are drawn once and then treated as fixed-value resources
+            drawn[unit] = (1, output.CostEst(unit), 0)
+        else:
+            drawn[unit] = CostDict[unit]
+    return drawn
+
+# Model inputs used by the worker processes
+_inputs = {}
+
+def _InitWorker(inputs):
+    _inputs.update(inputs)
+
+def _RunIteration(task):
+    from Glb_RandomStreams import SeedStreams
+    from Glb_SimEntity import SimEntity, MaxLYG
+    from Glb_AnalyzeOutput import Analyze_Output
+    seedseq, num_entities, arms, crn = task
+    streams = seedseq.spawn(1 + len(arms))
+
+    # Outer level: draw the parameters for this iteration
+    SeedStreams(streams[0])
+    estimates = DrawEstimates(_inputs['estimates'])
+    alt_estimates = DrawEstimates(_inputs['alt_estimates'])
+    CostDict = DrawCostDict(_inputs['CostDict'])
+
+    # The process objects only need to sample their (now fixed) parameters once
+    sim = SimEntity(estimates, _inputs['regcoeffs'], alt_estimates, _inputs['scenario'], 'run')
+    if crn:
+        sim.CommonRandomNumbers(streams[1].generate_state(1, numpy.uint64)[0])
+    output = Analyze_Output(estimates, CostDict)
+    maxLYG = MaxLYG(estimates)
+
+    # Inner level: the mean LYG, QALY and cost of the entities in each arm
+    row = []
+    for a, Alt_Scenario in enumerate(arms):
+        SeedStreams(streams[1 + a])
+        total = numpy.zeros(3)
+        for i in range(num_entities):
+            total += sim.RunRow(i, Alt_Scenario, output, maxLYG)[:3]
+        row.extend(total/num_entities)
+    return row
+
+class PSARunner:
+    def __init__(self, estimates, regcoeffs, alt_estimates, CostDict, scenario, processes=None,
+                 crn=False):
+        self._inputs = {'estimates': estimates,
+                        'regcoeffs': regcoeffs,
+                        'alt_estimates': alt_estimates,
+                        'CostDict': CostDict,
+                        'scenario': scenario}
+        # By default use every available core
+        self.processes = processes if processes else multiprocessing.cpu_count()
+        self.crn = crn
+
+    def Run(self, num_iterations, num_entities, seed=None, arms=(0, 1)):
+        """Run 'num_iterations' parameter draws of 'num_entities' entities per arm. Returns an array
+        with one row per iteration and [LYG, QALY, Cost] columns for each arm in 'arms'"""
+        streams = numpy.random.SeedSequence(seed).spawn(num_iterations)
+        tasks = [(streams[k], num_entities, tuple(arms), self.crn) for k in range(num_iterations)]
+
+        with multiprocessing.Pool(self.processes, _InitWorker, (self._inputs,)) as pool:
+            results = pool.map(_RunIteration, tasks, chunksize=1)
+
+        return numpy.array(results).reshape(num_iterations, 3*len(arms))
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Save a pre-generated population of entities to disk one column per characteristic, and read it
+back a block of entities at a time.
+
+Sequencer_Multi used to load each pre-generated population with a single 'pickle.load', so the
+whole population had to be unpickled (and held in memory) before the first entity could be run.
+A population store is a directory with one file for each of the entity's characteristics (see
+'FIELDS' in 'Glb_CreateEntity.py'). The files are opened as memory-mapped arrays, so opening a
+store takes no time, and 'Chunks' builds the entities one block at a time, so a population can be
+larger than the available memory.
+
+Each characteristic is stored in the simplest way that holds all of its values:
+
+    'int', 'float' - numbers, in '<field>.dat' (64-bit), with '<field>.none.dat' marking the
+                     entities whose value is None
+    'str'          - text, as a code for each entity (-1 for None) and a table of the text
+    'log'          - entity logs (see 'Glb_EntityLog.py'), as the logs' numbers one after the
+                     other, with '<field>.off.dat' holding where each entity's log starts. The
+                     log's names are saved with the store, so the codes can be matched up with the
+                     registry of the program that reads the store.
+    'object'       - anything else (e.g., the 'natHist' list), pickled separately for each entity
+
+Characteristics that are None for every entity have no file. 'index.pickle' lists the number of
+entities and the kind of each characteristic.
+
+Example:
+    with PopulationWriter('Population_opl') as writer:
+        for entity in oplents:
+            writer.Add(entity)
+
+    population = PopulationStore('Population_opl')
+    for chunk in population.Chunks(10000):
+        for entity in chunk:
+            ...
+
+"""
+
+import os
+import pickle
+from array import array
+import numpy
+
+from Glb_CreateEntity import Entity, FIELDS
+from Glb_EntityLog import ResourceLog, EventLog, UtilityLog
+
+_LOGS = {'ResourceLog': ResourceLog, 'EventLog': EventLog, 'UtilityLog': UtilityLog}
+
+def _Kind(value):
+    # The simplest kind of column that can hold 'value'
+    if isinstance(value, (bool, int, numpy.integer)):
+        return 'int'
+    if isinstance(value, (float, numpy.floating)):
+        return 'float'
+    if isinstance(value, str):
+        return 'str'
+    if isinstance(value, ResourceLog):
+        return 'log'
+    return 'object'
+
+def _Fits(kind, column, value):
+    # Can 'value' be stored in a column of this kind?
+    if value is None:
+        return kind != 'log'
+    new = _Kind(value)
+    if kind == 'float':
+        return new in ('int', 'float')
+    if kind == 'log':
+        return new == 'log' and type(value).__name__ == column['logclass']
+    return new == kind or kind == 'object'
+
+def _Wider(kind, value):
+    # The kind of column needed to hold the values already in a column of 'kind' and 'value'
+    new = 'object' if value is None else _Kind(value)
+    if {kind, new} == {'int', 'float'}:
+        return 'float'
+    return 'object'
+
+class PopulationWriter:
+    def __init__(self, dirname, chunksize=10000):
+        self.dirname = dirname
+        self.chunksize = chunksize
+        self.size = 0                       # The number of entities written to the store so far
+        self._chunk = []
+        self._columns = {}                  # field: how the field is stored (see 'index.pickle')
+        os.makedirs(dirname, exist_ok=True)
+
+    def Add(self, entity):
+        """Add one entity. The block is written to the store when it is full."""
+        self._chunk.append(entity)
+        if len(self._chunk) == self.chunksize:
+            self.Flush()
+
+    def Flush(self):
+        """Write any entities waiting in the current block to the store"""
+        if not self._chunk:
+            return
+        for field in FIELDS:
+            values = [getattr(entity, field) for entity in self._chunk]
+            column = self._columns.get(field)
+            if column is None:
+                first = next((value for value in values if value is not None), None)
+                if first is None:
+                    # Still None for every entity so far
+                    continue
+                kind = _Kind(first)
+                if kind == 'log' and self.size > 0:
+                    # Log columns can't hold the None values of the entities before this block
+                    kind = 'object'
+                column = self._NewColumn(field, kind, type(first).__name__)
+                # The entities before this block had no value
+                self._Write(field, column, [None]*self.size)
+            for value in values:
+                if not _Fits(column['kind'], column, value):
+                    column = self._Promote(field, _Wider(column['kind'], value))
+            self._Write(field, column, values)
+        self.size += len(self._chunk)
+        self._chunk = []
+
+    def Close(self):
+        self.Flush()
+        # Save the names used by the log codes, and the number of entities, with the store
+        columns = {}
+        for field, column in self._columns.items():
+            column = dict(column)
+            if column['kind'] == 'log':
+                column['names'] = list(_LOGS[column['logclass']].registry.names)
+            column.pop('codes', None)
+            column.pop('end', None)
+            columns[field] = column
+        index = {'size': self.size, 'columns': columns}
+        with open(os.path.join(self.dirname, 'index.pickle'), 'wb') as f:
+            pickle.dump(index, f, pickle.HIGHEST_PROTOCOL)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    def _File(self, field, suffix=''):
+        return os.path.join(self.dirname, field + suffix + '.dat')
+
+    def _NewColumn(self, field, kind, logclass=None):
+        column = {'kind': kind}
+        if kind == 'str':
+            column['table'] = []
+            column['codes'] = {}
+        if kind == 'log':
+            column['logclass'] = logclass
+        self._columns[field] = column
+        for suffix in ('', '.none', '.off'):
+            if os.path.exists(self._File(field, suffix)):
+                os.remove(self._File(field, suffix))
+        if kind in ('log', 'object'):
+            # Where each entity's values start; the last entry is where the next entity will start
+            column['end'] = 0
+            numpy.zeros(1, dtype=numpy.int64).tofile(self._File(field, '.off'))
+        return column
+
+    def _Write(self, field, column, values):
+        kind = column['kind']
+        if kind in ('int', 'float'):
+            none = numpy.array([value is None for value in values], dtype=numpy.uint8)
+            dtype = numpy.int64 if kind == 'int' else numpy.float64
+            data = numpy.array([0 if value is None else value for value in values], dtype=dtype)
+            with open(self._File(field, '.none'), 'ab') as f:
+                none.tofile(f)
+        elif kind == 'str':
+            codes = column['codes']
+            data = numpy.empty(len(values), dtype=numpy.int32)
+            for j, value in enumerate(values):
+                if value is None:
+                    data[j] = -1
+                else:
+                    if value not in codes:
+                        codes[value] = len(column['table'])
+                        column['table'].append(value)
+                    data[j] = codes[value]
+        else:
+            if kind == 'log':
+                parts = [value.data.tobytes() for value in values]
+                itemsize = 8
+            else:
+                parts = [pickle.dumps(value, pickle.HIGHEST_PROTOCOL) for value in values]
+                itemsize = 1
+            ends = column['end'] + numpy.cumsum([len(part)//itemsize for part in parts], dtype=numpy.int64)
+            if len(ends):
+                column['end'] = int(ends[-1])
+            with open(self._File(field, '.off'), 'ab') as f:
+                ends.tofile(f)
+            with open(self._File(field), 'ab') as f:
+                f.write(b''.join(parts))
+            return
+        with open(self._File(field), 'ab') as f:
+            data.tofile(f)
+
+    def _Promote(self, field, kind):
+        # Re-write the column as a wider kind (e.g., whole numbers that turn out to also include
+        # decimals, or numbers that turn out to also include text)
+        values = _ReadColumn(self.dirname, field, self._columns[field], 0, self.size)
+        column = self._NewColumn(field, kind)
+        self._Write(field, column, values)
+        return column
+
+def _ReadColumn(dirname, field, column, start, stop, recode=None):
+    # The values of 'field' for entities 'start' to 'stop - 1', as a list. 'recode' gives the code
+    # in this program's registry for each log code saved in the store.
+    name = os.path.join(dirname, field)
+    kind = column['kind']
+    if kind in ('int', 'float'):
+        dtype = numpy.int64 if kind == 'int' else numpy.float64
+        data = _Map(name + '.dat', dtype)[start:stop].tolist()
+        none = _Map(name + '.none.dat', numpy.uint8)[start:stop]
+        for j in numpy.flatnonzero(none):
+            data[j] = None
+        return data
+    if kind == 'str':
+        table = column['table']
+        return [None if code < 0 else table[code] for code in _Map(name + '.dat', numpy.int32)[start:stop].tolist()]
+    offsets = _Map(name + '.off.dat', numpy.int64)[start:stop + 1]
+    if kind == 'log':
+        logclass = _LOGS[column['logclass']]
+        data = numpy.array(_Map(name + '.dat', numpy.float64)[offsets[0]:offsets[-1]])
+        if recode is not None:
+            data[::logclass.width] = recode[data[::logclass.width].astype(numpy.int64)]
+        data = data.tobytes()
+        values = []
+        for a, b in zip((offsets[:-1] - offsets[0])*8, (offsets[1:] - offsets[0])*8):
+            log = logclass.__new__(logclass)
+            log.data = array('d', data[a:b])
+            values.append(log)
+        return values
+    data = _Map(name + '.dat', numpy.uint8)[offsets[0]:offsets[-1]].tobytes()
+    return [pickle.loads(data[a:b]) for a, b in zip(offsets[:-1] - offsets[0], offsets[1:] - offsets[0])]
+
+def _Map(filename, dtype):
+    if os.path.getsize(filename) == 0:
+        return numpy.empty(0, dtype=dtype)
+    return numpy.memmap(filename, dtype=dtype, mode='r')
+
+class PopulationStore:
+    def __init__(self, dirname):
+        self.dirname = dirname
+        with open(os.path.join(dirname, 'index.pickle'), 'rb') as f:
+            index = pickle.load(f)
+        self.size = index['size']
+        self.columns = index['columns']
+        # The codes that the log names saved with the store have in this program's registries
+        self._recode = {}
+        for field, column in self.columns.items():
+            if column['kind'] == 'log':
+                registry = _LOGS[column['logclass']].registry
+                self._recode[field] = numpy.array([registry.Code(name) for name in column['names']] or [0],
+                                                  dtype=numpy.float64)
+
+    def __len__(self):
+        return self.size
+
+    def Entities(self, start=0, stop=None):
+        """Returns a list of new entities 'start' to 'stop - 1', as they were saved"""
+        if stop is None or stop > self.size:
+            stop = self.size
+        count = max(stop - start, 0)
+        values = []
+        for field in FIELDS:
+            column = self.columns.get(field)
+            if column is None:
+                values.append([None]*count)
+            else:
+                values.append(_ReadColumn(self.dirname, field, column, start, stop,
+                                          self._recode.get(field)))
+        entities = []
+        for state in zip(*values):
+            entity = Entity.__new__(Entity)
+            entity.__setstate__(state)
+            entities.append(entity)
+        return entities
+
+    def Chunks(self, chunksize=10000):
+        """The entities in the store, as lists of up to 'chunksize' new entities at a time"""
+        for start in range(0, self.size, chunksize):
+            yield self.Entities(start, start + chunksize)
+
+    def __iter__(self):
+        for chunk in self.Chunks():
+            for entity in chunk:
+                yield entity
+
+    def Column(self, field):
+        """The values of a numerical characteristic for every entity, as a read-only array (without
+        building the entities). None is shown as 'nan'."""
+        column = self.columns.get(field)
+        if column is None:
+            return numpy.full(self.size, numpy.nan)
+        if column['kind'] not in ('int', 'float'):
+            raise ValueError("%s is not stored as numbers" % field)
+        name = os.path.join(self.dirname, field)
+        data = _Map(name + '.dat', numpy.int64 if column['kind'] == 'int' else numpy.float64)
+        none = _Map(name + '.none.dat', numpy.uint8)
+        if not none.any():
+            return data
+        return numpy.where(none == 1, numpy.nan, data)
+
+def SavePopulation(entities, dirname, chunksize=10000):
+    """Save a list of entities as a population store"""
+    with PopulationWriter(dirname, chunksize) as writer:
+        for entity in entities:
+            writer.Add(entity)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Find the unit price of an experimental intervention at which it reaches a cost-effectiveness
+threshold, from the resource ledgers of a finished run (see 'Glb_ResourceLedger.py').
+
+The costs of the experimental interventions ('Alt_SurgCost', 'Alt_ChemoCost', ...) only enter the
+model through 'CostDict', as the unit costs of the 'Experimental ...' resources (see 'ALT_COSTS'
+in 'Glb_InputBundle.py'). The price at which an intervention is cost-effective used to be found by
+changing its cost and re-running the whole model until the ICER came close enough to the
+threshold. Instead, 'PriceThreshold' re-costs two saved ledgers for a trial price (the comparator,
+0, and the run with the intervention, 1, e.g. two Sequencer runs with and without
+'Scenario_Screen'), and searches for the price at which the incremental net monetary benefit (NMB)
+of 1 over 0 reaches a target:
+
+    NMB(price) = wtp*(E1 - E0) - (C1(price) - C0(price))
+
+where 'wtp' is the willingness to pay per QALY (or LYG) and E and C are the mean effect and cost of
+each arm. A target NMB of zero is the price at which the ICER equals 'wtp'.
+
+Confidence bands:
+    The entities of a run are a sample, so the threshold price is uncertain. 'Bootstrap'
+    re-samples the entities of the run (the same entity numbers in both ledgers, so that runs with
+    common random numbers stay paired), and finds the threshold price for each re-sample.
+
+Example:
+    threshold = PriceThreshold(['Baseline_Ledger_0', 'Scenario_Ledger_0'], CostDict,
+                               'Experimental Surgery')
+    price = threshold.Price(50000)
+    price, low, high = threshold.Bootstrap(50000, num_samples = 1000)
+
+"""
+
+import numpy
+
+from Glb_AnalyzeOutput import CostTable
+from Glb_ResourceLedger import ReadLedger, LedgerNames
+
+def _Secant(f, x0, x1, tol=1e-9, maxiter=50):
+    # Find the roots of 'f' (a function of an array of prices) by the secant method. The net
+    #   monetary benefit is a straight line in the price, so this finishes after one step unless
+    #   the costs are not linear in the price. A root is kept once it has converged (the later
+    #   steps would divide by zero), and is 'nan' where 'f' doesn't change with the price.
+    f0, f1 = f(x0), f(x1)
+    root = numpy.full(numpy.shape(x1), numpy.nan)
+    done = numpy.zeros(numpy.shape(x1), dtype=bool)
+    for _ in range(maxiter):
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            slope = (f1 - f0)/(x1 - x0)
+            x2 = numpy.where(slope != 0, x1 - f1/slope, numpy.nan)
+        converged = ~done & ~(numpy.abs(x2 - x1) > tol*numpy.maximum(1, numpy.abs(x1)))
+        root = numpy.where(converged, x2, root)
+        done = done | converged
+        if done.all():
+            return root
+        x0, f0, x1 = x1, f1, numpy.where(done | numpy.isnan(x2), x1, x2)
+        f1 = f(x1)
+    return numpy.where(done, root, x1)
+
+class PriceThreshold:
+    def __init__(self, ledgers, costdict, resource, effect='QALY', sample=False):
+        """'ledgers' are the ledgers of the comparator and of the intervention, 'resource' is the
+        name of the intervention's resource (e.g., 'Experimental Surgery') and 'effect' is 'QALY'
+        or 'LYG'.
+        With 'sample = True', gamma-distributed costs are drawn once for each resource used (as in
+        'Glb_ResourceLedger.Recost'); otherwise they are set to their means."""
+        self.resource = resource
+        self.effect = []                    # The effect of each entity, for each arm
+        self.basecost = []                  # Each entity's cost with the intervention priced at zero
+        self.uses = []                      # Each entity's discounted number of uses of the intervention
+        for dirname in ledgers:
+            rows, resources = ReadLedger(dirname, 'rows'), ReadLedger(dirname, 'resources')
+            size = len(rows)
+            table = CostTable(costdict, LedgerNames(dirname)['resources'])
+            ent = resources[:, 0].astype(numpy.int64)
+            code = resources[:, 1].astype(numpy.int64)
+            isresource = numpy.isin(code, [c for c, name in enumerate(table.names) if name == resource])
+            discounts = table.Discounts(resources[:, 2])
+            unitcost = numpy.zeros(len(code))
+            unitcost[~isresource] = table.UnitCosts(code[~isresource], sample)
+            self.effect.append(numpy.array(rows[:, 0 if effect == 'LYG' else 1]))
+            self.basecost.append(numpy.bincount(ent, weights=unitcost*discounts, minlength=size))
+            self.uses.append(numpy.bincount(ent, weights=isresource*discounts, minlength=size))
+
+    def NMB(self, price, wtp, entities=None):
+        """The incremental net monetary benefit of the intervention at each of 'price', re-costing
+        both ledgers with that unit price. 'entities' (one row of entity numbers for each price)
+        picks the entities used from each ledger; by default, every entity is used."""
+        price = numpy.asarray(price, dtype=float)
+        means = []
+        for arm in (0, 1):
+            if entities is None:
+                effect, basecost, uses = [x.mean() for x in (self.effect[arm], self.basecost[arm], self.uses[arm])]
+            else:
+                effect, basecost, uses = [x[entities].mean(axis=-1) for x in (self.effect[arm], self.basecost[arm], self.uses[arm])]
+            means.append((effect, basecost + price*uses))
+        return wtp*(means[1][0] - means[0][0]) - (means[1][1] - means[0][1])
+
+    def Price(self, wtp, nmb=0, entities=None):
+        """The unit price at which the incremental NMB equals 'nmb' (by default, the price at which
+        the ICER equals 'wtp'). Returns 'nan' if the intervention's price doesn't change the
+        costs (i.e., it isn't used in the run)."""
+        f = lambda price: self.NMB(price, wtp, entities) - nmb
+        if entities is None:
+            return float(_Secant(f, numpy.float64(0), numpy.float64(1)))
+        n = len(entities)
+        return _Secant(f, numpy.zeros(n), numpy.ones(n))
+
+    def Bootstrap(self, wtp, nmb=0, num_samples=1000, level=0.95, seed=None):
+        """Returns the threshold price, and the lower and upper limits of its 'level' confidence
+        band from 'num_samples' bootstrap re-samples of the entities"""
+        size = min(len(self.effect[0]), len(self.effect[1]))
+        rng = numpy.random.default_rng(seed)
+        prices = []
+        # The re-samples are done in blocks, so that only a block of entity numbers is held at once
+        block = max(1, min(num_samples, 10**7//max(size, 1)))
+        for start in range(0, num_samples, block):
+            entities = rng.integers(0, size, (min(block, num_samples - start), size))
+            prices.append(self.Price(wtp, nmb, entities))
+        prices = numpy.concatenate(prices)
+        tail = (1 - level)/2*100
+        low, high = numpy.nanpercentile(prices, [tail, 100 - tail])
+        return self.Price(wtp, nmb), float(low), float(high)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Random number streams for the model.
+
+The model processes draw their random numbers from the global 'numpy.random' and 'random'
+generators. The functions here set those generators up so that a run, or a part of a run, can be
+repeated exactly.
+
+SeedStreams:
+    Seeds both generators from a numpy 'SeedSequence' (used by the shard, PSA and cohort runners).
+
+EntityStreams (common random numbers):
+    When the two arms of the model are run with separate random numbers, entity 'i' in the Assay
+    Naive arm and entity 'i' in the Assay Informed arm are two unrelated people, and the difference
+    between the arms carries all of the noise between the two populations. With common random
+    numbers, entity 'i' is given the same random numbers in both arms, so the arms only differ where
+    the scenario changes the entity's path.
+
+    Each entity has a separate stream for each group of model processes:
+
+        'init'      - initial characteristics and prevention ('ApplyInit', 'Prevention')
+        'nathist'   - natural history ('NatHistOCa', and natural history events)
+        'screen'    - dental screening and OPL management ('ScreenAppt', 'OPLManage')
+        'treatment' - cancer treatment, follow-up and terminal care
+        'output'    - the costs and utility drawn when the entity's results are worked out
+
+    so that (for example) an extra OPL surveillance appointment in one arm doesn't shift the random
+    numbers used by the entity's natural history. The generators are re-seeded every time a process
+    is run, from the run's seed, the entity number, the stream and the number of times that stream
+    has been used by the entity. The n-th screening appointment of entity 'i' therefore uses the
+    same random numbers in every arm, and in every process of a parallel run.
+
+Buffered draws:
+    Each scalar call to a 'numpy.random' function takes about as long as drawing a few hundred
+    numbers in a single call. 'Buffer' draws 'BUFFER_SIZE' numbers at a time and hands them out
+    one by one; 'Estimate.sample()' keeps one buffer for each parameter (see 'Glb_Estimates.py'),
+    and 'Uniform()' is a buffered stream of uniform random numbers on [0, 1) that the model
+    processes use instead of 'random.random()'. The buffers are filled from the global
+    'numpy.random' generator, and are emptied whenever it is re-seeded by 'SeedStreams' or
+    'EntityStreams' (call 'ResetBuffers' after seeding it directly), so a run still depends only
+    on its seeds. Common random numbers re-seed the generator every time a process is run, so an
+    'EntityStreams' object has its own, much smaller, buffer size ('buffersize'), which is used
+    until the buffers are next emptied.
+
+Example:
+    streams = EntityStreams(1234)
+    streams.Start(i)
+    streams.Use('init')
+    applyinit.Process(entity)
+
+"""
+
+import random
+import numpy
+
+STREAMS = {'init': 0, 'nathist': 1, 'screen': 2, 'treatment': 3, 'output': 4}
+
+# The number of values drawn each time a buffer is filled
+BUFFER_SIZE = 4096
+# Common random numbers re-seed the generators every time a process is run, which empties the
+#   buffers, so only a few values are drawn at a time
+CRN_BUFFER_SIZE = 16
+
+_buffersize = BUFFER_SIZE
+_generation = 0                 # Changed every time the buffers are emptied
+_fillsize = BUFFER_SIZE         # The number of values drawn until the buffers are next emptied
+
+def ResetBuffers(size=None):
+    """Empty every buffer, so that the next values are drawn from the generator as it is now.
+    Until the buffers are next emptied, they are filled with 'size' values at a time (default: the
+    buffer size, see 'SetBufferSize')."""
+    global _generation, _fillsize
+    _generation += 1
+    _fillsize = _buffersize if size is None else max(int(size), 1)
+
+def SetBufferSize(size):
+    """Set the number of values drawn each time a buffer is filled (and empty the buffers)"""
+    global _buffersize
+    _buffersize = max(int(size), 1)
+    ResetBuffers()
+
+class Buffer:
+    """Hands out the values of 'fill(n)' (a function that returns an array of n random values)
+    one at a time, calling 'fill' again when they run out"""
+    __slots__ = ('fill', 'key', '_values', '_next', '_generation')
+
+    def __init__(self, fill, key=None):
+        self.fill = fill
+        self.key = key              # What the values were drawn for (e.g., a parameter's distribution)
+        self._values = []
+        self._next = 0
+        self._generation = _generation
+
+    def draw(self):
+        if self._next >= len(self._values) or self._generation != _generation:
+            self._values = self.fill(_fillsize).tolist()
+            self._next = 0
+            self._generation = _generation
+        value = self._values[self._next]
+        self._next += 1
+        return value
+
+_uniform = Buffer(numpy.random.random_sample)
+
+def Uniform():
+    """A uniform random number on [0, 1), from a buffered stream"""
+    return _uniform.draw()
+
+def SeedStreams(seedseq):
+    """Seed the global 'numpy.random' and 'random' generators from a numpy SeedSequence"""
+    np_seq, py_seq = seedseq.spawn(2)
+    numpy.random.set_state(numpy.random.MT19937(np_seq).state)
+    random.seed(int(py_seq.generate_state(1, numpy.uint64)[0]))
+    ResetBuffers()
+
+class EntityStreams:
+    def __init__(self, seed):
+        # The seed is split into 32-bit words, which are used to seed the generators
+        seed = int(seed)
+        self._seedwords = []
+        while True:
+            self._seedwords.append(seed & 0xffffffff)
+            seed >>= 32
+            if seed == 0:
+                break
+        self._i = None
+        self._uses = [0]*len(STREAMS)
+        self.buffersize = CRN_BUFFER_SIZE
+
+    def Start(self, i):
+        """Start the streams of entity number 'i'"""
+        self._i = i
+        self._uses = [0]*len(STREAMS)
+
+    def Use(self, name):
+        """Seed 'numpy.random' and 'random' for the next use of stream 'name' by the current entity"""
+        stream = STREAMS[name]
+        key = self._seedwords + [self._i, stream, self._uses[stream]]
+        self._uses[stream] += 1
+        numpy.random.seed(key)
+        # The 'random' generator uses the same method of seeding from a list of words as numpy, so
+        # an extra word is added to keep the two generators from producing the same numbers
+        pykey = 1
+        for word in reversed(key):
+            pykey = (pykey << 32) | word
+        random.seed(pykey)
+        ResetBuffers(self.buffersize)
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Save the resources used by every entity in a run (a resource ledger), so that the run's costs can be
+worked out again with different unit costs without re-running the simulation. The ledger also holds
+each entity's health-state timeline, so that the QALYs can be worked out again with different
+utilities.
+
+Costs are applied after the simulation, from each entity's log of resources (see
+'Analyze_Output.EntityCost'). Changing a unit cost in the Costs sheet (or one of the experimental
+intervention costs in 'Alt_Parameters.xlsx') still meant running the whole Sequencer again, because
+the entities and their resource logs were not kept. A ledger is a directory holding:
+
+    'rows.dat'      - each entity's row of [LYG, QALY, Cost, OPLflag], in the order the entities
+                      were run (see 'Glb_ResultWriter.py')
+    'resources.dat' - one row of [entity, resource code, day] for each resource that was costed
+    'timeline.dat'  - one row of [entity, state code, day] for each health state the entity
+                      entered (the entries of its utility log, without the utility values)
+    'horizon.dat'   - 1 for each entity that never developed OPL and lived to the time horizon
+                      (these entities are given the maximum LYG; see 'Glb_SimEntity.EntityRow')
+    'names.pickle'  - the resource and health state names of the codes, so a ledger can be read by
+                      another program
+
+Only the resources that 'EntityCost' counts are saved (a last resource that falls after the
+entity's death is left out). 'Recost' applies a new 'CostDict', discount rate or way of choosing
+the unit costs to a ledger and returns the rows with the new costs. 'Requalify' does the same for
+the utility of each health state, from the Inputs sheet or one PSA draw of it (see
+'Glb_PSA.DrawEstimates'). 'Rediscount' works out the results for a list of discount rates and
+shorter time horizons at once. 'Sequencer_Recost.py' uses them to write new output csv files from
+the ledgers of a Sequencer run.
+
+Example:
+    with LedgerWriter('Scenario_Ledger_0', estimates) as ledger:
+        for i in range(num_entities):
+            writer.Add(sim.RunRow(i, Alt_Scenario, output, maxLYG, ledger))
+    rows = Recost('Scenario_Ledger_0', CostDict, discount = 0.03, sample = False)
+    rows = Requalify('Scenario_Ledger_0', DrawEstimates(estimates))
+    results = Rediscount('Scenario_Ledger_0', estimates, CostDict, [0, 0.015, 0.03, 0.05], [5, 10])
+
+"""
+
+import os
+import pickle
+import numpy
+
+from Glb_EntityLog import Resources, Utilities
+from Glb_AnalyzeOutput import CostTable, CostKernel, UtilityTable, SurvivalKernel, DailyDiscount
+from Glb_AnalyzeOutput import DailyRate, DiscountedYears
+from Glb_ResultWriter import ResultWriter, ReadResults
+
+class LedgerWriter:
+    def __init__(self, dirname, estimates, chunksize=10000):
+        self.dirname = dirname
+        self.size = 0                           # The number of entities written to the ledger so far
+        self._horizon = estimates.timehorizon.mean*365
+        os.makedirs(dirname, exist_ok=True)
+        self._rows = ResultWriter(os.path.join(dirname, 'rows.dat'), 4, chunksize)
+        self._resources = ResultWriter(os.path.join(dirname, 'resources.dat'), 3, chunksize)
+        self._timeline = ResultWriter(os.path.join(dirname, 'timeline.dat'), 3, chunksize)
+        self._full = ResultWriter(os.path.join(dirname, 'horizon.dat'), 1, chunksize)
+
+    def Add(self, row, entity, resources=None):
+        """Add the next entity: its row of [LYG, QALY, Cost, OPLflag], and the entity. 'resources'
+        is the entity's resource log before it was costed by 'EntityCost' (by default, the entity's
+        resource log)."""
+        if resources is None:
+            resources = entity.resources
+        codes = resources.Codes()
+        times = resources.Times()
+        if len(times) > 0 and times[-1] > entity.natHist_deathAge:
+            # The last resource is removed if it occurs after the entity's death
+            codes, times = codes[:-1], times[:-1]
+        for code, time in zip(codes.tolist(), times.tolist()):
+            self._resources.Add((self.size, code, time))
+        for code, time in zip(entity.utility.Codes().tolist(), entity.utility.Times().tolist()):
+            self._timeline.Add((self.size, code, time))
+        self._full.Add(entity.OPLflag == 0 and entity.time_death == self._horizon)
+        self._rows.Add(row)
+        self.size += 1
+
+    def Close(self):
+        for writer in (self._rows, self._resources, self._timeline, self._full):
+            writer.Close()
+        # Save the names used by the resource and health state codes with the ledger
+        names = {'resources': list(Resources.names), 'utilities': list(Utilities.names)}
+        with open(os.path.join(self.dirname, 'names.pickle'), 'wb') as f:
+            pickle.dump(names, f, pickle.HIGHEST_PROTOCOL)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+def ReadLedger(dirname, name):
+    """One of the files of a ledger (see 'LedgerWriter'), e.g. 'resources', as a read-only array"""
+    columns = {'rows': 4, 'resources': 3, 'timeline': 3, 'horizon': 1}[name]
+    return ReadResults(os.path.join(dirname, name + '.dat'), columns)
+
+def LedgerNames(dirname):
+    """The names of the resource codes ('resources') and health state codes ('utilities') of a ledger"""
+    with open(os.path.join(dirname, 'names.pickle'), 'rb') as f:
+        return pickle.load(f)
+
+def Recost(dirname, costdict, discount=None, sample=True):
+    """Returns a copy of the rows of [LYG, QALY, Cost, OPLflag] in a ledger, in the order the
+    entities were run, with the costs worked out again from 'costdict'. 'discount' replaces the
+    discount rate in 'costdict', and with 'sample = False' every gamma-distributed cost is set to
+    its mean instead of being drawn."""
+    rows, resources = ReadLedger(dirname, 'rows'), ReadLedger(dirname, 'resources')
+    table = CostTable(costdict, LedgerNames(dirname)['resources'])
+    if discount is not None:
+        table.discount = discount
+    # Every resource in the ledger is costed (the ones after death were left out when it was saved)
+    rows = numpy.array(rows)
+    rows[:, 2] = CostKernel(resources[:, 0], resources[:, 1].astype(numpy.int64), resources[:, 2],
+                            numpy.full(len(rows), numpy.inf), len(rows), table, sample)
+    return rows
+
+def Requalify(dirname, estimates, sample=True):
+    """Returns a copy of the rows of [LYG, QALY, Cost, OPLflag] in a ledger, in the order the
+    entities were run, with the QALYs worked out again from the utility parameters in 'estimates'
+    (see 'UtilityTable'). With 'sample = False' every utility is set to its mean instead of being
+    drawn for each health state the entity entered."""
+    rows, timeline = ReadLedger(dirname, 'rows'), ReadLedger(dirname, 'timeline')
+    full = ReadLedger(dirname, 'horizon')[:, 0] == 1
+    table = UtilityTable(estimates, LedgerNames(dirname)['utilities'])
+    rows = numpy.array(rows)
+    ent, code = timeline[:, 0].astype(numpy.int64), timeline[:, 1].astype(numpy.int64)
+    # The timelines of the entities that lived to the time horizon aren't used; the other
+    #   entities are numbered 0, 1, ... for 'SurvivalKernel'
+    used = ~full[ent]
+    number = numpy.cumsum(~full) - 1
+    LYG, QALY = SurvivalKernel(number[ent[used]], timeline[used, 2], table.Values(code[used], sample),
+                               (~full).sum(), DailyDiscount(estimates))
+    rows[~full, 1] = QALY
+    # Entities who never develop OPL and live to the time horizon are given the maximum LYG
+    well = UtilityTable(estimates, ['Well'])
+    rows[full, 1] = rows[full, 0]*well.Values(numpy.zeros(full.sum()), sample)
+    return rows
+
+def Rediscount(dirname, estimates, costdict, rates, horizons=(None,), cost_sample=True,
+               utility_sample=True):
+    """Returns the rows of [LYG, QALY, Cost, OPLflag] in a ledger for every combination of the
+    annual discount rates in 'rates' and the time horizons (in years) in 'horizons', as a
+    dictionary of {(rate, horizon): rows}. Each rate is used for both outcomes and costs, unless
+    it is given as a pair of (LYG and QALY rate, cost rate). A horizon of None (or one longer than
+    the run's 'timehorizon') is the run's time horizon; with a shorter horizon, the entities'
+    timelines and resources are cut off at that time.
+
+    The unit costs and utilities are drawn once (or, with 'cost_sample = False' or
+    'utility_sample = False', set to their means; see 'Recost' and 'Requalify') and used for every
+    combination, so the results only differ by the discounting and the time horizon. Entities who never develop OPL and live to the run's
+    time horizon keep the utility they were given in the run."""
+    rows = numpy.array(ReadLedger(dirname, 'rows'))
+    resources, timeline = ReadLedger(dirname, 'resources'), ReadLedger(dirname, 'timeline')
+    full = ReadLedger(dirname, 'horizon')[:, 0] == 1
+    names = LedgerNames(dirname)
+    size = len(rows)
+    runhorizon = estimates.timehorizon.mean
+
+    # Unit costs and utilities
+    table = CostTable(costdict, names['resources'])
+    rent, rtime = resources[:, 0].astype(numpy.int64), numpy.array(resources[:, 2])
+    unitcost = table.UnitCosts(resources[:, 1].astype(numpy.int64), cost_sample)
+    tent, ttime = timeline[:, 0].astype(numpy.int64), numpy.array(timeline[:, 2])
+    used = ~full[tent]
+    tent, ttime = tent[used], ttime[used]
+    value = UtilityTable(estimates, names['utilities']).Values(timeline[used, 1].astype(numpy.int64),
+                                                               utility_sample)
+    number = numpy.cumsum(~full) - 1
+    wellutil = rows[full, 1]/rows[full, 0]
+
+    results = {}
+    for rate in rates:
+        rate_out, rate_cost = rate if isinstance(rate, tuple) else (rate, rate)
+        disc_rate = DailyRate(rate_out)
+        table.discount = rate_cost
+        for horizon in horizons:
+            days = min(runhorizon if horizon is None else horizon, runhorizon)*365
+            out = rows.copy()
+
+            # Resources used after the horizon aren't counted
+            keep = rtime <= days
+            out[:, 2] = numpy.bincount(rent[keep], weights=unitcost[keep]*table.Discounts(rtime[keep]),
+                                       minlength=size)
+
+            # Timelines that go past the horizon end there, as if the entity died at the horizon
+            keep = ttime <= days
+            ended = numpy.unique(tent[~keep])
+            ent = numpy.concatenate((number[tent[keep]], number[ended]))
+            time = numpy.concatenate((ttime[keep], numpy.full(len(ended), days)))
+            val = numpy.concatenate((value[keep], numpy.zeros(len(ended))))
+            out[~full, 0], out[~full, 1] = SurvivalKernel(ent, time, val, (~full).sum(), disc_rate)
+
+            # Entities who never develop OPL and live to the time horizon are given the maximum LYG
+            maxLYG = float(DiscountedYears(0, numpy.ceil(days), disc_rate))
+            out[full, 0] = maxLYG
+            out[full, 1] = maxLYG*wellutil
+            results[(rate, horizon)] = out
+    return results
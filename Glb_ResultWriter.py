@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Write the model's results to disk as the entities finish, instead of keeping every entity in memory.
+
+The Sequencer normally keeps each finished entity in 'EntityList' and works out its LYG, QALY and
+cost once the whole cohort has been run, so the size of the cohort is limited by the amount of
+memory available. Instead, each entity's row of [LYG, QALY, Cost, OPLflag] can be worked out as
+soon as it dies or reaches the time horizon (see 'Glb_SimEntity.EntityRow') and handed to a
+'ResultWriter'. The writer collects rows in a fixed-size block and appends each full block to a
+binary file, so the entity itself can be thrown away and memory use does not grow with the number
+of entities.
+
+The file holds the rows one after the other as 64-bit floats, with no header. 'ReadResults' opens
+it as a memory-mapped array, so the results can be read back without loading the whole file.
+
+Example:
+    with ResultWriter('Output_0.dat') as writer:
+        for i in range(num_entities):
+            entity = sim.Run(i, Alt_Scenario)
+            writer.Add(EntityRow(entity, estimates, output, maxLYG))
+    results = ReadResults('Output_0.dat')
+
+"""
+
+import os
+import numpy
+
+class ResultWriter:
+    def __init__(self, filename, columns=4, chunksize=10000):
+        self.filename = filename
+        self.columns = columns
+        self.rows = 0                                   # The number of rows written to the file so far
+        self._chunk = numpy.empty((chunksize, columns))
+        self._n = 0                                     # The number of rows waiting in the current block
+        self._file = open(filename, 'wb')
+
+    def Add(self, row):
+        """Add one row of results. The block is written to the file when it is full."""
+        self._chunk[self._n] = row
+        self._n += 1
+        if self._n == len(self._chunk):
+            self.Flush()
+
+    def Flush(self):
+        """Write any rows waiting in the current block to the file"""
+        if self._n > 0:
+            self._chunk[:self._n].tofile(self._file)
+            self.rows += self._n
+            self._n = 0
+        self._file.flush()
+
+    def Close(self):
+        if not self._file.closed:
+            self.Flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+def ReadResults(filename, columns=4):
+    """Open a file written by 'ResultWriter' as a read-only array with one row per entity"""
+    if os.path.getsize(filename) == 0:
+        return numpy.empty((0, columns))
+    return numpy.memmap(filename, dtype=numpy.float64, mode='r').reshape(-1, columns)
+
+def OrderRows(results):
+    """Put the rows in the order used by the Sequencer's output: the entities that developed OPL
+    (OPLflag = 1) first, then the entities that did not, each in the order they were run"""
+    flag = results[:, 3] == 1
+    return numpy.vstack((results[flag], results[~flag]))
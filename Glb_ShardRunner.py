@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Run the Sequencer's entity loop on several processor cores at once.
+
+The 'num_entities' entities in each model arm are split into shards (blocks of consecutive
+entity numbers). Each shard is run through the entity loop ('Glb_SimEntity.py') by a worker and
+returns its rows of [LYG, QALY, Cost, OPLflag] output. The rows are then put back together in
+the same layout that 'Sequencer.py' writes: one block of four columns per model arm, with the
+entities that developed OPL first and the entities that did not second.
+
+Random numbers:
+    The model processes draw from the global 'numpy.random' and 'random' number generators.
+    Each shard (in each model arm) is given its own child of a numpy 'SeedSequence', and the
+    worker re-seeds both global generators from that child before running the shard. The
+    shards therefore use independent random number streams, and a run can be repeated exactly
+    by passing the same 'seed' and the same number of shards. By default each shard holds
+    'SHARD_SIZE' entities, so the shards (and the results) don't depend on the number of
+    processes; only the size of the pool does.
+
+    With 'crn = True', each entity instead has its own common random number streams, which are
+    the same in every arm and every shard (see 'Glb_RandomStreams.py').
+
+Example:
+    runner = ShardRunner(estimates, regcoeffs, alt_estimates, CostDict, scenario)
+    OutputCEA = runner.Run(num_entities, seed = 1234)
+
+"""
+
+import multiprocessing
+import numpy
+
+from Glb_RandomStreams import SeedStreams
+
+# The number of entities in each shard, when the number of shards isn't given
+SHARD_SIZE = 1000
+
+# Model inputs used by the worker processes. These are sent to each worker once, when the pool
+# is started, rather than with every shard.
+_inputs = {}
+
+def _InitWorker(estimates, sim, CostDict):
+    from Glb_AnalyzeOutput import Analyze_Output
+    from Glb_SimEntity import MaxLYG
+    _inputs['estimates'] = estimates
+    _inputs['sim'] = sim
+    _inputs['output'] = Analyze_Output(estimates, CostDict)
+    _inputs['maxLYG'] = MaxLYG(estimates)
+
+def _RunShard(shard):
+    Alt_Scenario, first, last, seedseq = shard
+    SeedStreams(seedseq)
+
+    sim = _inputs['sim']
+    HasOPL = []
+    NoOPL = []
+    for i in range(first, last):
+        # Each entity's row of output is worked out as soon as it finishes, so the shard's
+        # entities are not all kept in memory
+        row = sim.RunRow(i, Alt_Scenario, _inputs['output'], _inputs['maxLYG'])
+        if row[3] == 1:
+            HasOPL.append(row)
+        else:
+            NoOPL.append(row)
+
+    return numpy.array(HasOPL).reshape(-1, 4), numpy.array(NoOPL).reshape(-1, 4)
+
+class ShardRunner:
+    def __init__(self, estimates, regcoeffs, alt_estimates, CostDict, scenario, processes=None,
+                 scope='event', crn=False, scheduler='checktime'):
+        # 'scope' is the sampling scope of the process objects, and 'scheduler' sets how each
+        # entity's clock is moved forward (see 'Glb_SimEntity.py'). The process objects are
+        # created here and copied to every worker, so that values sampled once for the run are
+        # the same in every shard.
+        from Glb_SimEntity import SimEntity
+        sim = SimEntity(estimates, regcoeffs, alt_estimates, scenario, scope, scheduler)
+        self._sim = sim
+        self._inputs = (estimates, sim, CostDict)
+        self.crn = crn
+        # By default use every available core
+        self.processes = processes if processes else multiprocessing.cpu_count()
+
+    def Run(self, num_entities, seed=None, num_shards=None, arms=(0, 1)):
+        """Simulate 'num_entities' entities in each model arm. Returns the output array, with
+        four columns per arm in the order given by 'arms'"""
+        # Shards of a fixed size, so that a run with the same seed gives the same output on any
+        # number of cores (and there are several shards per process, so a slow shard does not
+        # hold up the whole run)
+        if num_shards is None:
+            num_shards = -(-num_entities//SHARD_SIZE)
+        num_shards = max(1, min(num_shards, num_entities))
+        bounds = numpy.linspace(0, num_entities, num_shards + 1).astype(int)
+
+        # One independent random number stream for every shard in every arm
+        seedseq = numpy.random.SeedSequence(seed)
+        streams = seedseq.spawn(len(arms)*num_shards)
+        if self.crn:
+            self._sim.CommonRandomNumbers(seedseq.entropy)
+        else:
+            self._sim.CommonRandomNumbers(None)
+
+        shards = []
+        for a, Alt_Scenario in enumerate(arms):
+            for s in range(num_shards):
+                shards.append((Alt_Scenario, bounds[s], bounds[s+1], streams[a*num_shards + s]))
+
+        with multiprocessing.Pool(self.processes, _InitWorker, self._inputs) as pool:
+            results = pool.map(_RunShard, shards, chunksize=1)
+
+        # Put the shards back together: OPL cases first, then the entities without OPL
+        Output = []
+        for a in range(len(arms)):
+            armresults = results[a*num_shards:(a+1)*num_shards]
+            HasOPL = numpy.vstack([x[0] for x in armresults])
+            NoOPL = numpy.vstack([x[1] for x in armresults])
+            Output.append(numpy.vstack((HasOPL, NoOPL)))
+
+        return numpy.hstack(Output)
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+Run entities through the model, and turn a list of finished entities into rows of output.
+
+'SimEntity' runs the entity loop from 'Sequencer.py': it creates an entity, applies its initial
+characteristics and natural history, and then moves it from state to state until it dies or
+an error occurs. Pulling the loop out into its own class lets the same code be run by the
+Sequencer and by programs that run groups of entities in separate processes.
+
+The process objects (ScreenAppt, OPLManage, etc.) are created once, when the SimEntity object
+is created, and each state is handled by looking up its code (see 'Glb_States.py') in a table
+of processes. Within one pass through the loop the processes are run in the same order as the
+Sequencer's chain of 'if' statements: after a process has run, the process for the entity's
+new state is also run if that state comes later in the chain.
+
+Scheduler:
+    'scheduler' sets how the entity's clock is moved forward on each pass through the loop:
+        'checktime' - check all of the entity's clocks with 'CheckTime' and run the process for
+                      the entity's state on every pass (the same as the Sequencer). This is the
+                      model's scheduler, and the default.
+        'queue'     - take the entity's next event off its event queue (see 'Glb_EventQueue.py'),
+                      and run the process for the entity's state after system process events
+                      and after any other event that moves the entity to a new state
+    The event queue takes fewer passes, but it is a different timing model: it does not give
+    the same results as 'CheckTime' (see 'Glb_EventQueue.py' for the differences), so it is not
+    a replacement for it.
+
+Sampling scope:
+    The process objects sample some of their parameters (appointment intervals, test
+    sensitivity, etc.) when they are created. 'scope' sets how often those values are
+    re-sampled:
+        'event'  - every time the process is run (the same as creating a new object each time,
+                   which is what the Sequencer has always done)
+        'entity' - once for each new entity
+        'run'    - once, when the SimEntity object is created
+
+Common random numbers:
+    After 'CommonRandomNumbers(seed)' is called, each entity is given its own random number
+    streams (see 'Glb_RandomStreams.py'), so that entity 'i' has the same random numbers in both
+    arms of the model. Use 'RunRow' to also draw the entity's costs and utility from its streams.
+
+The scenario being analyzed is passed in as a dictionary:
+
+    scenario = {'Prevention': 0, 'Screen': 0, 'Surg': 1, 'Chemo': 0, 'HPV': 0}
+
+1 - include the effects of this policy scenario; 0 - do not include
+
+Example:
+    sim = SimEntity(estimates, regcoeffs, alt_estimates, scenario)
+    entity = sim.Run(i, Alt_Scenario)
+
+"""
+
+import math
+import numpy
+
+from Glb_AnalyzeOutput import DiscountedYears, DailyDiscount
+from Glb_CreateEntity import Entity
+from Glb_ApplyInit import ApplyInit
+from Glb_CheckTime import CheckTime
+from Glb_EventQueue import EventQueue, ScheduleEvents, ApplyEvent, EV_NATHIST
+from Glb_RandomStreams import EntityStreams, ResetBuffers
+from Glb_States import (STATE_NEW, STATE_INIT, STATE_SCREEN, STATE_NODENTIST, STATE_OPL,
+                        STATE_CANCER, STATE_FOLLOWUP, STATE_REMISSION, STATE_TERMINAL,
+                        STATE_DEAD, STATE_ERROR, StateCode)
+from SysP_Prevention import Prevention
+from Alt_NatHist_OralCancer import NatHistOCa
+from SysP_ScreenAppt import ScreenAppt
+from Alt_SysP_ScreenAppt import ScreenApptScen
+from SysP_OPLmanage import OPLManage
+from SysP_IncidentCancer import IncidentCancer
+from Alt_SysP_IncidentCancer import IncidentCancerScen
+from SysP_Followup import Followup
+from SysP_Terminal import Terminal
+
+SCOPES = ('event', 'entity', 'run')
+SCHEDULERS = ('checktime', 'queue')
+
+class SimEntity:
+    def __init__(self, estimates, regcoeffs, alt_estimates, scenario, scope='event',
+                 scheduler='checktime'):
+        if scope not in SCOPES:
+            raise ValueError("Sampling scope must be one of %s" % (SCOPES,))
+        if scheduler not in SCHEDULERS:
+            raise ValueError("Scheduler must be one of %s" % (SCHEDULERS,))
+        self._estimates = estimates
+        self._alt_estimates = alt_estimates
+        self._scenario = scenario
+        self.scope = scope
+        self.scheduler = scheduler
+        self._streams = None
+
+        ### Create the process objects ###
+        self.applyinit = ApplyInit(estimates)
+        if scenario['Prevention'] == 1:
+            self.prevention = Prevention(alt_estimates)
+        else:
+            self.prevention = None
+        # HPV vaccination affects natural history of OPL progression to cancer
+        if scenario['HPV'] == 1:
+            alt_regcoeffs = regcoeffs
+            from Alt_NatHist_OralCancer_HPV import NatHistOCa as NatHistOCaHPV
+            self.nathistoca = NatHistOCaHPV(estimates, alt_regcoeffs, alt_estimates)
+        else:
+            self.nathistoca = NatHistOCa(estimates, regcoeffs)
+        if scenario['Screen'] == 1:
+            self.screenappt = ScreenApptScen(estimates, regcoeffs, alt_estimates)
+        else:
+            self.screenappt = ScreenAppt(estimates, regcoeffs)
+        self.oplmanage = OPLManage(estimates, regcoeffs)
+        if scenario['HPV'] == 1:
+            self.incidentcancer = IncidentCancerScen(estimates, regcoeffs, alt_estimates)
+        else:
+            self.incidentcancer = IncidentCancer(estimates, regcoeffs)
+        self.followup = Followup(estimates, regcoeffs)
+        self.terminal = Terminal(estimates, regcoeffs)
+
+        # Processes run by the states after the entity's initial characteristics are applied
+        self._stateProcs = [x for x in (self.screenappt, self.oplmanage, self.incidentcancer,
+                                        self.followup, self.terminal) if hasattr(x, 'Sample')]
+
+        ### The table of processes to run for each state ###
+        self._dispatch = {STATE_NEW: self._NewEntity,
+                          STATE_INIT: self._Dentist,
+                          STATE_SCREEN: self._ScreenAppt,
+                          STATE_NODENTIST: self._NoDentist,
+                          STATE_OPL: self._OPLManage,
+                          STATE_CANCER: self._IncidentCancer,
+                          STATE_FOLLOWUP: self._Followup,
+                          STATE_REMISSION: self._Remission,
+                          STATE_TERMINAL: self._Terminal,
+                          STATE_DEAD: self._Dead,
+                          STATE_ERROR: self._Error}
+
+    def CommonRandomNumbers(self, seed):
+        """Give each entity its own random number streams, set by 'seed' and the entity's number.
+        'None' turns common random numbers off."""
+        if seed is None:
+            if self._streams is not None:
+                # Go back to the usual size of buffered draws (see 'Glb_RandomStreams.py')
+                ResetBuffers()
+            self._streams = None
+        else:
+            self._streams = EntityStreams(seed)
+
+    def Run(self, i, Alt_Scenario):
+        """Create entity number 'i' and run it through the model. Returns the finished entity."""
+        entity = Entity()
+        self._i = i
+        if self._streams is not None:
+            self._streams.Start(i)
+        self._altscen = Alt_Scenario
+        self._natHist = []
+        self._QALY = []
+
+        entity.Scenario_Prev = self._scenario['Prevention']
+        entity.Scenario_Screen = self._scenario['Screen']
+        entity.Scenario_Surg = self._scenario['Surg']
+        entity.Scenario_Chemo = self._scenario['Chemo']
+        entity.Scenario_HPV = self._scenario['HPV']
+        entity.scenario_desc = []
+
+        if self.scope == 'entity':
+            for proc in self._stateProcs:
+                proc.Sample()
+
+        # Apply initial characteristics and route the entity to screening or no dentist
+        self._RunChain(entity, STATE_NEW, STATE_INIT)
+
+        if self.scheduler == 'checktime':
+            while True:
+                ### Advance the clock to next scheduled event (NatHist, Sysp, Recurrence, Death) ###
+                if self._NatHistDue(entity):
+                    self._Stream('nathist')
+                CheckTime(entity, self._estimates, self._natHist, self._QALY)
+
+                ### Run next scheduled event/process according to state ###
+                code = StateCode.get(entity.stateNum)
+                if code is not None and code >= STATE_SCREEN:
+                    self._RunChain(entity, code, STATE_ERROR)
+
+                if entity.stateNum == 100 or entity.stateNum == 99:
+                    break
+            return entity
+
+        queue = EventQueue()
+        while entity.stateNum != 100 and entity.stateNum != 99:
+            ### Advance the clock to the next scheduled event (NatHist, Sysp, Recurrence, Death) ###
+            ScheduleEvents(entity, queue)
+            time, kind = queue.Pop()
+            state = entity.stateNum
+            if kind == EV_NATHIST:
+                self._Stream('nathist')
+            ApplyEvent(entity, self._estimates, time, kind)
+
+            ### Run the process for the entity's state ###
+            # Natural history events that don't change the entity's state don't involve a process
+            if kind != EV_NATHIST or entity.stateNum != state:
+                code = StateCode.get(entity.stateNum)
+                if code is not None and code >= STATE_SCREEN:
+                    self._RunChain(entity, code, STATE_ERROR)
+
+        return entity
+
+    def RunRow(self, i, Alt_Scenario, output, maxLYG, ledger=None):
+        """Run entity number 'i' through the model and return its row of [LYG, QALY, Cost, OPLflag]
+        (see 'EntityRow'). The entity itself is not kept, but its resources are added to 'ledger'
+        if one is given (see 'Glb_ResourceLedger.py')."""
+        entity = self.Run(i, Alt_Scenario)
+        self._Stream('output')
+        if ledger is None:
+            return EntityRow(entity, self._estimates, output, maxLYG)
+        # 'EntityCost' changes the resource log, so the ledger is given the log as it was
+        resources = entity.resources.copy()
+        row = EntityRow(entity, self._estimates, output, maxLYG)
+        ledger.Add(row, entity, resources)
+        return row
+
+    def _RunChain(self, entity, code, last):
+        # Run the process for state 'code'. If the process moves the entity to a state that comes
+        # later in the chain (up to and including 'last'), run that state's process too.
+        while True:
+            self._dispatch[code](entity)
+            nextcode = StateCode.get(entity.stateNum)
+            if nextcode is None or nextcode <= code or nextcode > last:
+                return
+            code = nextcode
+
+    def _NatHistDue(self, entity):
+        # Whether 'CheckTime' will apply the entity's next natural history event on this pass, so
+        # that the event draws from the entity's natural history stream
+        if self._streams is None or entity.cancerDetected != 0:
+            return False
+        if entity.allTime >= entity.natHist_deathAge or int(round((entity.allTime - entity.natHist_deathAge),3)) == 0:
+            return False
+        nextNat_time = float(entity.natHist[entity.nhnum or 0][2])
+        return entity.time_Sysp > nextNat_time and entity.allTime >= nextNat_time
+
+    def _Stream(self, name):
+        # With common random numbers, switch to the entity's stream for this group of processes
+        if self._streams is not None:
+            self._streams.Use(name)
+
+    def _Resample(self, proc, scopes=('event',)):
+        # Re-sample the process's parameters if the sampling scope calls for it
+        if self.scope in scopes and hasattr(proc, 'Sample'):
+            proc.Sample()
+
+    ### The processes for each state ###
+
+    #Apply Demographic Characteristics and Natural History to a newly-created entity
+    # These processes are only run once per entity, so they are re-sampled unless the scope is 'run'
+    def _NewEntity(self, entity):
+        self._Stream('init')
+        self._Resample(self.applyinit, ('event', 'entity'))
+        self.applyinit.Process(entity)
+        if self.prevention is not None:
+            self._Resample(self.prevention, ('event', 'entity'))
+            self.prevention.Process(entity)
+        self._Stream('nathist')
+        self._Resample(self.nathistoca, ('event', 'entity'))
+        self.nathistoca.Process(entity, self._natHist)
+
+        if entity.hasOPL == 1:
+            entity.OPLflag = 1
+        else:
+            entity.OPLflag = 0
+
+    #PROBABILITY NODE: Does this person regularly see a dentist?
+        # If yes - develop OPL while undergoing regular observations (state 1.0)
+        # If no - develop OPL and possibly cancer (state 1.8)
+    def _Dentist(self, entity):
+        entity.altscen = self._altscen
+        if entity.hasDentist == 1:
+            entity.stateNum = 1.0
+            entity.currentState = "1.0 - Start regular dental screening"
+        elif entity.hasDentist == 0:
+            entity.stateNum = 1.8
+            entity.currentState = "1.8 - No access to dentist"
+
+    #People with a participating dentist undergo regular screening appointments
+    def _ScreenAppt(self, entity):
+        self._Stream('screen')
+        self._Resample(self.screenappt)
+        self.screenappt.Process(entity)
+
+    #People with no dentist wait for disease event
+    def _NoDentist(self, entity):
+        # With the event queue, no system process events are scheduled in this state
+        if self.scheduler == 'checktime':
+            entity.time_Sysp += 1000      #Move system process clock forward by 1000 days (See footnote 1)
+
+    #People with a detected premalignancy undergo regular follow-up
+    def _OPLManage(self, entity):
+        self._Stream('screen')
+        self._Resample(self.oplmanage)
+        self.oplmanage.Process(entity)
+
+    #People with a detected cancer undergo treatment
+    def _IncidentCancer(self, entity):
+        self._Stream('treatment')
+        if self._scenario['Surg'] == 1:
+            entity.RR_Surgery = self._alt_estimates.RR_Surgery.sample()
+        if self._scenario['Chemo'] == 1:
+            entity.RR_Chemo = self._alt_estimates.RR_Chemo.sample()
+        self._Resample(self.incidentcancer)
+        self.incidentcancer.Process(entity)
+
+    #People who have been successfully treated undergo regular follow-up
+    def _Followup(self, entity):
+        self._Stream('treatment')
+        self._Resample(self.followup)
+        self.followup.Process(entity)
+
+    #People whose disease has entered remission after 10 years
+    def _Remission(self, entity):
+        #entity is in remission, no further events occur
+        entity.allTime = entity.natHist_deathAge + 0.0001
+
+    #People with terminal disease receive palliative care
+    def _Terminal(self, entity):
+        self._Stream('treatment')
+        self._Resample(self.terminal)
+        self.terminal.Process(entity)
+
+    #The entity is dead
+    def _Dead(self, entity):
+        entity.utility.append(('Dead', 0, entity.allTime))
+        if entity.death_type == 1:
+            entity.horizon_censor = 0
+        if entity.horizon_censor == 1:
+            entity.death_type = 'Censored'
+
+    # An error has occurred
+    def _Error(self, entity):
+        print(self._i, "An error has occurred and the simulation must end")
+        print(entity.currentState)
+
+def MaxLYG(estimates):
+    """The discounted life years of an entity that survives to the model time horizon"""
+    # Every day up to the time horizon is counted (see 'Glb_AnalyzeOutput.DiscountedYears')
+    maxdays = estimates.timehorizon.mean*365
+    return float(DiscountedYears(0, math.ceil(maxdays), DailyDiscount(estimates)))
+
+def EntityRow(entity, estimates, output, maxLYG):
+    """Returns the entity's row of [LYG, QALY, Cost, OPLflag]. 'output' is an 'Analyze_Output'
+    object and 'maxLYG' is the value returned by 'MaxLYG'."""
+    if entity.OPLflag == 0:
+        # Entities who never develop OPL and live to the time horizon are given the maximum LYG
+        if entity.time_death == estimates.timehorizon.mean*365:
+            survival = [maxLYG, maxLYG*estimates.Util_Well.sample()]
+        else:
+            survival = output.EntitySurvival(entity)
+        return [survival[0], survival[1], output.EntityCost(entity), 0]
+    else:
+        survival = output.EntitySurvival(entity)
+        return [survival[0], survival[1], output.EntityCost(entity), 1]
+
+def OutputRows(EntityList, estimates, output, maxLYG=None, ledger=None):
+    """Returns two arrays of [LYG, QALY, Cost, OPLflag] rows, one for entities that develop OPL
+    and one for those that do not, each in the same order as 'EntityList'. 'output' is an
+    'Analyze_Output' object. If a 'ledger' is given, each entity's row and resources are added to
+    it (see 'Glb_ResourceLedger.py')."""
+    if maxLYG is None:
+        maxLYG = MaxLYG(estimates)
+
+    # The whole list is costed and its survival worked out at once (see 'Glb_AnalyzeOutput.py')
+    LYG, QALY = output.CohortSurvival(EntityList)
+    cost = output.CohortCost(EntityList)
+    OPL = numpy.array([entity.OPLflag != 0 for entity in EntityList], dtype=bool)
+    time_death = numpy.array([numpy.nan if entity.time_death is None else entity.time_death
+                              for entity in EntityList], dtype=float)
+
+    # Entities who never develop OPL and live to the time horizon are given the maximum LYG
+    full = ~OPL & (time_death == estimates.timehorizon.mean*365)
+    if full.any():
+        LYG[full] = maxLYG
+        QALY[full] = maxLYG*estimates.Util_Well.sample(full.sum())
+
+    rows = numpy.c_[LYG, QALY, cost, OPL].reshape(-1, 4)
+    if ledger is not None:
+        for entity, row in zip(EntityList, rows):
+            ledger.Add(row, entity)
+    return rows[OPL], rows[~OPL]
+
+####################################################
+# FOOTNOTE:
+#
+#   1 - The clock moves forward an arbitrary number of days, but is reset to the next natural
+#       history or disease event by 'Glb_Checktime.py'. The purpose of moving the clock forward is
+#       simply to prompt advancement to the next event.
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Copy-on-write snapshots of a pre-generated population of entities.
+
+Sequencer_Multi runs the same pre-generated population through both arms of every scenario. Each
+arm used to start from a deep copy of the whole population (so that the first arm's changes did
+not carry over into the second arm), and the finished entities were then deep-copied again to
+save them. With a large population most of the scenario's time was spent copying, and the copies
+doubled the memory used.
+
+A 'Snapshot' freezes the population once, as one column of values for each of the entity's
+characteristics (see 'FIELDS' in 'Glb_CreateEntity.py'). Each arm then gets an 'ArmSnapshot',
+which shares the frozen columns and only holds 'overlay' columns for the characteristics that
+its entities change:
+
+    'Entity(j)' builds a working copy of the arm's j-th entity. Numbers and text are shared with
+                the frozen columns; only lists and logs (which the model processes append to)
+                are copied.
+    'Store(j, entity)' saves the finished entity. Only the characteristics that are different
+                from the frozen population are kept, in an overlay column that is created the
+                first time one of the arm's entities changes that characteristic.
+
+An arm can be used like a list of entities ('len(arm)', 'arm[j]', 'for entity in arm'), and
+'Column(field)' reads one characteristic of every entity in the arm without building them. When
+both arms are saved (pickled) together, the frozen columns are only saved once.
+
+Example:
+    snapshot = Snapshot(oplents + nooplents)
+    arm = snapshot.Arm(range(len(oplents)))
+    for j in range(len(arm)):
+        entity = arm.Entity(j)
+        ...
+        arm.Store(j, entity)
+
+"""
+
+import numpy
+
+from Glb_CreateEntity import Entity, FIELDS
+from Glb_EntityLog import ResourceLog
+
+# Values that can be shared between entities, because no model process can change them in place
+_SHARED = (type(None), bool, int, float, str, tuple, numpy.generic)
+
+class _Unchanged(object):
+    """Marks an overlay entry where the entity has the same value as the frozen population"""
+    def __reduce__(self):
+        # Keep a single marker when an arm is saved and loaded
+        return '_UNCHANGED'
+
+    def __repr__(self):
+        return '_UNCHANGED'
+
+_UNCHANGED = _Unchanged()
+
+def _Copy(value):
+    # Lists, logs and arrays are copied so that the entity can change them; everything else is shared
+    if isinstance(value, _SHARED):
+        return value
+    return value.copy()
+
+def _Same(value, base):
+    # Is 'value' the same as the frozen value 'base'?
+    if value is base:
+        return True
+    if type(value) is not type(base):
+        return False
+    if isinstance(value, ResourceLog):
+        # Entity logs (see 'Glb_EntityLog.py')
+        return value.data == base.data
+    try:
+        return bool(value == base)
+    except ValueError:
+        return False
+
+class Snapshot:
+    def __init__(self, entities):
+        # One column (list) of values for each characteristic. Characteristics that no entity has
+        # been given (still None for every entity) don't need a column.
+        self.size = len(entities)
+        self.columns = {}
+        for field in FIELDS:
+            column = [getattr(entity, field) for entity in entities]
+            if any(value is not None for value in column):
+                self.columns[field] = column
+
+    def __len__(self):
+        return self.size
+
+    def Value(self, i, field):
+        """The frozen value of 'field' for entity 'i'"""
+        column = self.columns.get(field)
+        if column is None:
+            return None
+        return column[i]
+
+    def Entity(self, i):
+        """Returns a working copy of entity 'i', as it was when the snapshot was taken"""
+        entity = Entity.__new__(Entity)
+        for field in FIELDS:
+            setattr(entity, field, _Copy(self.Value(i, field)))
+        return entity
+
+    def Arm(self, indices=None):
+        """Returns an 'ArmSnapshot' that starts from the entities in 'indices' (by default, every
+        entity in the snapshot, in order)"""
+        return ArmSnapshot(self, indices)
+
+class ArmSnapshot:
+    def __init__(self, snapshot, indices=None):
+        self.snapshot = snapshot
+        if indices is None:
+            indices = range(len(snapshot))
+        self.indices = list(indices)
+        # field: column of values for each entity in the arm (_UNCHANGED where the entity has the
+        # frozen value)
+        self.overlay = {}
+
+    def __len__(self):
+        return len(self.indices)
+
+    def Value(self, j, field):
+        """The value of 'field' for the arm's j-th entity"""
+        column = self.overlay.get(field)
+        if column is not None and column[j] is not _UNCHANGED:
+            return column[j]
+        return self.snapshot.Value(self.indices[j], field)
+
+    def Column(self, field):
+        """The values of 'field' for every entity in the arm, in order"""
+        return [self.Value(j, field) for j in range(len(self))]
+
+    def Entity(self, j):
+        """Returns a working copy of the arm's j-th entity. Changes to it are only kept in the
+        arm once it is passed to 'Store'."""
+        entity = Entity.__new__(Entity)
+        for field in FIELDS:
+            setattr(entity, field, _Copy(self.Value(j, field)))
+        return entity
+
+    def Store(self, j, entity):
+        """Save 'entity' as the arm's j-th entity. Only the characteristics that are different from
+        the frozen population are kept."""
+        i = self.indices[j]
+        for field in FIELDS:
+            value = getattr(entity, field)
+            column = self.overlay.get(field)
+            if _Same(value, self.snapshot.Value(i, field)):
+                if column is not None:
+                    column[j] = _UNCHANGED
+                continue
+            if column is None:
+                column = [_UNCHANGED]*len(self)
+                self.overlay[field] = column
+            column[j] = value
+
+    def Entities(self, positions=None):
+        """Working copies of the arm's entities at 'positions' (by default, every entity), one at a time"""
+        if positions is None:
+            positions = range(len(self))
+        for j in positions:
+            yield self.Entity(j)
+
+    def __getitem__(self, j):
+        if j < 0:
+            j += len(self)
+        if j < 0 or j >= len(self):
+            raise IndexError("arm index out of range")
+        return self.Entity(j)
+
+    def __iter__(self):
+        return self.Entities()
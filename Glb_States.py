@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Integer codes for the model states.
+
+The per-entity programs track where an entity is with 'entity.stateNum', which is a
+float (0.1, 1.0, 1.8, 2.0, ...). Programs that work on a whole cohort at once store
+the state as one of the integer codes below instead. The codes are numbered in the
+same order that 'Sequencer.py' checks the states, so an entity that is moved to a
+higher-numbered state by a process is picked up by that state's process in the same
+loop, exactly as it is in the Sequencer's chain of 'if' statements.
+
+"""
+
+STATE_NEW = 0           # 0.0 - Newly-created entity
+STATE_INIT = 1          # 0.1 - Initial characteristics applied
+STATE_SCREEN = 2        # 1.0 - Regular dental screening
+STATE_NODENTIST = 3     # 1.8 - No access to dentist, waiting for disease event
+STATE_OPL = 4           # 2.0 - OPL detected, undergoing surveillance
+STATE_CANCER = 5        # 3.0 - Cancer (or recurrence) detected, undergoing treatment
+STATE_FOLLOWUP = 6      # 4.0 - Post-treatment follow-up
+STATE_REMISSION = 7     # 4.8 - Cancer in remission, no further events
+STATE_TERMINAL = 8      # 5.0 - Terminal disease/end of life
+STATE_DEAD = 9          # 100 - Dead (or reached the model time horizon)
+STATE_ERROR = 10        # 99 - An error has occurred
+
+# Translate between 'stateNum' values and state codes
+StateCode = {0.0: STATE_NEW,
+             0.1: STATE_INIT,
+             1.0: STATE_SCREEN,
+             1.8: STATE_NODENTIST,
+             2.0: STATE_OPL,
+             3.0: STATE_CANCER,
+             4.0: STATE_FOLLOWUP,
+             4.8: STATE_REMISSION,
+             5.0: STATE_TERMINAL,
+             100: STATE_DEAD,
+             99: STATE_ERROR}
+
+StateNum = dict((code, num) for num, code in StateCode.items())
@@ -3,7 +3,7 @@ from collections import Counter
 def genVarList(entityrecord, var):
     retvar = []
     for i in range(0, len(entityrecord)):
-        if hasattr(entityrecord[i], var) == True:
+        if getattr(entityrecord[i], var, None) is not None:
             retvar.append(getattr(entityrecord[i], var))
     return retvar
     
@@ -37,15 +37,15 @@ startage_dother = genVarList(dother, 'startAge')
 deathage_dother = [(ent.startAge + ent.time_death/365) for ent in EntityList]
 
 
-recurrecord = [ent for ent in cancerrecord if hasattr(ent, "recurrence") == True]
+recurrecord = [ent for ent in cancerrecord if ent.recurrence is not None]
 for i in range(0, len(cancerrecord)):
-    if hasattr(cancerrecord[i], "recurrence") == True:
+    if cancerrecord[i].recurrence is not None:
         recurrecord.append(cancerrecord[i])
         
 detCancerrecord = []
 symptCancerrecord = []
 for i in range(0, len(cancerrecord)):
-    if hasattr(cancerrecord[i], 'sympt') == 1:
+    if cancerrecord[i].sympt is not None:
         symptCancerrecord.append(cancerrecord[i])
     else:
         detCancerrecord.append(cancerrecord[i])
@@ -4,9 +4,10 @@ A program to assign risk category to a person with an OPL.
 
 """
 
-from Glb_Estimates import diriSample
+from Glb_Estimates import DirichletCategory
 
 import random
+from Glb_RandomStreams import Uniform
 
 ################################################################################################
 
@@ -17,8 +18,8 @@ class DevOPL:
         self._regcoeffs = regcoeffs
 
         self.screenInt = random.randint(1,10)                # The dentist screens for cancer at a random constant frequency
-        self.hasOPL = random.random()                        # Generate random number for the chance of starting with OPL
-        self.OPLRisk = random.random()                   
+        self.hasOPL = Uniform()                        # Generate random number for the chance of starting with OPL
+        self.OPLRisk = Uniform()                   
     
     def Process(self, entity):    
         if self.hasOPL < entity.probOPL:                        # If the random number lies beyond the prevalence estimate      
@@ -35,23 +36,16 @@ class DevOPL:
         
         if entity.OPLStatus == 1:
             
-            # A 'names' vector for the dirichlet sampling process
-            OPLRiskGroup_names = ["OPLRisk_Low", "OPLRisk_Med", "OPLRisk_Hi"]
-            # A 'values' vector for the dirichlet sampling process
-            OPLRiskGroup_probs = [self._estimates.NatHist_OPLrisk_low.mean, self._estimates.NatHist_OPLrisk_med.mean, self._estimates.NatHist_OPLrisk_hi.mean]   
-            
-            diriSample(self._estimates, OPLRiskGroup_names, OPLRiskGroup_probs)      # Generate random value for OPL risk group  
+            # Generate random value for OPL risk group from the Dirichlet-distributed probabilities
+            # of the low, medium and high risk groups
+            risk = DirichletCategory(self._estimates, 'OPLRisk', self.OPLRisk)
                 
-            if self.OPLRisk <= self._estimates.OPLRisk_Low:      # Low risk group
+            if risk == 0:           # Low risk group
                 entity.OPLRisk = 'Lo'
-            elif self.OPLRisk <= self._estimates.OPLRisk_Low + self._estimates.OPLRisk_Med:     # Medium risk group
+            elif risk == 1:         # Medium risk group
                 entity.OPLRisk = 'Med'
-            elif self.OPLRisk > self._estimates.OPLRisk_Low + self._estimates.OPLRisk_Med:      # High risk group
+            else:                   # High risk group
                 entity.OPLRisk = 'Hi'
-            else:
-                print("Something has gone wrong in the OPL risk assignment process")
-                entity.currentState = "Error - something has gone wrong in the OPL risk assignment process, check NatHist_DevOPL.py"
-                entity.stateNum = 99
     
 
 # VARIABLES CREATED IN THIS STEP:
@@ -44,7 +44,7 @@ class NatHistOCa:
     
     def Process(self, entity, natHist):   
            
-        if getattr(entity, "natHist", 0) == 0:                     # If this person doesn't already have the 'natHist' field created, create it for them
+        if entity.natHist is None:                     # If this person doesn't already have the 'natHist' field created, create it for them
             entity.natHist = []
         
         from NatHist_DevOPL import DevOPL                     # Assign OPL status based on age/sex prevalence
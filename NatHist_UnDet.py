@@ -29,7 +29,7 @@ class UnDet:
     def Process(self, entity):    
         
         # If this person doesn't already have the 'natHist' field created, create it for them
-        if hasattr(entity, "natHist") == 0:                     
+        if entity.natHist is None:                     
              entity.natHist = []    
         
         while entity.nh_det == 0:
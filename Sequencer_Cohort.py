@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+A version of the Sequencer that runs the whole population at once using the vectorized
+cohort engine ('Glb_CohortEngine.py'). Inputs, scenarios and outputs are the same as
+'Sequencer.py': each arm of the analysis is simulated and the LYG, QALY and costs of
+every entity are saved to 'Scenario_Output.csv'.
+
+The cohort engine does not keep a list of entity objects, so it can simulate much larger
+populations in the same amount of time and memory.
+
+"""
+############################################################################################
+############################################################################################
+# LOAD SOME NECESSARY PACKAGES AND FUNCTIONS
+
+import time
+import numpy
+
+# Import Parameter Estimates, Regression Coefficients and Costs from the tables"
+# The workbooks are only read when they have changed since the last run; otherwise the checked
+# bundle of inputs saved by the last run is loaded (see 'Glb_InputBundle.py')
+
+from Glb_InputBundle import LoadInputs
+
+inputs = LoadInputs('InputParameters.xlsx', 'Alt_Parameters.xlsx')
+estimates = inputs['estimates']
+regcoeffs = inputs['regcoeffs']
+CostDict = inputs['CostDict']           # Includes the scenario-specific costs from 'Alt_Parameters.xlsx'
+
+#############################################################################################
+############################################################################################
+
+################################
+# STEP 1 - LOAD IN SCENARIO PARAMETERS
+
+# Alternative parameters are the values used for the specific scenarios considered in this
+# manuscript (New Drug, Improved Screening, etc.) and are adjunct to the core WDMOC parameters
+# stored in 'InputParameters.xlsx'
+
+alt_estimates = inputs['alt_estimates']
+
+################################
+# STEP 2 - DEFINE THE SCENARIO BEING ANALYZED
+# 1 - include the effects of this policy scenario; 0 - do not include
+Scenario_Prevention = 0
+Scenario_Screen = 0
+Scenario_Surg = 1
+Scenario_Chemo = 0
+Scenario_HPV = 0
+
+################################
+# STEP 3 - RUN THE COHORT ENGINE
+"Define the number of entities you want to model"
+num_entities = 100000
+
+from Glb_CohortEngine import CohortEngine
+
+scenario = {'Prevention': Scenario_Prevention,
+            'Screen': Scenario_Screen,
+            'Surg': Scenario_Surg,
+            'Chemo': Scenario_Chemo,
+            'HPV': Scenario_HPV}
+engine = CohortEngine(estimates, regcoeffs, alt_estimates, scenario)
+
+looptime_start = time.time()
+Output = []
+for k in range(0,2):
+    Alt_Scenario = k
+    print("Simulating", num_entities, "entities in scenario", k)
+    cohort = engine.Run(num_entities, Alt_Scenario)
+    
+    # Estimate the LYG, QALY and costs generated by the entities in the population
+    Output.append(engine.Output(cohort, CostDict))
+    now = time.time()
+    print("Scenario", k, "done @", (now - looptime_start)/60, "minutes")
+
+OutputCEA = numpy.c_[Output[0], Output[1]]
+
+# Output results as csv
+# This step allows you to name the outputs so you can keep track of which file you want to analyze
+versionext = 'Scenario_Output.csv'
+print("Saving...")
+numpy.savetxt(versionext, OutputCEA, delimiter=",")
+now = time.time()
+print("Done: this process took ", (now - looptime_start)/60, "minutes")
+print("Prev:", Scenario_Prevention, "Screen:", Scenario_Screen, "Surg:", Scenario_Surg, "Chemo:", Scenario_Chemo, "HPV:", Scenario_HPV)
@@ -59,7 +59,9 @@ for line in sheet.rows:
     setattr(alt_estimates, line[0].value, Estimate(line[1].value, line[2].value, line[3].value))
 del(alt_estimates.Parameter)
 
-estimates_orig = copy.deepcopy(estimates)
+# The model processes never change a parameter in 'estimates', so a shallow copy is enough to keep
+# the original values
+estimates_orig = copy.copy(estimates)
 
 # Add scenario-specific costs to Cost Dictionary
 def CDpop(param):
@@ -88,7 +90,20 @@ del(scenarios[0])
 
 # Define the number of entities you want to model"
 num_entities = 1200000
+
+"Read the pre-generated populations from population stores, a block of entities at a time?"
+# 1 - each population pickle is converted to a store the first time it is used, and the entities'
+#     results are written to disk as they finish (see 'Glb_PopulationStore.py'). The populations
+#     don't have to fit in memory, but the entities are not kept.
+# 0 - load each population pickle into memory
+population_store = 0
+
+import os
 from Glb_AnalyzeOutput import Analyze_Output
+from Glb_Snapshot import Snapshot
+from Glb_PopulationStore import PopulationStore, SavePopulation
+from Glb_ResultWriter import ResultWriter, ReadResults
+from Glb_SimEntity import EntityRow, MaxLYG
 output = Analyze_Output(estimates, CostDict)
 
 # STEP 1 - DEFINE THE SCENARIO BEING ANALYZED
@@ -126,23 +141,47 @@ for scen in range(len(scenarios)):
         loadname += '_hpv'
     oplload = loadname + '_opl.pickle'
     nooplload = loadname + '_noopl.pickle'
-    with open(oplload, 'rb') as f:
-        oplents = pickle.load(f)
-    with open(nooplload, 'rb') as f:
-        nooplents = pickle.load(f)
+    if population_store == 1:
+        # Open the stores (converting the pickles the first time); no entities are read yet
+        stores = []
+        for load in (oplload, nooplload):
+            storename = load.replace('.pickle', '_store')
+            if not os.path.exists(os.path.join(storename, 'index.pickle')):
+                with open(load, 'rb') as f:
+                    SavePopulation(pickle.load(f), storename)
+            stores.append(PopulationStore(storename))
+        oplstore, nooplstore = stores
+        maxLYG = MaxLYG(estimates)
+    else:
+        with open(oplload, 'rb') as f:
+            oplents = pickle.load(f)
+        with open(nooplload, 'rb') as f:
+            nooplents = pickle.load(f)
+        
+        # Freeze the population once. Each arm starts from the frozen population and only keeps the
+        # characteristics that its entities change (see 'Glb_Snapshot.py'), instead of deep-copying
+        # the whole population for every arm.
+        population = Snapshot(oplents + nooplents)
+        num_opl = len(oplents)
+        del(oplents, nooplents)
 
     for k in range(0,2):
         Alt_Scenario = k
         print ("Model Arm", k, "@", round((time.time() - looptime_start)/60, 2))
-        EntityList = []
-        seq_naive = copy.deepcopy(oplents) + copy.deepcopy(nooplents)
-        seq_infm = copy.deepcopy(oplents)
-        if Alt_Scenario == 0:
-            seqlist = seq_naive
+        if population_store == 1:
+            if Alt_Scenario == 0:
+                armstores = [oplstore, nooplstore]
+            else:
+                armstores = [oplstore]
+            ArmEntities = (entity for store in armstores for chunk in store.Chunks() for entity in chunk)
+            writer = ResultWriter('Chap6_' + version + '_%d.dat'%k)
         else:
-            seqlist = seq_infm
-        for ent in range(len(seqlist)):
-            entity = seqlist[ent]
+            if Alt_Scenario == 0:
+                EntityList = population.Arm()
+            else:
+                EntityList = population.Arm(range(num_opl))
+            ArmEntities = EntityList.Entities()
+        for ent, entity in enumerate(ArmEntities):
             entity.altscen = Alt_Scenario
             entity.Scenario_Prevention = Scenario_Prevention
             entity.Scenario_Screen = Scenario_Screen
@@ -217,12 +256,19 @@ for scen in range(len(scenarios)):
                     print(entity.currentState)
                     break
                 
-            EntityList.append(entity)
+            if population_store == 1:
+                # Work out the entity's LYG, QALY and cost now; the entity itself is not kept
+                writer.Add(EntityRow(entity, estimates, output, maxLYG))
+            else:
+                EntityList.Store(ent, entity)
             estimates = estimates_orig
+        if population_store == 1:
+            writer.Close()
+            EntityList = ReadResults(writer.filename)
         """
         Oversample = []    
         while len(Oversample) < 10000:
-            entity = copy.deepcopy(random.choice(oplents))
+            entity = population.Entity(random.randrange(num_opl))
             entity.altscen = Alt_Scenario
             while True:
                 CheckTime(entity, estimates, natHist, QALY)
@@ -298,11 +344,12 @@ for scen in range(len(scenarios)):
         """
         ################################
         # OPTIONAL STEP - SAVE OUTPUTS TO DISK
+        # Each arm already holds its own entities, so they don't need to be copied
         if k == 0:
-            AssayNaive = copy.deepcopy(EntityList)
+            AssayNaive = EntityList
             #Oversample_0 = copy.deepcopy(Oversample)
         else:
-            AssayInformed = copy.deepcopy(EntityList)
+            AssayInformed = EntityList
             #Oversample_1 = copy.deepcopy(Oversample)
             
     now = time.time()
@@ -310,70 +357,74 @@ for scen in range(len(scenarios)):
     print("The sequencer simulated", num_entities, "entities. It took", seqtime, "minutes. You can do this.")
 
     # Estimate the LYG and QALY generated by the entities in the population
-    NoOPL0_Surv = []
-    NoOPL0_Cost = []
-    NoOPL1_Surv = []
-    NoOPL1_Cost = []
-    print("Calculating LYG and QALY")
-    for k in range(0,2):
-        if k == 1:
-            EList = AssayInformed
-        elif k == 0:
-            EList = AssayNaive
-        NoOPL = []
-        HasOPL = []
-        for ent in range(len(EList)):
-            if EList[ent].OPLflag == 0:
-                NoOPL.append(EList[ent])
-            else:
-                HasOPL.append(EList[ent])
-        if k == 0:
-            NoOPL_0 = NoOPL
-            HasOPL_0 = HasOPL
-        elif k == 1:
-            NoOPL_1 = NoOPL
-            HasOPL_1 = HasOPL
+    if population_store == 1:
+        # The results were worked out during the run: the entities without OPL come from the
+        # Assay Naive arm, and the entities with OPL from each arm
+        NoOPL0 = AssayNaive[AssayNaive[:, 3] == 0]
+        OPL0 = AssayNaive[AssayNaive[:, 3] == 1]
+        OPL1 = AssayInformed[AssayInformed[:, 3] == 1]
+    else:
+        NoOPL0_Surv = []
+        NoOPL0_Cost = []
+        NoOPL1_Surv = []
+        NoOPL1_Cost = []
+        print("Calculating LYG and QALY")
+        for k in range(0,2):
+            if k == 1:
+                EList = AssayInformed
+            elif k == 0:
+                EList = AssayNaive
+            # Sort the entities by their OPL flag without building them
+            NoOPL = []
+            HasOPL = []
+            OPLflags = EList.Column('OPLflag')
+            for ent in range(len(EList)):
+                if OPLflags[ent] == 0:
+                    NoOPL.append(ent)
+                else:
+                    HasOPL.append(ent)
+            if k == 0:
+                NoOPL_0 = NoOPL
+                HasOPL_0 = HasOPL
+            elif k == 1:
+                NoOPL_1 = NoOPL
+                HasOPL_1 = HasOPL
             
-    OPLSurv_0 = np.array([output.EntitySurvival(x) for x in HasOPL_0])
-    OPLCost_0 = np.array([output.EntityCost(x) for x in HasOPL_0])
-    OPLSurv_1 = np.array([output.EntitySurvival(x) for x in HasOPL_1])
-    OPLCost_1 = np.array([output.EntityCost(x) for x in HasOPL_1])
-    #OvrSurv_0 = np.array([output.EntitySurvival(x) for x in Oversample_0])
-    #OvrCost_0 = np.array([output.EntityCost(x) for x in Oversample_0])
-    #OvrSurv_1 = np.array([output.EntitySurvival(x) for x in Oversample_1])
-    #OvrCost_1 = np.array([output.EntityCost(x) for x in Oversample_1])
+        OPLSurv_0 = np.array([output.EntitySurvival(x) for x in AssayNaive.Entities(HasOPL_0)])
+        OPLCost_0 = np.array([output.EntityCost(x) for x in AssayNaive.Entities(HasOPL_0)])
+        OPLSurv_1 = np.array([output.EntitySurvival(x) for x in AssayInformed.Entities(HasOPL_1)])
+        OPLCost_1 = np.array([output.EntityCost(x) for x in AssayInformed.Entities(HasOPL_1)])
+        #OvrSurv_0 = np.array([output.EntitySurvival(x) for x in Oversample_0])
+        #OvrCost_0 = np.array([output.EntityCost(x) for x in Oversample_0])
+        #OvrSurv_1 = np.array([output.EntitySurvival(x) for x in Oversample_1])
+        #OvrCost_1 = np.array([output.EntityCost(x) for x in Oversample_1])
     
-    OPL0 = np.c_[OPLSurv_0, OPLCost_0, [1]*len(OPLSurv_0)]
-    OPL1 = np.c_[OPLSurv_1, OPLCost_1, [1]*len(OPLSurv_1)]
-    now = time.time()
-    print("OPL cases done @ ", (now - looptime_start)/60, "minutes")
+        OPL0 = np.c_[OPLSurv_0, OPLCost_0, [1]*len(OPLSurv_0)]
+        OPL1 = np.c_[OPLSurv_1, OPLCost_1, [1]*len(OPLSurv_1)]
+        now = time.time()
+        print("OPL cases done @ ", (now - looptime_start)/60, "minutes")
     
-    #Ovr0 = np.c_[OvrSurv_0, OvrCost_0]
-    #Ovr1 = np.c_[OvrSurv_1, OvrCost_1]
-    #OversampleCEA = np.c_[Ovr0, Ovr1]
-    #now = time.time()
-    #print("Oversampling done @ ", (now - looptime_start)/60, "minutes")
+        #Ovr0 = np.c_[OvrSurv_0, OvrCost_0]
+        #Ovr1 = np.c_[OvrSurv_1, OvrCost_1]
+        #OversampleCEA = np.c_[Ovr0, Ovr1]
+        #now = time.time()
+        #print("Oversampling done @ ", (now - looptime_start)/60, "minutes")
     
-    discountrate = estimates.DiscountRate.mean
-    disc_rate = 1 - (1 - discountrate)**(1 / 365)
-    maxdays = estimates.timehorizon.mean*365
-    day = 0
-    maxLYG = 0
-    while day < maxdays:
-        maxLYG += (1/365)*(1+disc_rate)**(-day)
-        day+=1
+        maxdays = estimates.timehorizon.mean*365
+        maxLYG = MaxLYG(estimates)
     
-    for i in range(len(NoOPL_0)):
-        if NoOPL_0[i].time_death == maxdays:
-            NoOPL0_Surv.append([maxLYG, maxLYG*estimates.Util_Well.sample()])
-        else:
-            NoOPL0_Surv.append(output.EntitySurvival(NoOPL_0[i]))
-        NoOPL0_Cost.append(output.EntityCost(NoOPL_0[i]))
+        for entity in AssayNaive.Entities(NoOPL_0):
+            if entity.time_death == maxdays:
+                NoOPL0_Surv.append([maxLYG, maxLYG*estimates.Util_Well.sample()])
+            else:
+                NoOPL0_Surv.append(output.EntitySurvival(entity))
+            NoOPL0_Cost.append(output.EntityCost(entity))
     
-    now = time.time()
-    print("No OPL, Assay Naive done @", (now - looptime_start)/60, "minutes")
+        now = time.time()
+        print("No OPL, Assay Naive done @", (now - looptime_start)/60, "minutes")
         
-    NoOPL0 = np.c_[np.array(NoOPL0_Surv)[:,0], np.array(NoOPL0_Surv)[:,1], NoOPL0_Cost, [0]*len(NoOPL0_Surv)]
+        NoOPL0 = np.c_[np.array(NoOPL0_Surv)[:,0], np.array(NoOPL0_Surv)[:,1], NoOPL0_Cost, [0]*len(NoOPL0_Surv)]
+
     Output_0 = np.vstack((NoOPL0, OPL0))
     Output_1 = np.vstack((NoOPL0, OPL1))
     
@@ -401,7 +452,9 @@ for scen in range(len(scenarios)):
     #       history or disease event by 'Glb_Checktime.py'. The purpose of moving the clock forward is
     #       simply to prompt advancement to the next event.
     
-Output = [AssayNaive, AssayInformed]
-with open('Chap6_Entities_Baseline.pickle', 'wb') as inputs:
-    pickle.dump(Output, inputs, pickle.HIGHEST_PROTOCOL)
+# The entities are only kept when the populations are loaded into memory
+if population_store == 0:
+    Output = [AssayNaive, AssayInformed]
+    with open('Chap6_Entities_Baseline.pickle', 'wb') as inputs:
+        pickle.dump(Output, inputs, pickle.HIGHEST_PROTOCOL)
 
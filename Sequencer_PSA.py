@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+A probabilistic sensitivity analysis (PSA) version of the Sequencer. Inputs and scenarios are
+the same as 'Sequencer.py'.
+
+For each of "num_iterations" outer iterations, one value of every model parameter and unit cost is
+drawn, and "num_entities" entities are run through each arm of the model with the parameters fixed
+at those values (see 'Glb_PSA.py'). The iterations are spread over several processor cores. The
+mean LYG, QALY and cost of each arm in each iteration are saved to 'PSA_Output.csv', one row per
+iteration: [LYG, QALY, Cost] for the Assay Naive arm followed by the Assay Informed arm.
+
+Everything below is run inside "if __name__ == '__main__':" so that the worker processes do not
+re-load the input tables when they start.
+"""
+############################################################################################
+############################################################################################
+# LOAD SOME NECESSARY PACKAGES AND FUNCTIONS
+
+import time
+import numpy
+
+if __name__ == '__main__':
+    # Import Parameter Estimates, Regression Coefficients and Costs from the tables"
+    # The workbooks are only read when they have changed since the last run; otherwise the checked
+    # bundle of inputs saved by the last run is loaded (see 'Glb_InputBundle.py')
+
+    from Glb_InputBundle import LoadInputs
+
+    inputs = LoadInputs('InputParameters.xlsx', 'Alt_Parameters.xlsx')
+    estimates = inputs['estimates']
+    regcoeffs = inputs['regcoeffs']
+    CostDict = inputs['CostDict']           # Includes the scenario-specific costs from 'Alt_Parameters.xlsx'
+
+    #############################################################################################
+    ############################################################################################
+
+    ################################
+    # STEP 1 - LOAD IN SCENARIO PARAMETERS
+
+    # Alternative parameters are the values used for the specific scenarios considered in this
+    # manuscript (New Drug, Improved Screening, etc.) and are adjunct to the core WDMOC parameters
+    # stored in 'InputParameters.xlsx'
+
+    alt_estimates = inputs['alt_estimates']
+
+    ################################
+    # STEP 2 - DEFINE THE SCENARIO BEING ANALYZED
+    # 1 - include the effects of this policy scenario; 0 - do not include
+    Scenario_Prevention = 0
+    Scenario_Screen = 0
+    Scenario_Surg = 1
+    Scenario_Chemo = 0
+    Scenario_HPV = 0
+
+    ################################
+    # STEP 3 - RUN THE PSA
+    "Define the number of parameter draws (outer iterations) and the number of entities per arm in each"
+    num_iterations = 1000
+    num_entities = 10000
+
+    "Define the number of processor cores to use (None uses all of them) and the random seed"
+    num_processes = None
+    seed = 1234
+
+    "Use common random numbers, so that each entity has the same random numbers in both arms (see 'Glb_RandomStreams.py')"
+    common_random_numbers = False
+
+    from Glb_PSA import PSARunner
+
+    scenario = {'Prevention': Scenario_Prevention,
+                'Screen': Scenario_Screen,
+                'Surg': Scenario_Surg,
+                'Chemo': Scenario_Chemo,
+                'HPV': Scenario_HPV}
+    psa = PSARunner(estimates, regcoeffs, alt_estimates, CostDict, scenario, num_processes,
+                    crn=common_random_numbers)
+
+    looptime_start = time.time()
+    print("Running", num_iterations, "iterations of", num_entities, "entities per arm on", psa.processes, "processes")
+    OutputPSA = psa.Run(num_iterations, num_entities, seed)
+    now = time.time()
+    print("The PSA took", round((now - looptime_start)/60, 2), "minutes.")
+
+    # Output results as csv
+    # This step allows you to name the outputs so you can keep track of which file you want to analyze
+    versionext = 'PSA_Output.csv'
+    print("Saving...")
+    numpy.savetxt(versionext, OutputPSA, delimiter=",")
+    now = time.time()
+    print("Done: this process took ", (now - looptime_start)/60, "minutes")
+    print("Prev:", Scenario_Prevention, "Screen:", Scenario_Screen, "Surg:", Scenario_Surg, "Chemo:", Scenario_Chemo, "HPV:", Scenario_HPV)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Work out the costs and QALYs of a finished Sequencer run again, with new unit costs or utilities,
+without re-running the model.
+
+The Sequencer saves the resources used by every entity in each arm ('Scenario_Ledger_0' and
+'Scenario_Ledger_1') when it is run with 'save_ledger = 1' (see 'Glb_ResourceLedger.py'). This
+program applies the costs in the current 'InputParameters.xlsx' and 'Alt_Parameters.xlsx' (so a
+unit cost can be changed in the Costs sheet, or an 'Alt_*Cost' in the alternative parameters, and
+the run costed again), and the utilities in the Inputs sheet to the health states each entity
+entered. The output csv is written in the same layout as 'Sequencer.py'. The LYG of each entity is
+the one saved from the run.
+
+Optionally, results are also written for a list of other discount rates and shorter time horizons
+(one csv for each combination), without re-running the model for each one.
+
+"""
+############################################################################################
+############################################################################################
+# LOAD SOME NECESSARY PACKAGES AND FUNCTIONS
+
+import time
+import numpy
+
+# Import the costs and utilities from the tables (see 'Glb_InputBundle.py')
+
+from Glb_InputBundle import LoadInputs
+
+inputs = LoadInputs('InputParameters.xlsx', 'Alt_Parameters.xlsx')
+estimates = inputs['estimates']
+CostDict = inputs['CostDict']           # Includes the scenario-specific costs from 'Alt_Parameters.xlsx'
+
+################################
+# STEP 1 - DEFINE HOW THE COSTS AND UTILITIES ARE APPLIED
+
+"The ledgers saved by the Sequencer for the two arms of the analysis"
+ledgers = ['Scenario_Ledger_0', 'Scenario_Ledger_1']
+
+"Which results are worked out again"
+# 1 - apply the current costs / utilities; 0 - keep the values saved from the run
+recost = 1
+requalify = 0
+
+"The annual discount rate for costs. 'None' uses the 'Discount' row of the Costs sheet"
+discount_rate = None
+
+"How the unit costs of gamma-distributed resources are chosen"
+# 1 - draw a cost for each resource used, as the Sequencer does; 0 - use the mean cost
+cost_sampling = 1
+
+"How the utility of each health state is chosen"
+# 1 - draw a utility each time an entity enters the state, as the Sequencer does; 0 - use the mean utility
+utility_sampling = 1
+seed = 1234
+
+"The name of the output file"
+versionext = 'Scenario_Output_Recost.csv'
+
+"Other annual discount rates and time horizons (in years; 'None' is the run's time horizon) to report"
+# Each combination is saved as 'Scenario_Output_Disc<rate>_Horizon<years>.csv'. Leave
+# 'discount_rates' empty to skip this step.
+discount_rates = []
+horizons = [None]
+
+################################
+# STEP 2 - APPLY THE COSTS AND UTILITIES
+
+from Glb_ResourceLedger import Recost, Requalify, ReadLedger
+from Glb_ResultWriter import OrderRows
+
+start = time.time()
+numpy.random.seed(seed)
+Output = []
+for ledger in ledgers:
+    rows = numpy.array(ReadLedger(ledger, 'rows'))
+    if recost == 1:
+        rows[:, 2] = Recost(ledger, CostDict, discount_rate, cost_sampling == 1)[:, 2]
+    if requalify == 1:
+        rows[:, 1] = Requalify(ledger, estimates, utility_sampling == 1)[:, 1]
+    Output.append(OrderRows(rows))
+OutputCEA = numpy.c_[Output[0], Output[1]]
+
+print("Saving...")
+numpy.savetxt(versionext, OutputCEA, delimiter=",")
+
+################################
+# STEP 3 - OTHER DISCOUNT RATES AND TIME HORIZONS
+
+from Glb_ResourceLedger import Rediscount
+
+if discount_rates:
+    numpy.random.seed(seed)
+    results = [Rediscount(ledger, estimates, CostDict, discount_rates, horizons,
+                          cost_sampling == 1, utility_sampling == 1) for ledger in ledgers]
+    for rate in discount_rates:
+        for horizon in horizons:
+            OutputCEA = numpy.c_[OrderRows(results[0][(rate, horizon)]), OrderRows(results[1][(rate, horizon)])]
+            horizonname = 'Run' if horizon is None else horizon
+            numpy.savetxt('Scenario_Output_Disc%s_Horizon%s.csv' % (rate, horizonname), OutputCEA, delimiter=",")
+
+print("Done: this process took ", round(time.time() - start, 2), "seconds")
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Find the unit price at which each experimental intervention reaches a cost-effectiveness threshold,
+from the saved resource ledgers of two finished Sequencer runs (see 'Glb_PriceThreshold.py').
+
+Run the Sequencer with 'save_ledger = 1' for the comparator (e.g., every 'Scenario_' flag set to 0)
+and for the scenario with the intervention, and rename the ledgers of the two runs as below. The
+threshold price of each experimental intervention used in the runs is printed, with its bootstrap
+confidence band, and saved to 'Price_Thresholds.csv'. The model is not run again.
+
+"""
+############################################################################################
+############################################################################################
+# LOAD SOME NECESSARY PACKAGES AND FUNCTIONS
+
+import time
+import numpy
+
+# Import the costs from the tables (see 'Glb_InputBundle.py')
+
+from Glb_InputBundle import LoadInputs, ALT_COSTS
+
+inputs = LoadInputs('InputParameters.xlsx', 'Alt_Parameters.xlsx')
+CostDict = inputs['CostDict']           # Includes the scenario-specific costs from 'Alt_Parameters.xlsx'
+
+################################
+# STEP 1 - DEFINE THE THRESHOLD ANALYSIS
+
+"The ledgers of the comparator and of the scenario with the intervention, for the same model arm"
+ledgers = ['Baseline_Ledger_0', 'Scenario_Ledger_0']
+
+"The willingness to pay per unit of effect, and the incremental net monetary benefit to reach"
+# A target NMB of 0 finds the price at which the ICER equals the willingness to pay
+wtp = [50000, 100000]
+target_nmb = 0
+
+"The effect used: 'QALY' or 'LYG'"
+effect = 'QALY'
+
+"How the unit costs of the other gamma-distributed resources are chosen"
+# 1 - draw a cost for each resource used, as the Sequencer does; 0 - use the mean cost
+cost_sampling = 0
+
+"Bootstrap confidence band"
+num_samples = 1000
+level = 0.95
+seed = 1234
+
+################################
+# STEP 2 - FIND THE THRESHOLD PRICES
+
+from Glb_PriceThreshold import PriceThreshold
+
+start = time.time()
+numpy.random.seed(seed)
+Output = []
+for i, resource in enumerate(ALT_COSTS):
+    threshold = PriceThreshold(ledgers, CostDict, resource, effect, cost_sampling == 1)
+    if threshold.uses[0].sum() == 0 and threshold.uses[1].sum() == 0:
+        # The intervention isn't used in either run
+        continue
+    for value in wtp:
+        price, low, high = threshold.Bootstrap(value, target_nmb, num_samples, level, seed)
+        print(resource, "- WTP", value, ": threshold price", round(price, 2), "(", round(low, 2), "to", round(high, 2), ")")
+        Output.append([i, value, target_nmb, price, low, high])
+
+# Each row is: intervention (its position in 'ALT_COSTS'), WTP, target NMB, price, lower and upper limits
+numpy.savetxt('Price_Thresholds.csv', numpy.array(Output).reshape(-1, 6), delimiter=",")
+print("Done: this process took ", round(time.time() - start, 2), "seconds")
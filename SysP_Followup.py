@@ -22,7 +22,11 @@ class Followup:
     def __init__(self, estimates, regcoeffs):
         self._estimates = estimates
         self._regcoeffs = regcoeffs
+        self.Sample()
 
+    def Sample(self):
+        # Sample the follow-up appointment intervals
+        estimates = self._estimates
         self.appInt_0to3 = estimates.Folup_time_appInt0to3.sample()
         self.appInt_3to5 = estimates.Folup_time_appInt3to5.sample()
         self.appInt_5to10 = estimates.Folup_time_appInt5to10.sample()
@@ -35,10 +39,10 @@ class Followup:
         
         else:
         
-            if hasattr(entity, "recurrence") == False:
+            if entity.recurrence is None:
                 entity.recurrence = 0
         
-            if hasattr(entity, "time_Folup") == False:
+            if entity.time_Folup is None:
                 entity.stateNum = 99;
                 entity.currentState = "ERROR: The entity was not assigned a valid follow-up time in the 'IncidentCancer' process"
             
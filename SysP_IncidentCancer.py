@@ -12,7 +12,7 @@ class IncidentCancer:
         self._regcoeffs = regcoeffs
 
     def Process(self, entity):       
-        if getattr(entity, "sympt", 0) == 1:                        # People who present through symptoms have to get a biopsy before their workup
+        if entity.sympt == 1:                        # People who present through symptoms have to get a biopsy before their workup
             entity.resources.append(("Biopsy", entity.allTime))              # Add biopsy into resources list
             entity.sympt = 9                                            # Set symptomatic flag to placeholder value
     
@@ -20,7 +20,7 @@ class IncidentCancer:
         entity.resources.append(("Diagnostic Workup", entity.allTime))
 
         # Determine treatment eligibility for first cancers
-        if hasattr(entity, 'tx_prim') == False: 
+        if entity.tx_prim is None: 
             from Glb_CancerFlags import CancerFlags
             cancerflags = CancerFlags(entity, self._estimates)
             cancerflags.Process(entity)                         # Apply some disease and treatment flags 
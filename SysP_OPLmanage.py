@@ -21,13 +21,17 @@ from Glb_Estimates import Estimate
 
 #  STEP 2: Define class that describes entity's changed trajectory
 
-import random
+from Glb_RandomStreams import Uniform
 
 class OPLManage:
     def __init__(self, alt_estimates, regcoeffs):
         self._estimates = alt_estimates
         self._regcoeffs = regcoeffs        
+        self.Sample()
 
+    def Sample(self):
+        # Sample appointment intervals, test accuracy and biopsy times
+        alt_estimates = self._estimates
         self.appInt_med = 365*alt_estimates.Appint_med.sample()
         self.appInt_lo = 365*alt_estimates.Appint_lo.sample()
         self.appInt_gen = 365*alt_estimates.Appint_gen.sample()
@@ -40,7 +44,7 @@ class OPLManage:
 
     def Process(self, entity,):
         entity.OPLDetected = 1
-        if hasattr(entity, 'firstOPL') == False:
+        if entity.firstOPL is None:
             # This is the entity's first time in this state
             entity.resources.append(("Biopsy", entity.allTime))
             entity.firstOPL = 1
@@ -51,7 +55,7 @@ class OPLManage:
                 # Entity receives genomic test during first appointment
                 entity.resources.append(("OPL genomic test", entity.allTime))
         
-        if hasattr(entity, 'altscen') == False:
+        if entity.altscen is None:
             entity.altscen = 99
         if entity.altscen == 0:
             appInt = self.appInt_gen
@@ -71,7 +75,7 @@ class OPLManage:
         else:
             print("Please specify 'entity.altscen' as either 1 or 0")
             
-        if hasattr(entity, 'hiriskdet') == True:
+        if entity.hiriskdet is not None:
             entity.events.append(("High risk lesion first detected at OPL followup", entity.allTime))
             entity.cancer_screenDetected = 1
             entity.cancerDetected = 1
@@ -94,7 +98,7 @@ class OPLManage:
         else:
             # IS THE ENTITY DISCHARGED?
             "How long has the entity been undergoing OPL surveillance?"
-            if hasattr(entity, 'time_OPLfu') == False:
+            if entity.time_OPLfu is None:
                 entity.time_OPLfu = 0
                 entity.tottime_OPLfu = 0
             else:
@@ -105,7 +109,7 @@ class OPLManage:
                     entity.stateNum = 1.8
                     entity.currentState = "1.8 - Waiting for disease event"
 
-            if hasattr(entity, 'discharge') == True:
+            if entity.discharge is not None:
                 # If the entity is due to be discharged from follow-up, do nothing
                 pass
             
@@ -118,7 +122,7 @@ class OPLManage:
                         # Not possible to get biopsied twice at first appointment
                         pass
                     else:
-                        falsePos = random.random()
+                        falsePos = Uniform()
                         if falsePos > self.specificity:
                             # Visual screen returns false positive, sent for biopsy
                             entity.resources.append(("Biopsy", entity.allTime))
@@ -126,7 +130,7 @@ class OPLManage:
                     
                 else:
                     # If a person has cancer, it is visually inspected and may yield a false negative
-                    falseNeg = random.random()
+                    falseNeg = Uniform()
                     if falseNeg > self.sensitivity:
                         entity.time_Sysp += appInt
                     else:
@@ -161,13 +165,13 @@ class OPLManage:
         if entity.cancerDetected == 0:
             entity.time_OPLfu += appInt
             entity.tottime_OPLfu += appInt
-            if hasattr(entity, 'discharge') == True:
+            if entity.discharge is not None:
                 # If the entity is due to be discharged from follow-up, set next followup to implausible value
                 entity.time_OPLfu = 555555
                 entity.tottime_OPLfu = 555555
             # If the entity has a dentist, they return to regular dental appointments
             elif entity.hasDentist == 1:
-                if hasattr(entity, 'time_Dentist') == False:
+                if entity.time_Dentist is None:
                     # The entity's next dental appointment has not been assigned
                     entity.time_Dentist = 90
                     # Entity goes back to their dentist in 3 months
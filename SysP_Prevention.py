@@ -1,13 +1,19 @@
-import random
+from Glb_RandomStreams import Uniform
 
 class Prevention:
     def __init__(self, alt_estimates):
+        self._alt_estimates = alt_estimates
+        self.Sample()
+
+    def Sample(self):
+        # Sample the effect of the prevention program
+        alt_estimates = self._alt_estimates
         self.smoking_reduc = alt_estimates.Smoking_Reduc.sample()
         self.alcohol_reduc = alt_estimates.Alcohol_Reduc.sample()
 
     def Process(self, entity):
-        changeSmoke = random.random()
-        changeAlc = random.random()
+        changeSmoke = Uniform()
+        changeAlc = Uniform()
         scenario = 0
         if entity.smokeStatus == 'Ever':
             entity.resources.append(('Experimental Smoking Cessation', entity.allTime))
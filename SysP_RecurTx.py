@@ -11,7 +11,8 @@ of the model. Their "end of life" time is assigned by 'Glb_CheckTime.py'.
 
 """
 
-import random
+from Glb_RandomStreams import Uniform
+from Glb_Estimates import DirichletCategory
 from Glb_GenTime import GenTime
 from Glb_CompTime import CompTime
 
@@ -21,12 +22,11 @@ class RecurTx:
         self._regcoeffs = regcoeffs
         
         self.tx_time_treatment = estimates.Tx_time_treatment.sample()
-        self.Txprob = random.random()
+        self.Txprob = Uniform()
         
     def Recurflags(self, entity):
-        from Glb_Estimates import diriSample
         
-        if hasattr(entity, 'prevRecur') == False:
+        if entity.prevRecur is None:
             entity.prevRecur = 0
             
         # Has entity experienced previous recurrence?
@@ -38,46 +38,10 @@ class RecurTx:
                  # 'palliative' - managed palliatively
                  # 'notx' - no treatment received
     
-            # A 'names' vector for the dirichlet sampling process
-            Txprob_names = ["Tx_probSurgery", "Tx_probNonsurgery", "Tx_probPalliative", "Tx_probNoTx"]
-    
-            # A 'values' vector for the dirichlet sampling process
-            Txprob_probs = [self._estimates.Tx_recurrence_probSurgery.mean, 
-                            self._estimates.Tx_recurrence_probNonsurgery.mean, 
-                            self._estimates.Tx_recurrence_probPalliative.mean, 
-                            self._estimates.Tx_recurrence_probNoTx.mean]
-                                
-             # Generate random value for treatment type
-            diriSample(self._estimates, Txprob_names, Txprob_probs)      
-                
-            # Entity receives surgery alone
-            if self.Txprob <= self._estimates.Tx_probSurgery:
-                entity.tx_recur = 'Surgery'
-                
-            # Entity receives surgery + RT
-            elif self._estimates.Tx_probSurgery \
-                    < self.Txprob <= \
-                    (self._estimates.Tx_probSurgery + self._estimates.Tx_probNonsurgery):
-                entity.tx_recur = 'Nonsurgery'
-                    
-            # Entity receives other adjuvant treatment
-            elif (self._estimates.Tx_probNonsurgery + self._estimates.Tx_probSurgery) <\
-                    self.Txprob <= \
-                    (self._estimates.Tx_probSurgery + self._estimates.Tx_probNonsurgery + 
-                        self._estimates.Tx_probPalliative):
-                entity.tx_recur = 'Palliative'
-                
-            # Entity receives other adjuvant treatment
-            elif (self._estimates.Tx_probSurgery + self._estimates.Tx_probNonsurgery + 
-                    self._estimates.Tx_probPalliative) < \
-                    self.Txprob <= \
-                    (self._estimates.Tx_probSurgery + self._estimates.Tx_probNonsurgery + 
-                        self._estimates.Tx_probPalliative + self._estimates.Tx_probNoTx):
-                entity.tx_recur = 'Notx'
-        
-            else:
-                entity.currentState = "ERROR - Something has gone wrong in the treatment assignment process. Check 'SysP_RecurTx.py'"
-                entity.stateNum = 99
+            # Generate random value for treatment type, from the Dirichlet-distributed probabilities
+            # of each type (see 'DIRICHLET_BLOCKS' in 'Glb_Estimates.py')
+            tx = DirichletCategory(self._estimates, 'Tx_recurrence', self.Txprob)
+            entity.tx_recur = ['Surgery', 'Nonsurgery', 'Palliative', 'Notx'][tx]
         # END IF NO PREVIOUS RECURRENCE
 
         # YES
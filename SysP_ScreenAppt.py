@@ -17,14 +17,18 @@ They will proceed to the "OPL Management" stage at that point.
 
 """
 
-import random
+from Glb_RandomStreams import Uniform
 
 class ScreenAppt:
     
     def __init__(self, estimates, regcoeffs):
         self._estimates = estimates
         self._regcoeffs = regcoeffs
+        self.Sample()
         
+    def Sample(self):
+        # Sample the screening parameters (can be called again to re-sample them)
+        estimates = self._estimates
         self.anyLesion = estimates.Screen_anylesion.sample()
         self.appInt = int(estimates.Screen_appint.sample())
         self.screenReturnInt = estimates.Screen_returnint.sample()
@@ -34,7 +38,7 @@ class ScreenAppt:
         self.needsBiopsy = estimates.Screen_needsbiopsy.sample()
         
     def Process(self, entity): 
-        if hasattr(entity, "count_DentAppt") == False:              # If this person doesn't already have the 'DentAppt' field created, create it for them
+        if entity.count_DentAppt is None:              # If this person doesn't already have the 'DentAppt' field created, create it for them
             entity.count_DentAppt = 0                               # Start the tally of appointments at zero
             entity.count_ScreenAppt = 0
             entity.count_ScreenInt = 0                              # Start a count for the screening interval
@@ -42,7 +46,7 @@ class ScreenAppt:
             entity.screened = 1
             entity.tottime_OPLfu = 0.0
             
-        if hasattr(entity, "flsPosCount") == False:
+        if entity.flsPosCount is None:
             entity.flsNegCount = 0
             entity.flsPosCount = 0
 
@@ -89,7 +93,7 @@ class ScreenAppt:
             
             elif entity.OPLStatus == 1:
                 if entity.screenReturn == 0:
-                    detectDisease = random.random()
+                    detectDisease = Uniform()
                     if detectDisease < self.detectOPL:
                         # An additional screening cost may be incurred
                         entity.resources.append(("Cancer Screening", entity.allTime))
@@ -131,12 +135,12 @@ class ScreenAppt:
                         
             else:
                 if entity.screenReturn == 0: # Regular appointment
-                    hasLesion = random.random() # A non-premalignant lesion may be present
+                    hasLesion = Uniform() # A non-premalignant lesion may be present
                     if hasLesion < self.anyLesion:
                         # Non-premalignant lesion may be recommended to return
                         # An additional screening cost may be incurred
                         entity.resources.append(("Cancer Screening", entity.allTime))
-                        willReturn = random.random()
+                        willReturn = Uniform()
                         if willReturn < self.willReturn:
                             entity.screenReturn = 1
                             entity.time_Sysp += self.screenReturnInt
@@ -150,14 +154,14 @@ class ScreenAppt:
                 else:
                     entity.screenReturn = 0     # Entity is returning, screenReturn status is reset
                     # Has lesion resolved?
-                    lesionResolved = random.random()
+                    lesionResolved = Uniform()
                     if lesionResolved < self.lesionResolves: # Lesion persists
                         # An additional screening cost may be incurred
                         entity.resources.append(("Cancer Screening", entity.allTime))                
                         # Refer to specialist for further screening
                         entity.resources.append(("Specialist Appointment", entity.allTime))                    
     
-                        biopsyLesion = random.random()
+                        biopsyLesion = Uniform()
                         if biopsyLesion < self.needsBiopsy: # non-OPL is suspicious
                             entity.flsPosCount += 1
                             # Add biopsy into resources list
@@ -18,15 +18,16 @@ retrospective survival data from diagnosed patients.
 @author: icromwell
 """
 
-import random
-import math
-from copy import deepcopy
+from Glb_RandomStreams import Uniform
 from Glb_CompTime import CompTime
 
 class StageAdvTx:
-    def __init__(self, estimates, regcoeffs):
-        self._estimates = deepcopy(estimates)
-        self._regcoeffs = deepcopy(regcoeffs)        
+    def __init__(self, estimates, regcoeffs, int_adj=0):
+        self._estimates = estimates
+        self._regcoeffs = regcoeffs
+        # An adjustment to the intercept of the survival regressions (e.g., for HPV status),
+        # passed to 'CompTime' rather than written into the regression table
+        self.int_adj = int_adj
         
         self.tx_time_treatment = estimates.Tx_time_treatment.sample()
         self.prob_other_RT = estimates.Tx_other_RT.sample()
@@ -37,21 +38,20 @@ class StageAdvTx:
         start = entity.allTime
         entity.time_Sysp = entity.allTime
         surgery = 0
-        probRT = random.random()
-        probChemo = random.random()
+        probRT = Uniform()
+        probChemo = Uniform()
+        int_adj = self.int_adj
         
         # Chapter 6 - Incorporate surgical change
         if entity.Scenario_Chemo == 1 and entity.tx_prim == 'Other':
             if probChemo < self.prob_other_chemo:
                 scenario = 1
-                int_adj = entity.RR_Chemo
-                self._regcoeffs['FirstEvent']['Intercept']['mean'] -= int_adj
-                self._regcoeffs['FirstEvent_death']['Intercept']['mean'] -= int_adj
+                int_adj += entity.RR_Chemo
 
         # Schedule next event
         # Generate random time to event - either recurrence or death
         makeEvent = CompTime(self._estimates, self._regcoeffs)
-        nextEvent = makeEvent.Process(entity, 'FirstEvent', 'FirstEvent_death')
+        nextEvent = makeEvent.Process(entity, 'FirstEvent', 'FirstEvent_death', int_adj)
             
         if nextEvent[0] < 3650:  # Entity experiences some event between 3 months and 10 years
             entity.utility.append(("Advanced Cancer Under Treatment", self._estimates.Util_StageI_Tx.sample(), entity.allTime))
@@ -18,15 +18,16 @@ retrospective survival data from diagnosed patients.
 @author: icromwell
 """
 
-import random
-import math
-from copy import deepcopy
+from Glb_RandomStreams import Uniform
 from Glb_CompTime import CompTime
 
 class StageOneTx:
-    def __init__(self, estimates, regcoeffs):
-        self._estimates = deepcopy(estimates)
-        self._regcoeffs = deepcopy(regcoeffs)
+    def __init__(self, estimates, regcoeffs, int_adj=0):
+        self._estimates = estimates
+        self._regcoeffs = regcoeffs
+        # An adjustment to the intercept of the survival regressions (e.g., for HPV status),
+        # passed to 'CompTime' rather than written into the regression table
+        self.int_adj = int_adj
 
         self.tx_time_treatment = estimates.Tx_time_treatment.sample()
         self.prob_other_RT = estimates.Tx_other_RT.sample()
@@ -37,18 +38,17 @@ class StageOneTx:
         start = entity.allTime
         entity.time_Sysp = entity.allTime
         scenario = 0
+        int_adj = self.int_adj
         
         # Chapter 6 - Incorporate surgical change
         if entity.Scenario_Surg == 1 and entity.tx_prim == 'Surgery':
             scenario = 1
-            int_adj = entity.RR_Surgery
-            self._regcoeffs['FirstEvent']['Intercept']['mean'] -= int_adj
-            self._regcoeffs['FirstEvent_death']['Intercept']['mean'] -= int_adj
+            int_adj += entity.RR_Surgery
 
         # Schedule next event
         # Generate random time to event - either recurrence or death
         makeEvent = CompTime(self._estimates, self._regcoeffs)
-        nextEvent = makeEvent.Process(entity, 'FirstEvent', 'FirstEvent_death')
+        nextEvent = makeEvent.Process(entity, 'FirstEvent', 'FirstEvent_death', int_adj)
            
         if nextEvent[0] < 3650:  # Entity experiences some event between 3 months and 10 years
             entity.utility.append(("Stage I Cancer Under Treatment", self._estimates.Util_StageI_Tx.sample(), entity.allTime))
@@ -101,8 +101,8 @@ class StageOneTx:
             entity.RTCount += 1
             
         elif entity.tx_prim == 'Other':
-            probRT = random.random()
-            probChemo = random.random()
+            probRT = Uniform()
+            probChemo = Uniform()
             
             entity.resources.append(("Treatment - Stage I - Other", entity.allTime))
             entity.events.append(("Treatment - Stage I - Other", entity.allTime))
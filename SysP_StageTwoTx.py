@@ -18,13 +18,16 @@ retrospective survival data from diagnosed patients.
 @author: icromwell
 """
 
-import random
+from Glb_RandomStreams import Uniform
 from Glb_CompTime import CompTime
 
 class StageTwoTx:
-    def __init__(self, estimates, regcoeffs):
+    def __init__(self, estimates, regcoeffs, int_adj=0):
         self._estimates = estimates
         self._regcoeffs = regcoeffs
+        # An adjustment to the intercept of the survival regressions (e.g., for HPV status),
+        # passed to 'CompTime' rather than written into the regression table
+        self.int_adj = int_adj
 
         self.tx_time_treatment = estimates.Tx_time_treatment.sample()        
         self.prob_other_RT = estimates.Tx_other_RT.sample()
@@ -38,7 +41,7 @@ class StageTwoTx:
         # Schedule next event
         # Generate random time to event - either recurrence or death
         makeEvent = CompTime(self._estimates, self._regcoeffs)
-        nextEvent = makeEvent.Process(entity, 'FirstEvent', 'FirstEvent_death')
+        nextEvent = makeEvent.Process(entity, 'FirstEvent', 'FirstEvent_death', self.int_adj)
             
         if nextEvent[0] < 3650:  # Entity experiences some event between 3 months and 10 years
             entity.utility.append(("Stage II Cancer Under Treatment", self._estimates.Util_StageI_Tx.sample(), entity.allTime))
@@ -89,8 +92,8 @@ class StageTwoTx:
             entity.RTCount += 1
             
         elif entity.tx_prim == 'Other':
-            probRT = random.random()
-            probChemo = random.random()
+            probRT = Uniform()
+            probChemo = Uniform()
             
             entity.resources.append(("Treatment - Stage II - Other", entity.allTime))
             entity.events.append(("Treatment - Stage II - Other", entity.allTime))
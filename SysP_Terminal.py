@@ -30,14 +30,14 @@ class Terminal:
         entity.time_Sysp = entity.allTime
            
         # Entities receiving no treatment OR palliative treatment (for recurrence)
-        if hasattr(entity, 'endOfLife') == False:
+        if entity.endOfLife is None:
 
             # Entities with recurrence may be palliative or NoTx        
-            if hasattr(entity, 'recurrence') == True:
+            if entity.recurrence is not None:
                 entity.utility.append(("Incurable disease", self._estimates.Util_Incurable.sample(), entity.allTime))
 
                 if entity.tx_recur == 'Palliative':
-                    if hasattr(entity, "palliativeMonth") == False:
+                    if entity.palliativeMonth is None:
                         entity.palliativeMonth = 1
                     # Entity experiences spontaneous remission
                     if entity.palliativeMonth >= 520:                
@@ -48,11 +48,12 @@ class Terminal:
                         entity.time_Recurrence = 666666     # Future recurrence set to impossible date
                     else:
                         entity.resources.append(("Treatment - Palliative", entity.allTime))
-                        entity.events.append(("Palliative care - month%2.0f"%entity.palliativeMonth, entity.allTime))
+                        # One event is logged for each month of care; the month is held in 'palliativeMonth'
+                        entity.events.append(("Palliative care", entity.allTime))
                         entity.palliativeMonth +=1
     
                 elif entity.tx_recur == 'Notx':
-                    if hasattr(entity, "notxMonth") == False:
+                    if entity.notxMonth is None:
                         entity.notxMonth = 1
                     # Entity experiences spontaneous remission
                     if entity.notxMonth >= 520:                
@@ -63,7 +64,7 @@ class Terminal:
                         entity.time_Recurrence = 666666     # Future recurrence set to impossible date
                     else:
                         entity.resources.append(("Treatment - Recurrence - No Treatment", entity.allTime))
-                        entity.events.append(("Best supportive care - month%2.0f"%entity.notxMonth, entity.allTime))
+                        entity.events.append(("Best supportive care", entity.allTime))
                         entity.notxMonth += 1
                         
                 entity.time_Sysp += 30                # Advance clock one month
@@ -76,7 +77,7 @@ class Terminal:
         # END IF    
 
         # Entity is in last three months of life                
-        elif hasattr(entity, 'endOfLife') == True:             
+        elif entity.endOfLife is not None:             
             #Terminal disease - end-of-life care
             entity.resources.append(("Treatment - End of Life", entity.allTime))
             entity.events.append(("End-of-life care", entity.allTime))
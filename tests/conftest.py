@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Shared set-up for the tests.
+
+The model programs are plain modules in the top folder of the repository, and they read their
+input files ('InputBundle.pickle', the workbooks and the life tables) from the working directory,
+so the tests are run from there. The inputs are loaded once for the whole test session.
+
+Run the tests from the top folder with:
+    python -m pytest -q tests
+
+"""
+
+import os
+import random
+import sys
+
+import numpy
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+@pytest.fixture(scope='session')
+def inputs():
+    """The model inputs (see 'Glb_InputBundle.LoadInputs')"""
+    os.chdir(ROOT)
+    from Glb_InputBundle import LoadInputs
+    return LoadInputs()
+
+@pytest.fixture(scope='session')
+def seed():
+    """A function that seeds the 'numpy.random' and 'random' generators and empties the buffered
+    draws (see 'Glb_RandomStreams.py'), so that two runs can be given the same random numbers"""
+    from Glb_RandomStreams import ResetBuffers
+    def Seed(value):
+        numpy.random.seed(value)
+        random.seed(value)
+        ResetBuffers()
+    return Seed
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+LYG, QALY and costs ('Glb_AnalyzeOutput.py') against the original calculations.
+
+'DailySurvival' is the original 'EntitySurvival', which adds up the discounted days one at a
+time. The closed-form sums differ from it only by rounding. 'LoopCost' is the original
+'EntityCost', which prices the resources one at a time; from the same random numbers, the
+compiled cost table draws the same unit costs.
+
+"""
+
+import math
+import types
+
+import numpy
+import pytest
+
+N = 300
+
+SCENARIO = {'Prevention': 0, 'Screen': 1, 'Surg': 1, 'Chemo': 0, 'HPV': 0}
+
+def DailySurvival(entity, estimates):
+    ent_util = []
+    for i in range(len(entity.utility)):
+        ent_util.append([int(round(entity.utility[i][2], 0)), entity.utility[i][1]])
+    if ent_util[len(ent_util)-1][0] == 0:
+        ent_util.append([1,0])
+    while ent_util[1][0] == 0:
+        del(ent_util[0])
+    for i in range(1,len(ent_util)):
+        if ent_util[i][0] == ent_util[i-1][0]:
+            ent_util[i] = 'Delete'
+    while 'Delete' in ent_util:
+        ent_util.remove('Delete')
+        for i in range(1,len(ent_util)):
+            if ent_util[i][0] == ent_util[i-1][0]:
+                ent_util[i] = 'Delete'
+
+    discountrate = estimates.DiscountRate.mean
+    disc_rate = 1 - (1 - discountrate)**(1 / 365)
+    day = 0
+    LYG = 0
+    QALY = 0
+    for h in (1,len(ent_util)-1):
+        Util = ent_util[h-1][1]
+        while day < ent_util[h][0]:
+            LYG += (1/365)*(1+disc_rate)**(-day)
+            QALY += (Util/365)*(1+disc_rate)**(-day)
+            day +=1
+    return [LYG, QALY]
+
+@pytest.fixture(scope='module')
+def entities(inputs, seed):
+    from Glb_SimEntity import SimEntity
+    sim = SimEntity(inputs['estimates'], inputs['regcoeffs'], inputs['alt_estimates'], SCENARIO)
+    seed(5)
+    return [sim.Run(i, 1) for i in range(N)]
+
+def test_survival_matches_daily_loop(inputs, entities):
+    from Glb_AnalyzeOutput import Analyze_Output
+    estimates = inputs['estimates']
+    output = Analyze_Output(estimates, inputs['CostDict'])
+    expected = numpy.array([DailySurvival(entity, estimates) for entity in entities])
+
+    survival = numpy.array([output.EntitySurvival(entity) for entity in entities])
+    numpy.testing.assert_allclose(survival, expected, rtol=1e-12, atol=0)
+
+    LYG, QALY = output.CohortSurvival(entities)
+    numpy.testing.assert_allclose(numpy.c_[LYG, QALY], expected, rtol=1e-12, atol=0)
+
+def test_maximum_LYG(inputs):
+    from Glb_SimEntity import MaxLYG
+    estimates = inputs['estimates']
+    disc_rate = 1 - (1 - estimates.DiscountRate.mean)**(1 / 365)
+    maxdays = estimates.timehorizon.mean*365
+    day = 0
+    maxLYG = 0
+    while day < maxdays:
+        maxLYG += (1/365)*(1+disc_rate)**(-day)
+        day += 1
+    assert math.isclose(MaxLYG(estimates), maxLYG, rel_tol=1e-12)
+
+@pytest.mark.parametrize('disc_rate', [0, 1.5/365/100])
+def test_discounted_years(disc_rate):
+    from Glb_AnalyzeOutput import DiscountedYears
+    for start, stop in ((0, 0), (0, 1), (3, 400), (400, 3), (17, 3650)):
+        expected = sum((1/365)*(1+disc_rate)**(-day) for day in range(start, stop))
+        assert math.isclose(float(DiscountedYears(start, stop, disc_rate)), expected,
+                            rel_tol=1e-12, abs_tol=1e-15)
+
+def LoopCost(entity, CostDict):
+    # The original 'EntityCost', with the unit cost of each resource drawn one at a time
+    resourcelist = entity.resources
+    maxlen = len(resourcelist)-1
+    if maxlen >= 0 and resourcelist[maxlen][1] > entity.natHist_deathAge:
+        del(resourcelist[maxlen])
+    costList = []
+    for j in range(0, len(resourcelist)):
+        unit = resourcelist[j][0]
+        if CostDict[unit][0] == 1:
+            samp_value = CostDict[unit][1]
+        elif CostDict[unit][0] == 2:
+            x = CostDict[unit][1]
+            y = CostDict[unit][2]
+            samp_value = numpy.random.gamma(x**2/y**2, y**2/x)
+        year = float(resourcelist[j][1]/365)
+        discRate_cost = 1 / (1 + CostDict['Discount'][1])**year
+        costList.append(samp_value*discRate_cost)
+    return sum(costList)
+
+def Copy(entity):
+    # Costing removes a resource used after death from the log, so each calculation is given its
+    #   own copy of the log
+    return types.SimpleNamespace(resources=entity.resources.copy(),
+                                 natHist_deathAge=entity.natHist_deathAge)
+
+def test_cost_matches_loop(inputs, entities, seed):
+    from Glb_AnalyzeOutput import Analyze_Output
+    CostDict = inputs['CostDict']
+    output = Analyze_Output(inputs['estimates'], CostDict)
+
+    seed(6)
+    expected = numpy.array([LoopCost(Copy(entity), CostDict) for entity in entities])
+    seed(6)
+    cost = numpy.array([output.EntityCost(Copy(entity)) for entity in entities])
+    numpy.testing.assert_allclose(cost, expected, rtol=1e-12, atol=0)
+    seed(6)
+    numpy.testing.assert_allclose(output.CohortCost(entities), expected, rtol=1e-12, atol=0)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+The cohort engine ('Glb_CohortEngine.py') against the per-entity loop ('Glb_SimEntity.py').
+
+The two draw their random numbers in a different order, so the entities are not the same, but a
+small seeded population run through each should give the same results within sampling error.
+
+"""
+
+import numpy
+import pytest
+
+N = 4000
+
+SCENARIOS = [{'Prevention': 0, 'Screen': 0, 'Surg': 1, 'Chemo': 0, 'HPV': 0},
+             {'Prevention': 1, 'Screen': 1, 'Surg': 0, 'Chemo': 1, 'HPV': 0}]
+
+@pytest.mark.parametrize('Alt_Scenario', [0, 1])
+@pytest.mark.parametrize('scenario', SCENARIOS)
+def test_cohort_matches_entities(inputs, seed, scenario, Alt_Scenario):
+    from Glb_AnalyzeOutput import Analyze_Output
+    from Glb_CohortEngine import CohortEngine
+    from Glb_SimEntity import SimEntity, MaxLYG
+    estimates, regcoeffs = inputs['estimates'], inputs['regcoeffs']
+    alt_estimates, CostDict = inputs['alt_estimates'], inputs['CostDict']
+
+    seed(1)
+    engine = CohortEngine(estimates, regcoeffs, alt_estimates, scenario)
+    cohort = engine.Run(N, Alt_Scenario)
+    assert len(cohort.errors) == 0
+    cohortrows = engine.Output(cohort, CostDict)
+
+    seed(2)
+    sim = SimEntity(estimates, regcoeffs, alt_estimates, scenario)
+    output = Analyze_Output(estimates, CostDict)
+    maxLYG = MaxLYG(estimates)
+    entityrows = numpy.array([sim.RunRow(i, Alt_Scenario, output, maxLYG) for i in range(N)])
+
+    # LYG, QALY, Cost and the proportion with OPL agree within four standard errors
+    assert cohortrows.shape == entityrows.shape
+    for col in range(4):
+        se = numpy.sqrt((cohortrows[:, col].var() + entityrows[:, col].var())/N)
+        diff = cohortrows[:, col].mean() - entityrows[:, col].mean()
+        assert abs(diff) <= 4*se, (col, diff, se)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+The vectorized competing-risks sampler ('Glb_CompTime.py') against 'CompTime.Process'.
+
+From the same random numbers (one probability for each entity, then one Weibull time for each
+entity), 'CompTime.Batch' must give the same event types as running 'Process' one entity at a
+time, and the same event times up to rounding.
+
+"""
+
+import numpy
+
+from test_GenTime import Population
+
+N = 2000
+
+def test_batch_matches_process(inputs, seed):
+    from Glb_CompTime import CompTime
+    from Glb_GenTime import Covariates
+    comptime = CompTime(inputs['estimates'], inputs['regcoeffs'])
+    population = Population(inputs['regcoeffs'], N)
+    covariates = Covariates(population, ['age', 'sex', 'cancerStage', 'tx_prim', 'tx_recur'])
+    int_adj = numpy.where(numpy.arange(N) % 2 == 0, 0.3, 0)
+
+    for tte1, tte2 in (('FirstEvent', 'FirstEvent_death'), ('SecondEvent', 'SecondEvent_death')):
+        seed(7)
+        times, kinds = comptime.Batch(covariates, tte1, tte2, int_adj)
+
+        seed(7)
+        probEst = numpy.random.random_sample(N)
+        expected = []
+        for entity, prob, adj in zip(population, probEst.tolist(), int_adj.tolist()):
+            comptime.probEst = prob
+            expected.append(comptime.Process(entity, tte1, tte2, adj))
+        expected = numpy.array(expected)
+
+        numpy.testing.assert_array_equal(kinds, expected[:, 1], err_msg=tte1)
+        numpy.testing.assert_allclose(times, expected[:, 0], rtol=1e-14, atol=0, err_msg=tte1)
+
+def test_undefined_event():
+    from Glb_CompTime import CompetingEvents
+    # The relative probability of an event at an infinite time can't be worked out
+    times, kinds = CompetingEvents(numpy.ones(2), numpy.array([numpy.inf, 100.0]), numpy.ones(2),
+                                   numpy.array([100.0, 100.0]), numpy.array([0.5, 0.5]))
+    assert kinds[0] == 0
+    assert kinds[1] in (1, 2)
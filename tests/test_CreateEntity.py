@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Saving and loading entities ('Glb_CreateEntity.py').
+
+An entity must come back from a pickle (or a copy) with every characteristic and log entry it
+had, and the files of entities saved before the entity had a fixed list of characteristics
+(a plain object with a dictionary of characteristics and lists for its logs) must still load.
+
+"""
+
+import copy
+import pickle
+
+import pytest
+
+# The entity as it was before it had a fixed list of characteristics
+LEGACY = '''
+class Entity(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+        self.currentState = "Newly created entity"
+        self.stateNum = 0.0
+        self.allTime = 0
+        self.time_Sysp = 0
+        self.nh_status = 0.0
+        self.nh_time = 0
+        self.nh_det = 0
+        self.natHist = []
+        self.resources = []
+        self.events = []
+        self.utility = []
+'''
+
+def Simulated(inputs, seed, count):
+    from Glb_SimEntity import SimEntity
+    scenario = {'Prevention': 1, 'Screen': 1, 'Surg': 0, 'Chemo': 1, 'HPV': 0}
+    sim = SimEntity(inputs['estimates'], inputs['regcoeffs'], inputs['alt_estimates'], scenario)
+    seed(5)
+    return [sim.Run(i, 1) for i in range(count)]
+
+def Same(a, b):
+    from Glb_CreateEntity import FIELDS
+    for field in FIELDS:
+        x, y = getattr(a, field), getattr(b, field)
+        if field in ('resources', 'events', 'utility'):
+            assert type(x) is type(y) and list(x) == list(y), field
+        else:
+            assert x == y, field
+
+def test_round_trip(inputs, seed):
+    entities = Simulated(inputs, seed, 50)
+    assert any(len(x.resources) > 5 for x in entities)
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        loaded = pickle.loads(pickle.dumps(entities, protocol))
+        for a, b in zip(entities, loaded):
+            Same(a, b)
+    for a in entities:
+        b = copy.deepcopy(a)
+        Same(a, b)
+        # The copy has its own logs
+        b.resources.append(("Biopsy", 1.0))
+        assert len(b.resources) == len(a.resources) + 1
+
+def test_legacy_dict_state(monkeypatch):
+    import Glb_CreateEntity
+    from Glb_CreateEntity import Entity, FIELDS
+    from Glb_EntityLog import ResourceLog, UtilityLog
+
+    namespace = {'__name__': 'Glb_CreateEntity'}
+    exec(LEGACY, namespace)
+    old = namespace['Entity'](sex='F', startAge=52.5)
+    old.stateNum = 1.8
+    old.currentState = 'No dentist'
+    old.OPLHPV = 'HPV'
+    old.resources.append(("Diagnostic Workup", 412.0))
+    old.events.append(("Cancer first detected", 411.5))
+    old.utility.append(("Detected OPL", 0.81, 300.0))
+
+    saved = {}
+    monkeypatch.setattr(Glb_CreateEntity, 'Entity', namespace['Entity'])
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        saved[protocol] = pickle.dumps(old, protocol)
+    monkeypatch.undo()
+
+    for protocol, data in saved.items():
+        entity = pickle.loads(data)
+        assert type(entity) is Entity
+        assert entity.currentState == 'No dentist'
+        assert entity.stateNum == 1.8
+        assert entity.sex == 'F' and entity.startAge == 52.5 and entity.OPLHPV == 'HPV'
+        # Characteristics the old entity never had are "not yet created"
+        assert all(getattr(entity, field) is None for field in FIELDS if field not in vars(old))
+        assert isinstance(entity.resources, ResourceLog)
+        assert isinstance(entity.utility, UtilityLog)
+        assert list(entity.resources) == [("Diagnostic Workup", 412.0)]
+        assert list(entity.events) == [("Cancer first detected", 411.5)]
+        assert list(entity.utility) == [("Detected OPL", 0.81, 300.0)]
+        # ... and it can be saved again in the new format
+        Same(entity, pickle.loads(pickle.dumps(entity)))
+
+def test_mismatched_state():
+    from Glb_CreateEntity import Entity, FIELDS
+    entity = Entity.__new__(Entity)
+    with pytest.raises(ValueError):
+        entity.__setstate__(tuple(range(len(FIELDS) - 1)))
+    with pytest.raises(ValueError):
+        entity.__setstate__({'stateNum': 1.0, 'notAField': 3})
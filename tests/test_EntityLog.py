@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+The coded logs of resources, events and utility values ('Glb_EntityLog.py').
+
+A log must behave like the list of tuples it replaces, its columns must match the entries, and
+a saved log must come back with the same entries even in a Python process that has given the
+names different codes.
+
+"""
+
+import copy
+import pickle
+
+import numpy
+import pytest
+
+ENTRIES = [("Biopsy", 10.0), ("Diagnostic Workup", 12.5), ("Biopsy", 400.25), ("Surgery", 401.0)]
+UTILITIES = [("Detected OPL", 0.81, 300.0), ("Cancer", 0.62, 412.5)]
+
+def Filled(log, entries):
+    for entry in entries:
+        log.append(entry)
+    return log
+
+def test_like_a_list():
+    from Glb_EntityLog import ResourceLog, UtilityLog, Resources
+    log = Filled(ResourceLog(), ENTRIES)
+    assert len(log) == len(ENTRIES)
+    assert list(log) == ENTRIES
+    assert log[0] == ENTRIES[0] and log[-1] == ENTRIES[-1]
+    with pytest.raises(IndexError):
+        log[len(ENTRIES)]
+    del log[1]
+    assert list(log) == ENTRIES[:1] + ENTRIES[2:]
+
+    assert [Resources.Name(x) for x in log.Codes()] == [x[0] for x in ENTRIES if x is not ENTRIES[1]]
+    numpy.testing.assert_array_equal(log.Times(), [10.0, 400.25, 401.0])
+
+    utility = Filled(UtilityLog(), UTILITIES)
+    assert list(utility) == UTILITIES
+    numpy.testing.assert_array_equal(utility.Values(), [0.81, 0.62])
+    numpy.testing.assert_array_equal(utility.Times(), [300.0, 412.5])
+
+def test_copies_are_separate():
+    from Glb_EntityLog import ResourceLog
+    log = Filled(ResourceLog(), ENTRIES)
+    for other in (log.copy(), copy.copy(log), copy.deepcopy(log)):
+        assert type(other) is ResourceLog and list(other) == ENTRIES
+        other.append(("Biopsy", 500.0))
+        assert len(log) == len(ENTRIES)
+
+@pytest.mark.parametrize('protocol', range(pickle.HIGHEST_PROTOCOL + 1))
+def test_round_trip(protocol):
+    from Glb_EntityLog import ResourceLog, EventLog, UtilityLog
+    logs = [Filled(ResourceLog(), ENTRIES), Filled(EventLog(), ENTRIES[:2]), Filled(UtilityLog(), UTILITIES),
+            ResourceLog(), UtilityLog()]
+    loaded = pickle.loads(pickle.dumps(logs, protocol))
+    for a, b in zip(logs, loaded):
+        assert type(a) is type(b)
+        assert list(a) == list(b)
+    # An empty log that was loaded can be added to
+    loaded[3].append(("Biopsy", 1.0))
+    assert len(loaded[3]) == 1
+
+def test_saved_by_name(monkeypatch):
+    import Glb_EntityLog
+    from Glb_EntityLog import ResourceLog, Registry
+    data = pickle.dumps(Filled(ResourceLog(), ENTRIES))
+    # Another Python process may have met the names in a different order
+    other = Registry(["Surgery", "Nothing", "Diagnostic Workup", "Biopsy"])
+    monkeypatch.setattr(Glb_EntityLog.ResourceLog, 'registry', other)
+    log = pickle.loads(data)
+    assert list(log) == ENTRIES
+    assert list(log.Codes()) == [3, 2, 3, 0]
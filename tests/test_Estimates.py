@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+The array-backed parameter vector ('Glb_Estimates.py') against plain 'Estimate' objects.
+
+The parameters of a 'ParameterVector' must sample exactly the same values as the plain estimates
+from the same random numbers. 'Sample' draws a whole set of parameters at once, in a different
+order, so its draws are compared with the plain estimates' draws by their distribution.
+
+The Dirichlet categories (treatment types, OPL risk groups) must be the same as the original
+'elif' ladders give from the same probabilities and uniform random numbers.
+
+"""
+
+import pickle
+
+import numpy
+import pytest
+
+def PlainEstimates(vector):
+    """A plain 'Estimates' object holding copies of the parameters of 'vector'"""
+    from Glb_Estimates import Estimates, Estimate
+    estimates = Estimates()
+    for name in vector.Names():
+        param = getattr(vector, name)
+        setattr(estimates, name, Estimate(param.type, param.mean, param.se))
+    return estimates
+
+def Varies(param):
+    # Weibull (3) and Dirichlet (5) parameters have no single value, and static values and
+    #   parameters without a standard error don't vary
+    return param.type not in (3, 5, 9) and bool(param.se)
+
+def test_parameters_sample_like_estimates(inputs, seed):
+    vector = inputs['estimates']
+    plain = PlainEstimates(vector)
+    names = [name for name in vector.Names() if getattr(vector, name).type not in (3, 5)]
+
+    seed(8)
+    expected = [[getattr(plain, name).sample() for name in names] for i in range(3)]
+    expected.append([getattr(plain, name).sample(4).tolist() for name in names])
+    seed(8)
+    values = [[getattr(vector, name).sample() for name in names] for i in range(3)]
+    values.append([getattr(vector, name).sample(4).tolist() for name in names])
+    assert values == expected
+
+def test_sample_distribution(inputs, seed):
+    vector = inputs['estimates']
+    k = 5000
+    seed(9)
+    values = vector.Sample(k)
+    assert values.shape == (k, len(vector.Names()))
+    for i, name in enumerate(vector.Names()):
+        param = getattr(vector, name)
+        if param.type in (3, 5):
+            assert numpy.isnan(values[:, i]).all(), name
+        elif not Varies(param):
+            assert (values[:, i] == param.mean).all(), name
+        else:
+            # Two-sample Kolmogorov-Smirnov statistic against the estimate's own draws
+            x = numpy.sort(values[:, i])
+            y = numpy.sort(numpy.array([param.sample() for j in range(k)], dtype=float))
+            grid = numpy.concatenate((x, y))
+            ks = numpy.abs(numpy.searchsorted(x, grid, 'right') - numpy.searchsorted(y, grid, 'right')).max()/k
+            assert ks < 1.95*numpy.sqrt(2/k), (name, ks)
+
+def test_no_standard_error(inputs, seed):
+    # Parameters whose standard error is blank (None, e.g., the fixed costs in the alternative
+    #   parameters) are used at their mean, as they are by 'Estimate.fixed'
+    vector = inputs['alt_estimates']
+    names = [name for name in vector.Names() if getattr(vector, name).se is None]
+    assert names
+    seed(12)
+    values = vector.Sample(10)
+    drawn = vector.Draw()
+    for name in names:
+        param = getattr(vector, name)
+        assert (values[:, vector.Index(name)] == param.mean).all(), name
+        assert getattr(drawn, name).mean == param.mean, name
+        assert param.fixed() is param, name
+
+def test_arrays_follow_changes(inputs):
+    from Glb_Estimates import ParameterVector, Estimate
+    vector = ParameterVector(PlainEstimates(inputs['estimates']))
+    i = vector.Index('Util_Well')
+    vector.Util_Well.mean = 0.5
+    assert vector.Arrays()[1][i] == 0.5
+    vector.__dict__['Util_Well'].se = 0.01
+    assert vector.Arrays()[2][i] == 0.01
+
+    vector.NewParameter = Estimate(9, 2.0, 0)
+    assert vector.Names()[-1] == 'NewParameter'
+    assert vector.Sample()[vector.Index('NewParameter')] == 2.0
+    del vector.NewParameter
+    assert 'NewParameter' not in vector.Names()
+
+    # Values that aren't parameters are kept, but aren't in the arrays
+    vector.OPLRisk_Low = 0.3
+    assert vector.OPLRisk_Low == 0.3
+    assert 'OPLRisk_Low' not in vector.Names()
+
+    copy = pickle.loads(pickle.dumps(vector))
+    assert type(copy) is ParameterVector
+    assert copy.Names() == vector.Names()
+    # Missing values are 'nan' in the arrays, which are counted as equal here
+    numpy.testing.assert_array_equal(copy.Arrays(), vector.Arrays())
+
+def test_draw_fixes_parameters(inputs, seed):
+    from Glb_Estimates import DIRICHLET_BLOCKS
+    vector = inputs['estimates']
+    blocks = [name for names in DIRICHLET_BLOCKS.values() for name in names]
+    seed(10)
+    drawn = vector.Draw()
+    for name in vector.Names():
+        param, fixed = getattr(vector, name), getattr(drawn, name)
+        if name in blocks:
+            assert fixed.type == 9, name
+        elif param.type in (3, 5, 9, 10) or not param.se:
+            assert (fixed.type, fixed.mean, fixed.se) == (param.type, param.mean, param.se), name
+        elif param.type == 7:
+            assert fixed.type == 10 and 0 <= fixed.mean < 1, name
+        else:
+            assert fixed.type == 9 and numpy.isfinite(fixed.mean), name
+
+def TreatmentLadder(weights, u):
+    # The original assignment of a category (e.g., the OPL risk group in 'NatHist_DevOPL.py'), from
+    #   the category probabilities 'weights' and the entity's uniform random number 'u'. The last
+    #   category is everything above the bound of the one before it.
+    bounds = [weights[0]]
+    for weight in weights[1:]:
+        bounds.append(weight + bounds[-1])
+    if u <= bounds[0]:
+        return 0
+    for category in range(1, len(bounds) - 1):
+        if bounds[category - 1] < u <= bounds[category]:
+            return category
+    return len(bounds) - 1
+
+@pytest.mark.parametrize('block', ['Tx_stageI', 'Tx_stageII', 'Tx_recurrence'])
+def test_category_matches_ladder(inputs, block):
+    from Glb_Estimates import DIRICHLET_BLOCKS, DirichletCategory, DirichletCategories
+    estimates = inputs['estimates']
+    rng = numpy.random.default_rng(11)
+    n = len(DIRICHLET_BLOCKS[block])
+    weights = rng.dirichlet(numpy.arange(1, n + 1), 20000)
+    u = rng.random(20000)
+    # Random numbers beyond the sum of the probabilities are in the last category
+    weights[:100] *= 0.5
+    assert (u[:100] > weights[:100].sum(axis=1)).any()
+
+    expected = [TreatmentLadder(w, x) for w, x in zip(weights.tolist(), u.tolist())]
+    assert min(expected) == 0 and max(expected) == n - 1
+    assert [DirichletCategory(estimates, block, x, w)
+            for w, x in zip(weights.tolist(), u.tolist())] == expected
+    assert DirichletCategories(estimates, block, u, weights).tolist() == expected
+
+def test_category_beyond_rounded_sum(inputs):
+    from Glb_Estimates import DirichletCategory, DirichletCategories
+    estimates = inputs['estimates']
+    # These probabilities add up to just under 1 in floating point
+    weights = [0.2, 0.7, 0.1]
+    assert sum(weights) < 1
+    u = 1 - 2**-53
+    assert DirichletCategory(estimates, 'OPLRisk', u, weights) == 2
+    assert DirichletCategories(estimates, 'OPLRisk', [u, 0.05], weights).tolist() == [2, 0]
+
+@pytest.mark.parametrize('block', ['OPLRisk', 'Tx_adv', 'Tx_recurrence'])
+def test_category_frequencies(inputs, seed, block):
+    from Glb_Estimates import DIRICHLET_BLOCKS, DirichletCategory, DirichletCategories
+    estimates = inputs['estimates']
+    counts = numpy.array([getattr(estimates, name).mean for name in DIRICHLET_BLOCKS[block]], dtype=float)
+    n = 50000
+    seed(12)
+    u = numpy.random.random_sample(n)
+    single = numpy.array([DirichletCategory(estimates, block, x) for x in u.tolist()])
+    batch = DirichletCategories(estimates, block, u)
+    # Each category is drawn in proportion to its count
+    for categories in (single, batch):
+        assert (categories >= 0).all()
+        freq = numpy.bincount(categories, minlength=len(counts))/n
+        numpy.testing.assert_allclose(freq, counts/counts.sum(), atol=0.01)
+
+def test_fixed_blocks(inputs, seed):
+    from Glb_Estimates import DIRICHLET_BLOCKS, DirichletWeights, DirichletCategories, FixDirichlet
+    estimates = PlainEstimates(inputs['estimates'])
+    seed(13)
+    FixDirichlet(estimates)
+    for block, names in DIRICHLET_BLOCKS.items():
+        weights = [getattr(estimates, name).mean for name in names]
+        assert all(getattr(estimates, name).type == 9 for name in names)
+        assert abs(sum(weights) - 1) < 1e-12
+        assert DirichletWeights(estimates, block) == weights
+        u = numpy.linspace(0, 0.999, 50)
+        expected = [TreatmentLadder(weights, x) for x in u.tolist()]
+        assert DirichletCategories(estimates, block, u).tolist() == expected
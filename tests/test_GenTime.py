@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+The compiled regression models ('Glb_GenTime.py') against the original look-ups.
+
+'DictReadVal' is the original 'GenTime.readVal', which searches the nested dictionaries of the
+regression table for every entity. 'readVal' must give exactly the same mu, shape and scale, and
+'Batch' the same mu and shape, for a population of entities with every level of every factor in
+the table.
+
+"""
+
+import math
+import types
+
+import numpy
+import pytest
+
+N = 2000
+
+def DictReadVal(regcoeffs, entity, param, int_adj=0):
+    # Returns (mu, shape, scale), as the original 'readVal' set them
+    coeff = 0
+    for factor in regcoeffs[param].keys():
+        if factor == 'Intercept':
+            Intercept = regcoeffs[param]['Intercept']['mean']
+        elif factor == 'Sigma':
+            Sigma = regcoeffs[param]['Sigma']['mean']
+        elif factor in entity.__dict__.keys():
+            value = getattr(entity, factor)
+            if regcoeffs[param][factor]['vartype'] == 2:
+                coeff += regcoeffs[param][factor]['mean'] * value
+            else:
+                coeff += regcoeffs[param][factor][value]['mean']
+    if int_adj:
+        Intercept -= int_adj
+    mu = Intercept + coeff
+    return mu, 1/Sigma, math.exp(mu)
+
+def Population(regcoeffs, n):
+    """Entities with random levels of every factor in the regression table"""
+    rng = numpy.random.default_rng(0)
+    factors = {}
+    for coeffs in regcoeffs.values():
+        for factor, value in coeffs.items():
+            if factor not in ('Intercept', 'Sigma'):
+                factors[factor] = value
+    entities = []
+    for i in range(n):
+        entity = types.SimpleNamespace()
+        for factor, value in factors.items():
+            if value['vartype'] == 2:
+                setattr(entity, factor, float(rng.uniform(30, 90)))
+            else:
+                levels = [level for level in value if isinstance(value[level], dict)]
+                setattr(entity, factor, levels[rng.integers(len(levels))])
+        entities.append(entity)
+    return entities
+
+@pytest.fixture(scope='module')
+def population(inputs):
+    return Population(inputs['regcoeffs'], N)
+
+def test_readval_matches_dictionaries(inputs, population):
+    from Glb_GenTime import GenTime
+    regcoeffs = inputs['regcoeffs']
+    gentime = GenTime(inputs['estimates'], regcoeffs)
+    for param in regcoeffs:
+        for i, entity in enumerate(population):
+            int_adj = 0.25 if i % 3 == 0 else 0
+            gentime.readVal(entity, param, int_adj)
+            assert (gentime.mu, gentime.shape, gentime.scale) == \
+                   DictReadVal(regcoeffs, entity, param, int_adj), (param, i)
+
+def test_batch_matches_readval(inputs, population):
+    from Glb_GenTime import GenTime, Covariates, Compile
+    regcoeffs = inputs['regcoeffs']
+    gentime = GenTime(inputs['estimates'], regcoeffs)
+    int_adj = numpy.where(numpy.arange(N) % 3 == 0, 0.25, 0)
+    for param in regcoeffs:
+        factors = [factor for factor, vartype, coeff in Compile(regcoeffs)[param].factors]
+        mu, shape, scale = gentime.Batch(param, Covariates(population, factors), int_adj)
+        expected = numpy.array([DictReadVal(regcoeffs, entity, param, adj)
+                                for entity, adj in zip(population, int_adj.tolist())])
+        numpy.testing.assert_array_equal(numpy.c_[mu, shape], expected[:, :2], err_msg=param)
+        # numpy's exp can differ from math.exp in the last bit
+        numpy.testing.assert_allclose(scale, expected[:, 2], rtol=1e-15, atol=0, err_msg=param)
+
+def test_missing_factor(inputs):
+    from Glb_GenTime import GenTime
+    gentime = GenTime(inputs['estimates'], inputs['regcoeffs'])
+    entity = types.SimpleNamespace(age=60.0, stateNum=1.0, currentState=None)
+    gentime.readVal(entity, 'FirstEvent')
+    assert entity.stateNum == 99
+    entity = types.SimpleNamespace(age=60.0, stateNum=1.0, currentState=None)
+    gentime.readVal(entity, 'NotAParameter')
+    assert entity.stateNum == 99
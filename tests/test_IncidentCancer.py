@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+The survival adjustment for cancers unrelated to HPV ('Alt_SysP_IncidentCancer.py').
+
+The process object is made once and used for every entity, so the adjustment it gives to the
+intercepts of the survival regressions must not build up from one cancer to the next: the same
+cancer with the same random numbers must get the same survival times however many cancers the
+object has treated before, and the regression table it was given must not change.
+
+The stage treatment programs take the adjustment as an argument instead of a copy of the
+regression table with the intercepts changed; the two must give the same survival times.
+
+"""
+
+import copy
+
+import pytest
+
+def NewCancer(inputs, stage, hpv):
+    """An entity with an incident cancer of 'stage', ready for 'IncidentCancerScen.Process'"""
+    from Glb_CreateEntity import Entity
+    from Glb_ApplyInit import ApplyInit
+    entity = Entity()
+    ApplyInit(inputs['estimates']).Process(entity)
+    entity.Scenario_Surg = 0
+    entity.Scenario_Chemo = 0
+    entity.cancerStage = stage
+    entity.OPLHPV = hpv
+    entity.sympt = 1
+    entity.allTime = 1000.0
+    entity.natHist_deathAge = 3650.0
+    return entity
+
+def Summary(entity):
+    return (list(entity.resources), list(entity.events), list(entity.utility), entity.stateNum,
+            entity.tx_prim, entity.time_Recurrence, entity.time_DeadofDisease)
+
+@pytest.mark.parametrize('stage', ['I', 'II', 'Adv'])
+def test_adjustment_does_not_accumulate(inputs, seed, stage):
+    from Alt_SysP_IncidentCancer import IncidentCancerScen
+    regcoeffs = copy.deepcopy(inputs['regcoeffs'])
+    incident = IncidentCancerScen(inputs['estimates'], regcoeffs, inputs['alt_estimates'])
+    seed(25)
+    cancer = NewCancer(inputs, stage, 'Neg')
+    # Keep the adjustment away from zero, so that a build-up would show
+    incident.int_adj = 0.5
+
+    seed(26)
+    first = copy.deepcopy(cancer)
+    incident.Process(first)
+    for i in range(50):
+        incident.Process(copy.deepcopy(cancer))
+    seed(26)
+    again = copy.deepcopy(cancer)
+    incident.Process(again)
+
+    assert Summary(again) == Summary(first)
+    assert regcoeffs == inputs['regcoeffs']
+
+@pytest.mark.parametrize('stage', ['I', 'II', 'Adv'])
+@pytest.mark.parametrize('scenario', [0, 1])
+def test_adjustment_matches_adjusted_table(inputs, seed, stage, scenario):
+    from Glb_CancerFlags import CancerFlags
+    from SysP_StageOneTx import StageOneTx
+    from SysP_StageTwoTx import StageTwoTx
+    from SysP_StageAdvTx import StageAdvTx
+    Tx = {'I': StageOneTx, 'II': StageTwoTx, 'Adv': StageAdvTx}[stage]
+    estimates, regcoeffs = inputs['estimates'], inputs['regcoeffs']
+    int_adj = 0.4
+    # The regression table as the scenario programs used to change it
+    table = copy.deepcopy(regcoeffs)
+    table['FirstEvent']['Intercept']['mean'] -= int_adj
+    table['FirstEvent_death']['Intercept']['mean'] -= int_adj
+
+    seed(27)
+    cancer = NewCancer(inputs, stage, 'Neg')
+    CancerFlags(cancer, estimates).Process(cancer)
+    # The surgery and chemotherapy scenarios add to the adjustment
+    cancer.Scenario_Surg = cancer.Scenario_Chemo = scenario
+    cancer.RR_Surgery = cancer.RR_Chemo = 0.2
+    cancer.scenario_desc = []
+    results = []
+    for tx in (Tx(estimates, regcoeffs, int_adj), Tx(estimates, table)):
+        seed(28)
+        entity = copy.deepcopy(cancer)
+        tx.Process(entity)
+        results.append(Summary(entity))
+    assert results[0] == results[1]
+    assert regcoeffs == inputs['regcoeffs']
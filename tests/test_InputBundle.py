@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+The compiled bundle of model inputs ('Glb_InputBundle.py').
+
+A bundle must be re-used while the workbooks and life tables it was made from are unchanged, and
+compiled again as soon as any of them changes. The tests work on copies of the input files in a
+temporary folder, so the bundle in the repository is left alone.
+
+"""
+
+import os
+import shutil
+
+import pytest
+
+SOURCES = ('InputParameters.xlsx', 'Alt_Parameters.xlsx', 'deathm.pickle', 'deathf.pickle')
+
+@pytest.fixture
+def folder(inputs, tmp_path, monkeypatch):
+    """A temporary working folder holding copies of the input files"""
+    for filename in SOURCES:
+        shutil.copy(filename, str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def compiled(monkeypatch):
+    """Counts the times the bundle is compiled from the workbooks"""
+    import Glb_InputBundle
+    calls = []
+    CompileInputs = Glb_InputBundle.CompileInputs
+    def Counted(*args):
+        calls.append(args)
+        return CompileInputs(*args)
+    monkeypatch.setattr(Glb_InputBundle, 'CompileInputs', Counted)
+    return calls
+
+def test_source_hash(folder):
+    from Glb_InputBundle import SourceHash
+    key = SourceHash(SOURCES)
+    assert SourceHash(SOURCES) == key
+    # The order of the files counts, and so does every byte of them
+    assert SourceHash(SOURCES[::-1]) != key
+    with open('deathf.pickle', 'ab') as f:
+        f.write(b' ')
+    assert SourceHash(SOURCES) != key
+
+def Save(bundle):
+    import pickle
+    with open('InputBundle.pickle', 'wb') as f:
+        pickle.dump(bundle, f, pickle.HIGHEST_PROTOCOL)
+
+def test_bundle_reused_until_a_source_changes(folder, compiled, inputs):
+    from Glb_InputBundle import LoadInputs
+    # The copies have the same contents and names as the files the session's bundle was made from
+    Save(inputs)
+    first = LoadInputs()
+    assert len(compiled) == 0
+    assert first['key'] == inputs['key']
+
+    # Touching a file without changing it does not make the bundle out of date
+    os.utime('Alt_Parameters.xlsx', None)
+    LoadInputs()
+    assert len(compiled) == 0
+
+    with open('deathm.pickle', 'ab') as f:
+        f.write(b' ')
+    second = LoadInputs()
+    assert len(compiled) == 1
+    assert second['key'] != first['key']
+    assert sorted(vars(second['estimates'])) == sorted(vars(inputs['estimates']))
+    assert second['regcoeffs'] == inputs['regcoeffs']
+    assert second['CostDict'] == inputs['CostDict']
+
+    # The new bundle is re-used by the next run
+    assert LoadInputs()['key'] == second['key']
+    assert len(compiled) == 1
+
+def test_old_version_is_recompiled(folder, compiled, inputs):
+    from Glb_InputBundle import LoadInputs, BUNDLE_VERSION
+    bundle = dict(inputs)
+    bundle['version'] = BUNDLE_VERSION - 1
+    Save(bundle)
+    assert LoadInputs()['version'] == BUNDLE_VERSION
+    assert len(compiled) == 1
+
+def test_bad_estimates_are_listed(inputs):
+    from Glb_Estimates import ParameterVector, Estimate
+    from Glb_InputBundle import CheckEstimates
+    estimates = ParameterVector()
+    estimates.Good = Estimate(1, 0.3, 0.05)
+    estimates.WideBeta = Estimate(1, 0.3, 0.5)
+    estimates.NoType = Estimate(11, 0.3, 0.05)
+    estimates.Cost = Estimate(2, 'text', None)
+    problems = CheckEstimates(estimates, 'test.xlsx', skip=['Cost'])
+    assert len(problems) == 2
+    assert any('WideBeta' in x and 'too large' in x for x in problems)
+    assert any('NoType' in x and 'unknown variable type' in x for x in problems)
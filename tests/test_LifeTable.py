@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Natural death ages from the life tables ('Glb_LifeTable.py').
+
+The single-entity look-up ('DeathAge') must give the same ages as the cohort look-up
+('DeathAges'), and the ages must follow the life table of the people who live to the entity's
+current age: the same distribution as drawing ages at death from the raw table (with a random
+fraction of a year added) and keeping the ones above the entity's age.
+
+"""
+
+import numpy
+import pytest
+
+@pytest.mark.parametrize('sex', ['M', 'F'])
+def test_single_matches_batch(inputs, sex):
+    lifetable = inputs['lifetable']
+    rng = numpy.random.default_rng(14)
+    age = numpy.concatenate((rng.normal(58, 15, 20000), [0, 10.5, 119.9, 130.0]))
+    u = numpy.concatenate((rng.random(20000), [0, 0.999999999999, 0.5, 0.5]))
+
+    single = numpy.array([lifetable.DeathAge(sex, x, y) for x, y in zip(age.tolist(), u.tolist())])
+    batch = lifetable.DeathAges(sex, age, u)
+    numpy.testing.assert_allclose(single, batch, rtol=1e-12, atol=1e-9)
+    # No entity dies before its current age, and an entity older than the table dies now
+    assert (single >= age).all()
+    assert single[-1] == 130.0
+
+@pytest.mark.parametrize('sex', ['M', 'F'])
+@pytest.mark.parametrize('age', [30.3, 58.7, 85.2])
+def test_conditional_distribution(inputs, sex, age):
+    lifetable = inputs['lifetable']
+    rng = numpy.random.default_rng(15)
+    table = numpy.asarray(inputs['deathage_M' if sex == 'M' else 'deathage_F'], dtype=float)
+    raw = numpy.floor(table) + rng.random(len(table))
+    raw = raw[raw > age]
+
+    drawn = lifetable.DeathAges(sex, numpy.full(100000, age), rng.random(100000))
+    assert abs(drawn.mean() - raw.mean()) < 4*raw.std()/numpy.sqrt(len(raw))
+    numpy.testing.assert_allclose(numpy.percentile(drawn, [10, 50, 90]),
+                                  numpy.percentile(raw, [10, 50, 90]), atol=0.25)
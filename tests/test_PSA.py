@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Two-level probabilistic sensitivity analysis ('Glb_PSA.py').
+
+Each outer iteration must fix every parameter at one draw, and an analysis must depend only on
+its seed: the same seed gives the same output with any number of processes, and each iteration
+can be repeated on its own from its seed.
+
+"""
+
+import numpy
+import pytest
+
+SCENARIO = {'Prevention': 0, 'Screen': 1, 'Surg': 1, 'Chemo': 0, 'HPV': 0}
+
+def test_draws_are_fixed(inputs, seed):
+    from Glb_PSA import DrawEstimates, DrawCostDict
+    from Glb_Estimates import DIRICHLET_BLOCKS
+    from Glb_InputBundle import ALT_COSTS
+    seed(30)
+    for estimates in (inputs['estimates'], inputs['alt_estimates']):
+        drawn = DrawEstimates(estimates)
+        for name in estimates.Names():
+            param = getattr(drawn, name)
+            if name in ALT_COSTS.values():
+                # Costs are drawn with 'CostDict' (see 'DrawCostDict')
+                assert numpy.isfinite(param.mean), name
+            elif param.type not in (3, 7, 10):
+                # Weibull shapes and times to event still vary between entities
+                assert param.sample() == param.sample(), name
+    for names in DIRICHLET_BLOCKS.values():
+        drawn = DrawEstimates(inputs['estimates'])
+        weights = [getattr(drawn, name).mean for name in names]
+        assert all(getattr(drawn, name).type == 9 for name in names)
+        assert sum(weights) == pytest.approx(1)
+
+    CostDict = inputs['CostDict']
+    costs = DrawCostDict(CostDict)
+    assert set(costs) == set(CostDict)
+    for unit, (ctype, mean, se) in costs.items():
+        if CostDict[unit][0] == 2:
+            assert ctype == 1 and mean > 0, unit
+        else:
+            assert (ctype, mean, se) == CostDict[unit], unit
+
+@pytest.fixture(scope='module')
+def psa(inputs):
+    from Glb_PSA import PSARunner
+    return PSARunner(inputs['estimates'], inputs['regcoeffs'], inputs['alt_estimates'],
+                     inputs['CostDict'], SCENARIO, processes=2)
+
+def test_same_seed_any_processes(psa):
+    output = psa.Run(3, 200, seed=99)
+    assert output.shape == (3, 6)
+    # Each iteration has its own parameter draws
+    assert len(set(output[:, 2].tolist())) == 3
+    psa.processes = 1
+    try:
+        numpy.testing.assert_array_equal(psa.Run(3, 200, seed=99), output)
+    finally:
+        psa.processes = 2
+    # An iteration is repeated on its own from its seed
+    import Glb_PSA
+    Glb_PSA._InitWorker(psa._inputs)
+    try:
+        streams = numpy.random.SeedSequence(99).spawn(3)
+        assert Glb_PSA._RunIteration((streams[1], 200, (0, 1), False)) == output[1].tolist()
+    finally:
+        Glb_PSA._inputs.clear()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Saving a population one column per characteristic ('Glb_PopulationStore.py').
+
+The entities read back from a store must have every characteristic they were saved with,
+whatever the block sizes used to write and read them, including characteristics whose values
+change kind part way through the population (e.g., numbers and then text).
+
+"""
+
+import numpy
+import pytest
+
+from test_Snapshot import Population
+
+def Same(a, b):
+    from Glb_CreateEntity import FIELDS
+    for field in FIELDS:
+        x, y = getattr(a, field), getattr(b, field)
+        if field in ('resources', 'events', 'utility'):
+            assert type(x) is type(y) and list(x) == list(y), field
+        else:
+            # Whole numbers in a column that also holds decimals come back as decimals
+            assert x == y, (field, x, y)
+
+@pytest.mark.parametrize('chunksize', [1, 7, 1000])
+def test_round_trip(inputs, seed, tmp_path, chunksize):
+    from Glb_PopulationStore import SavePopulation, PopulationStore
+    entities = Population(inputs, seed, 60)
+    SavePopulation(entities, str(tmp_path), chunksize)
+    store = PopulationStore(str(tmp_path))
+    assert len(store) == 60
+    loaded = [entity for chunk in store.Chunks(13) for entity in chunk]
+    assert len(loaded) == 60
+    for a, b in zip(entities, loaded):
+        Same(a, b)
+    for a, b in zip(entities[20:30], store.Entities(20, 30)):
+        Same(a, b)
+    numpy.testing.assert_array_equal(store.Column('allTime'), [x.allTime for x in entities])
+
+def test_columns_change_kind(tmp_path):
+    from Glb_CreateEntity import Entity
+    from Glb_PopulationStore import SavePopulation, PopulationStore
+    entities = [Entity() for i in range(9)]
+    # Whole numbers, then decimals, then text and lists, in later blocks
+    values = [None, 1, 2, 2.5, None, 'Censored', 3, [1, 2], None]
+    for entity, value in zip(entities, values):
+        entity.death_type = value
+    # A log that only starts in the second block
+    entities[4].time_Sysp = 7.0
+    entities[0].resources = None
+    SavePopulation(entities, str(tmp_path), 2)
+    loaded = PopulationStore(str(tmp_path)).Entities()
+    assert [x.death_type for x in loaded] == values
+    assert loaded[4].time_Sysp == 7.0
+    assert loaded[0].resources is None
+    for a, b in zip(entities[1:], loaded[1:]):
+        Same(a, b)
+
+def test_logs_read_by_name(inputs, seed, tmp_path, monkeypatch):
+    import Glb_EntityLog
+    from Glb_EntityLog import Registry
+    from Glb_PopulationStore import SavePopulation, PopulationStore
+    entities = Population(inputs, seed, 20)
+    SavePopulation(entities, str(tmp_path))
+    expected = [list(x.resources) for x in entities]
+    # Another Python process may have met the names in a different order
+    names = list(Glb_EntityLog.Resources.names)
+    monkeypatch.setattr(Glb_EntityLog.ResourceLog, 'registry', Registry(['Nothing'] + names[::-1]))
+    assert [list(x.resources) for x in PopulationStore(str(tmp_path))] == expected
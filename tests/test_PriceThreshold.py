@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Finding the price at which an intervention reaches a threshold ('Glb_PriceThreshold.py').
+
+The secant search must converge for each price of an array on its own, and the price it finds
+must be the one at which re-costing the ledgers with that price ('Recost') gives the target net
+monetary benefit.
+
+"""
+
+import numpy
+import pytest
+
+N = 1500
+WTP = 50000
+RESOURCE = 'Experimental Cancer Screening'
+
+def test_secant_converges():
+    from Glb_PriceThreshold import _Secant
+    # Each root converges after a different number of steps, and one of them has no root
+    a, b = numpy.array([1.0, 1.0, 0.0]), numpy.array([8.0, 27.0, 1.0])
+    roots = _Secant(lambda x: a*x**3 - b, numpy.zeros(3), numpy.ones(3))
+    numpy.testing.assert_allclose(roots[:2], [2.0, 3.0], rtol=1e-9)
+    assert numpy.isnan(roots[2])
+    assert float(_Secant(lambda x: numpy.exp(x) - 5, numpy.float64(0), numpy.float64(1))) == pytest.approx(numpy.log(5))
+
+@pytest.fixture(scope='module')
+def ledgers(inputs, seed, tmp_path_factory):
+    """The ledgers of a run without (0) and with (1) the experimental screening"""
+    from test_ResourceLedger import FixedCosts, FixedEstimates, SCENARIO
+    from Glb_AnalyzeOutput import Analyze_Output
+    from Glb_ResourceLedger import LedgerWriter
+    from Glb_SimEntity import SimEntity, MaxLYG
+    estimates = FixedEstimates(inputs['estimates'])
+    costs = FixedCosts(inputs['CostDict'])
+    sim = SimEntity(estimates, inputs['regcoeffs'], inputs['alt_estimates'], SCENARIO)
+    output = Analyze_Output(estimates, costs)
+    maxLYG = MaxLYG(estimates)
+    dirnames = []
+    for alt in (0, 1):
+        dirname = str(tmp_path_factory.mktemp('ledger'))
+        seed(18)
+        with LedgerWriter(dirname, estimates) as ledger:
+            for i in range(N):
+                sim.RunRow(i, alt, output, maxLYG, ledger)
+        dirnames.append(dirname)
+    return dirnames, costs
+
+def NMB(dirnames, costs, price):
+    """The incremental net monetary benefit from re-costing both ledgers with 'price'"""
+    from Glb_ResourceLedger import Recost
+    costs = dict(costs)
+    costs[RESOURCE] = (1, price, 0)
+    rows = [Recost(dirname, costs, sample=False) for dirname in dirnames]
+    return WTP*(rows[1][:, 1].mean() - rows[0][:, 1].mean()) - (rows[1][:, 2].mean() - rows[0][:, 2].mean())
+
+def test_price_matches_recost(ledgers):
+    from Glb_PriceThreshold import PriceThreshold
+    dirnames, costs = ledgers
+    threshold = PriceThreshold(dirnames, costs, RESOURCE)
+    for price in (0.0, 100.0):
+        assert threshold.NMB(price, WTP) == pytest.approx(NMB(dirnames, costs, price), abs=1e-6)
+    price = threshold.Price(WTP)
+    assert numpy.isfinite(price)
+    assert NMB(dirnames, costs, price) == pytest.approx(0, abs=1e-6)
+    # A lower target is reached at a higher price
+    assert NMB(dirnames, costs, threshold.Price(WTP, -1000)) == pytest.approx(-1000)
+    # A resource that isn't used has no threshold
+    assert numpy.isnan(PriceThreshold(dirnames, costs, 'Experimental HPV Vaccination').Price(WTP))
+
+def test_bootstrap(ledgers):
+    from Glb_PriceThreshold import PriceThreshold
+    dirnames, costs = ledgers
+    threshold = PriceThreshold(dirnames, costs, RESOURCE)
+    price, low, high = threshold.Bootstrap(WTP, num_samples=200, seed=4)
+    assert price == threshold.Price(WTP)
+    assert low < price < high
+    assert threshold.Bootstrap(WTP, num_samples=200, seed=4) == (price, low, high)
+    # Each re-sample converges on its own
+    entities = numpy.random.default_rng(4).integers(0, N, (5, N))
+    prices = threshold.Price(WTP, entities=entities)
+    for row, p in zip(entities, prices):
+        assert threshold.NMB(p, WTP, row) == pytest.approx(0, abs=1e-6)
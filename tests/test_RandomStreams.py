@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Buffered draws and random number streams ('Glb_RandomStreams.py').
+
+A buffer must hand out the same numbers as drawing them one at a time from the generator, and
+emptying the buffers after re-seeding must repeat them. Common random numbers fill the buffers
+a few values at a time, but only until the buffers are next emptied: they must not change the
+buffer size of the rest of the run.
+
+With common random numbers, each stream of each entity must have its own numbers, which don't
+depend on the other streams, and entity 'i' must have the same characteristics and natural
+history in both arms.
+
+"""
+
+import pickle
+
+import numpy
+
+def Sizes():
+    """A buffer that records how many values it is asked for each time it is filled"""
+    from Glb_RandomStreams import Buffer
+    sizes = []
+    def Fill(n):
+        sizes.append(n)
+        return numpy.random.random_sample(n)
+    return Buffer(Fill), sizes
+
+def test_buffer_matches_generator(seed):
+    from Glb_RandomStreams import Uniform, BUFFER_SIZE
+    count = BUFFER_SIZE + 100
+    seed(21)
+    buffered = [Uniform() for x in range(count)]
+    seed(21)
+    assert buffered == numpy.random.random_sample(count).tolist()
+
+def test_reset_repeats_draws(seed):
+    from Glb_RandomStreams import Uniform, ResetBuffers
+    seed(22)
+    first = [Uniform() for x in range(10)]
+    numpy.random.seed(22)
+    # Without emptying the buffer, the values already drawn carry on
+    assert [Uniform() for x in range(10)] != first
+    numpy.random.seed(22)
+    ResetBuffers()
+    assert [Uniform() for x in range(10)] == first
+
+def test_stream_buffer_size(seed):
+    from Glb_RandomStreams import EntityStreams, ResetBuffers, BUFFER_SIZE, CRN_BUFFER_SIZE
+    seed(23)
+    buffer, sizes = Sizes()
+    streams = EntityStreams(7)
+    buffer.draw()
+    # Making the streams does not change how the buffers are filled
+    assert sizes == [BUFFER_SIZE]
+
+    streams.Start(0)
+    streams.Use('screen')
+    buffer.draw()
+    assert sizes[-1] == CRN_BUFFER_SIZE
+    for x in range(CRN_BUFFER_SIZE):
+        buffer.draw()
+    assert sizes[-2:] == [CRN_BUFFER_SIZE, CRN_BUFFER_SIZE]
+
+    # Emptying the buffers without the streams goes back to the usual size
+    ResetBuffers()
+    buffer.draw()
+    assert sizes[-1] == BUFFER_SIZE
+
+    # The size is kept by the streams, so it goes with them to the processes of a parallel run
+    copy = pickle.loads(pickle.dumps(streams))
+    copy.buffersize = 4
+    copy.Start(0)
+    copy.Use('screen')
+    buffer.draw()
+    assert sizes[-1] == 4
+    streams.Use('screen')
+    buffer.draw()
+    assert sizes[-1] == CRN_BUFFER_SIZE
+
+def test_common_random_numbers_off(inputs, seed):
+    from Glb_RandomStreams import BUFFER_SIZE, CRN_BUFFER_SIZE
+    from Glb_SimEntity import SimEntity
+    scenario = {'Prevention': 0, 'Screen': 0, 'Surg': 1, 'Chemo': 0, 'HPV': 0}
+    sim = SimEntity(inputs['estimates'], inputs['regcoeffs'], inputs['alt_estimates'], scenario)
+    seed(24)
+    buffer, sizes = Sizes()
+    sim.CommonRandomNumbers(3)
+    sim.Run(0, 0)
+    buffer.draw()
+    assert sizes == [CRN_BUFFER_SIZE]
+    sim.CommonRandomNumbers(None)
+    buffer.draw()
+    assert sizes == [CRN_BUFFER_SIZE, BUFFER_SIZE]
+
+def test_streams_are_separate():
+    import random
+    from Glb_RandomStreams import EntityStreams
+    streams = EntityStreams(11)
+    streams.Start(3)
+    streams.Use('nathist')
+    expected = numpy.random.random_sample(5).tolist(), random.random()
+
+    # Using another stream first, however much, doesn't change the natural history draws
+    streams.Start(3)
+    streams.Use('screen')
+    numpy.random.random_sample(100)
+    streams.Use('screen')
+    streams.Use('treatment')
+    streams.Use('nathist')
+    assert (numpy.random.random_sample(5).tolist(), random.random()) == expected
+
+    # ... but each use of a stream, each entity and each seed has its own numbers
+    streams.Use('nathist')
+    assert numpy.random.random_sample(5).tolist() != expected[0]
+    streams.Start(4)
+    streams.Use('nathist')
+    assert numpy.random.random_sample(5).tolist() != expected[0]
+    other = EntityStreams(12)
+    other.Start(3)
+    other.Use('nathist')
+    assert numpy.random.random_sample(5).tolist() != expected[0]
+    # The two generators don't give the same numbers
+    streams.Start(3)
+    streams.Use('nathist')
+    assert numpy.random.random_sample() != random.random()
+
+def test_common_random_numbers_across_arms(inputs, seed):
+    from Glb_SimEntity import SimEntity
+    # The arms differ in screening, so the entities' paths differ after their natural history
+    scenario = {'Prevention': 0, 'Screen': 1, 'Surg': 1, 'Chemo': 0, 'HPV': 0}
+    sim = SimEntity(inputs['estimates'], inputs['regcoeffs'], inputs['alt_estimates'], scenario)
+    sim.CommonRandomNumbers(2024)
+    arms = [[sim.Run(i, k) for i in range(300)] for k in (0, 1)]
+    different = 0
+    for naive, informed in zip(*arms):
+        assert (naive.startAge, naive.sex, naive.hasDentist, naive.natHist_deathAge) == \
+               (informed.startAge, informed.sex, informed.hasDentist, informed.natHist_deathAge)
+        assert naive.natHist == informed.natHist
+        different += list(naive.resources) != list(informed.resources)
+    assert different > 0
+
+    # Entity 'i' gets the same random numbers whatever was run before it, or whatever the
+    #   generators were seeded with
+    seed(31)
+    again = sim.Run(7, 1)
+    assert list(again.resources) == list(arms[1][7].resources)
+    assert list(again.utility) == list(arms[1][7].utility)
+    sim.CommonRandomNumbers(2025)
+    assert [sim.Run(i, 0).natHist for i in range(20)] != [x.natHist for x in arms[0][:20]]
+    sim.CommonRandomNumbers(None)
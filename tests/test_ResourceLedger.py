@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Working out the results of a saved run again ('Glb_ResourceLedger.py').
+
+'Recost', 'Requalify' and 'Rediscount' must give the same results from a run's ledger as running
+the model again with the new unit costs, utilities or discount rate. The runs use unit costs and
+utilities that are fixed values, so that changing them doesn't change the random numbers the
+rest of the model uses, and both runs follow the same paths.
+
+"""
+
+import pickle
+
+import numpy
+import pytest
+
+N = 3000
+SCENARIO = {'Prevention': 0, 'Screen': 1, 'Surg': 1, 'Chemo': 0, 'HPV': 0}
+
+def FixedCosts(CostDict, factor=1.0, discount=None):
+    """'CostDict' with every cost fixed at its mean (times 'factor')"""
+    costs = {}
+    for name, (ctype, mean, se) in CostDict.items():
+        if name == 'Discount':
+            costs[name] = (ctype, mean if discount is None else discount, se)
+        elif ctype in (1, 2):
+            costs[name] = (1, mean*factor, 0)
+        else:
+            costs[name] = (ctype, mean, se)
+    return costs
+
+def FixedEstimates(estimates, factor=1.0, discount=None):
+    """A copy of 'estimates' with every utility fixed at its mean (times 'factor')"""
+    from Glb_AnalyzeOutput import ExpectedValue
+    from Glb_Estimates import Estimate
+    fixed = pickle.loads(pickle.dumps(estimates))
+    for name in fixed.Names():
+        if name.startswith('Util_'):
+            setattr(fixed, name, Estimate(9, min(ExpectedValue(getattr(fixed, name))*factor, 1.0), 0))
+    if discount is not None:
+        fixed.DiscountRate = Estimate(9, discount, 0)
+    return fixed
+
+def RunLedger(inputs, seed, dirname, estimates, costs):
+    """Run the model with a ledger, and return its rows of [LYG, QALY, Cost, OPLflag]"""
+    from Glb_AnalyzeOutput import Analyze_Output
+    from Glb_ResourceLedger import LedgerWriter
+    from Glb_SimEntity import SimEntity, MaxLYG
+    sim = SimEntity(estimates, inputs['regcoeffs'], inputs['alt_estimates'], SCENARIO)
+    output = Analyze_Output(estimates, costs)
+    maxLYG = MaxLYG(estimates)
+    seed(15)
+    with LedgerWriter(str(dirname), estimates) as ledger:
+        rows = [sim.RunRow(i, 1, output, maxLYG, ledger) for i in range(N)]
+    return numpy.array(rows)
+
+@pytest.fixture(scope='module')
+def saved(inputs, seed, tmp_path_factory):
+    """The ledger and rows of one run"""
+    dirname = tmp_path_factory.mktemp('ledger')
+    estimates = FixedEstimates(inputs['estimates'])
+    costs = FixedCosts(inputs['CostDict'])
+    return dirname, estimates, costs, RunLedger(inputs, seed, dirname, estimates, costs)
+
+def test_ledger_holds_the_run(saved):
+    from Glb_ResourceLedger import ReadLedger
+    dirname, estimates, costs, rows = saved
+    numpy.testing.assert_array_equal(ReadLedger(str(dirname), 'rows'), rows)
+    assert len(ReadLedger(str(dirname), 'horizon')) == N
+    assert rows[:, 3].any() and not rows[:, 3].all()
+
+def test_recost_matches_rerun(inputs, seed, saved, tmp_path):
+    from Glb_ResourceLedger import Recost
+    dirname, estimates, costs, rows = saved
+    # The same costs give the run's results
+    same = Recost(str(dirname), costs)
+    numpy.testing.assert_array_equal(same[:, [0, 1, 3]], rows[:, [0, 1, 3]])
+    numpy.testing.assert_allclose(same[:, 2], rows[:, 2], rtol=1e-12)
+    # ... and so do the distributions of the costs, set to their means
+    numpy.testing.assert_allclose(Recost(str(dirname), inputs['CostDict'], sample=False)[:, 2],
+                                  rows[:, 2], rtol=1e-12)
+
+    newcosts = FixedCosts(inputs['CostDict'], 1.7, discount=0.05)
+    rerun = RunLedger(inputs, seed, tmp_path, estimates, newcosts)
+    numpy.testing.assert_array_equal(rerun[:, [0, 1, 3]], rows[:, [0, 1, 3]])
+    numpy.testing.assert_allclose(Recost(str(dirname), newcosts)[:, 2], rerun[:, 2], rtol=1e-12)
+    numpy.testing.assert_allclose(Recost(str(dirname), costs, discount=0.05)[:, 2]*1.7, rerun[:, 2],
+                                  rtol=1e-12)
+
+def test_requalify_matches_rerun(inputs, seed, saved, tmp_path):
+    from Glb_ResourceLedger import Requalify
+    dirname, estimates, costs, rows = saved
+    numpy.testing.assert_allclose(Requalify(str(dirname), estimates)[:, 1], rows[:, 1], rtol=1e-12)
+    numpy.testing.assert_allclose(Requalify(str(dirname), inputs['estimates'], sample=False)[:, 1],
+                                  rows[:, 1], rtol=1e-12)
+
+    newestimates = FixedEstimates(inputs['estimates'], 0.9)
+    rerun = RunLedger(inputs, seed, tmp_path, newestimates, costs)
+    numpy.testing.assert_array_equal(rerun[:, [0, 2, 3]], rows[:, [0, 2, 3]])
+    requalified = Requalify(str(dirname), newestimates)
+    numpy.testing.assert_array_equal(requalified[:, [0, 2, 3]], rows[:, [0, 2, 3]])
+    numpy.testing.assert_allclose(requalified[:, 1], rerun[:, 1], rtol=1e-12)
+
+def test_rediscount_matches_rerun(inputs, seed, saved, tmp_path):
+    from Glb_ResourceLedger import Rediscount
+    dirname, estimates, costs, rows = saved
+    # The run discounts the outcomes and the costs at different rates
+    runrate = (estimates.DiscountRate.mean, costs['Discount'][1])
+    results = Rediscount(str(dirname), estimates, costs, [runrate, 0.0, 0.03], [None])
+    numpy.testing.assert_allclose(results[(runrate, None)], rows, rtol=1e-12)
+
+    rerun = RunLedger(inputs, seed, tmp_path, FixedEstimates(inputs['estimates'], discount=0.03),
+                      FixedCosts(inputs['CostDict'], discount=0.03))
+    numpy.testing.assert_allclose(results[(0.03, None)], rerun, rtol=1e-12)
+    # Without discounting, the results are larger
+    assert (results[(0.0, None)][:, :3] >= rows[:, :3]).all()
+
+def test_rediscount_horizons(saved):
+    from Glb_ResourceLedger import Rediscount, ReadLedger, LedgerNames
+    from Glb_AnalyzeOutput import DailyDiscount, DiscountedYears
+    dirname, estimates, costs, rows = saved
+    runrate = (estimates.DiscountRate.mean, costs['Discount'][1])
+    results = Rediscount(str(dirname), estimates, costs, [runrate], [None, 5, 10, 20])
+    for horizon in (10, 20):
+        numpy.testing.assert_array_equal(results[(runrate, horizon)], results[(runrate, None)])
+
+    # Only the resources used in the first five years are counted
+    short = results[(runrate, 5)]
+    resources = ReadLedger(str(dirname), 'resources')
+    names = LedgerNames(str(dirname))['resources']
+    keep = resources[:, 2] <= 5*365
+    unit = numpy.array([costs[names[int(x)]][1] for x in resources[keep, 1]])
+    expected = numpy.bincount(resources[keep, 0].astype(int), weights=unit/(1 + runrate[1])**(resources[keep, 2]/365),
+                              minlength=N)
+    numpy.testing.assert_allclose(short[:, 2], expected, rtol=1e-12)
+    # ... and no one lives longer than the horizon
+    maxLYG = float(DiscountedYears(0, 5*365, DailyDiscount(estimates)))
+    assert (short[:, 0] <= maxLYG + 1e-12).all()
+    assert (short[:, 0] <= rows[:, 0] + 1e-9).all() and (short[:, 0] == maxLYG).mean() > 0.8
+
+def test_rediscount_sampling_flags(inputs, saved):
+    from Glb_ResourceLedger import Rediscount
+    dirname, estimates, costs, rows = saved
+    # With the cost distributions drawn and the utilities at their means, only the costs vary
+    numpy.random.seed(16)
+    first = Rediscount(str(dirname), inputs['estimates'], inputs['CostDict'], [0.05], [None],
+                       cost_sample=True, utility_sample=False)[(0.05, None)]
+    numpy.random.seed(17)
+    second = Rediscount(str(dirname), inputs['estimates'], inputs['CostDict'], [0.05], [None],
+                        cost_sample=True, utility_sample=False)[(0.05, None)]
+    numpy.testing.assert_array_equal(first[:, [0, 1, 3]], second[:, [0, 1, 3]])
+    assert (first[:, 2] != second[:, 2]).any()
+    # ... and the other way round
+    numpy.random.seed(16)
+    first = Rediscount(str(dirname), inputs['estimates'], inputs['CostDict'], [0.05], [None],
+                       cost_sample=False, utility_sample=True)[(0.05, None)]
+    numpy.random.seed(17)
+    second = Rediscount(str(dirname), inputs['estimates'], inputs['CostDict'], [0.05], [None],
+                        cost_sample=False, utility_sample=True)[(0.05, None)]
+    numpy.testing.assert_array_equal(first[:, [0, 2, 3]], second[:, [0, 2, 3]])
+    assert (first[:, 1] != second[:, 1]).any()
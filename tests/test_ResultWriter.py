@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming results to disk ('Glb_ResultWriter.py').
+
+The rows read back from a results file must be the rows that were added, in order, whatever the
+block size. A streamed run ('SimEntity.RunRow') must give the same output as keeping the
+entities in a list and working out their rows at the end ('OutputRows').
+
+"""
+
+import numpy
+import pytest
+
+@pytest.mark.parametrize('chunksize', [1, 7, 100])
+def test_round_trip(tmp_path, chunksize):
+    from Glb_ResultWriter import ResultWriter, ReadResults
+    rows = numpy.random.default_rng(6).random((30, 4))
+    filename = str(tmp_path/'results.dat')
+    with ResultWriter(filename, 4, chunksize) as writer:
+        for row in rows:
+            writer.Add(row)
+        # Rows waiting in the current block are not in the file yet
+        assert writer.rows == 30 - 30 % chunksize
+    assert writer.rows == 30
+    numpy.testing.assert_array_equal(ReadResults(filename), rows)
+
+def test_columns_and_empty_files(tmp_path):
+    from Glb_ResultWriter import ResultWriter, ReadResults
+    filename = str(tmp_path/'results.dat')
+    with ResultWriter(filename, 3, 4) as writer:
+        pass
+    assert ReadResults(filename, 3).shape == (0, 3)
+    with ResultWriter(filename, 3, 4) as writer:
+        for i in range(10):
+            writer.Add((i, 2*i, 3*i))
+    results = ReadResults(filename, 3)
+    assert results.shape == (10, 3)
+    assert results[:, 2].tolist() == [3.0*i for i in range(10)]
+
+def test_order_rows():
+    from Glb_ResultWriter import OrderRows
+    results = numpy.array([[0, 0, 0, 0], [1, 0, 0, 1], [2, 0, 0, 0], [3, 0, 0, 1]], dtype=float)
+    assert OrderRows(results)[:, 0].tolist() == [1, 3, 0, 2]
+
+def test_streamed_run_matches_entity_list(inputs, seed, tmp_path):
+    from test_ResourceLedger import FixedCosts, FixedEstimates, SCENARIO
+    from Glb_AnalyzeOutput import Analyze_Output
+    from Glb_ResultWriter import ResultWriter, ReadResults, OrderRows
+    from Glb_SimEntity import SimEntity, OutputRows, MaxLYG
+    # With fixed unit costs and utilities, working out an entity's results draws no random
+    #   numbers, so both runs follow the same paths
+    estimates = FixedEstimates(inputs['estimates'])
+    costs = FixedCosts(inputs['CostDict'])
+    sim = SimEntity(estimates, inputs['regcoeffs'], inputs['alt_estimates'], SCENARIO)
+    output = Analyze_Output(estimates, costs)
+    maxLYG = MaxLYG(estimates)
+    filename = str(tmp_path/'Scenario_Output_1.dat')
+
+    seed(29)
+    with ResultWriter(filename, chunksize=64) as writer:
+        for i in range(1000):
+            writer.Add(sim.RunRow(i, 1, output, maxLYG))
+    seed(29)
+    EntityList = [sim.Run(i, 1) for i in range(1000)]
+    OPL, NoOPL = OutputRows(EntityList, estimates, output, maxLYG)
+
+    numpy.testing.assert_allclose(OrderRows(ReadResults(filename)), numpy.vstack((OPL, NoOPL)), rtol=1e-12)
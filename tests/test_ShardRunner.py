@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Running the entity loop in worker processes ('Glb_ShardRunner.py').
+
+A run must depend only on its seed and its shards: the same seed must give the same output with
+any number of processes, and the same output as running the shards one after the other in this
+process.
+
+"""
+
+import numpy
+import pytest
+
+N = 2500
+SCENARIO = {'Prevention': 0, 'Screen': 1, 'Surg': 1, 'Chemo': 0, 'HPV': 0}
+
+@pytest.fixture(scope='module')
+def runner(inputs):
+    from Glb_ShardRunner import ShardRunner
+    return ShardRunner(inputs['estimates'], inputs['regcoeffs'], inputs['alt_estimates'],
+                       inputs['CostDict'], SCENARIO, processes=2)
+
+@pytest.fixture(scope='module')
+def output(runner):
+    return runner.Run(N, seed=1234)
+
+def test_layout(output):
+    assert output.shape == (N, 8)
+    for arm in (output[:, :4], output[:, 4:]):
+        # The entities that developed OPL come first
+        flag = arm[:, 3]
+        assert set(flag.tolist()) == {0.0, 1.0}
+        assert (numpy.diff(flag) <= 0).all()
+
+def test_same_seed_any_processes(runner, output):
+    runner.processes = 1
+    try:
+        numpy.testing.assert_array_equal(runner.Run(N, seed=1234), output)
+    finally:
+        runner.processes = 2
+    assert not numpy.array_equal(runner.Run(N, seed=1235), output)
+
+def test_matches_serial_shards(inputs, runner, output):
+    import Glb_ShardRunner
+    from Glb_ShardRunner import SHARD_SIZE, _InitWorker, _RunShard
+    # The shards the runner makes for this seed, run here one after the other
+    num_shards = -(-N//SHARD_SIZE)
+    bounds = numpy.linspace(0, N, num_shards + 1).astype(int)
+    streams = numpy.random.SeedSequence(1234).spawn(2*num_shards)
+    _InitWorker(*runner._inputs)
+    try:
+        Output = []
+        for a in range(2):
+            results = [_RunShard((a, bounds[s], bounds[s+1], streams[a*num_shards + s]))
+                       for s in range(num_shards)]
+            Output.append(numpy.vstack([x[0] for x in results] + [x[1] for x in results]))
+    finally:
+        Glb_ShardRunner._inputs.clear()
+    numpy.testing.assert_array_equal(numpy.hstack(Output), output)
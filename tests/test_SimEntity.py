@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+The entity loop ('Glb_SimEntity.py') against the Sequencer's original loop.
+
+'SequencerEntity' is the loop from the original 'Sequencer.py': the process objects are created
+again every time they are used, and the entity's clock is moved forward by 'CheckTime'. With the
+default scheduler ('checktime') and sampling scope ('event'), SimEntity must give exactly the same
+entities from the same random numbers. The event queue (scheduler = 'queue') gives different
+results, so it is only checked for running every entity to the end.
+
+"""
+
+import pytest
+
+N = 300
+
+SCENARIOS = [{'Prevention': 0, 'Screen': 0, 'Surg': 1, 'Chemo': 0, 'HPV': 0},
+             {'Prevention': 1, 'Screen': 1, 'Surg': 0, 'Chemo': 1, 'HPV': 0}]
+
+def SequencerEntity(estimates, regcoeffs, alt_estimates, scenario, Alt_Scenario):
+    from Glb_CreateEntity import Entity
+    from Glb_ApplyInit import ApplyInit
+    from SysP_Prevention import Prevention
+    from Alt_NatHist_OralCancer import NatHistOCa
+    from Glb_CheckTime import CheckTime
+    from SysP_ScreenAppt import ScreenAppt
+    from Alt_SysP_ScreenAppt import ScreenApptScen
+    from SysP_OPLmanage import OPLManage
+    from SysP_IncidentCancer import IncidentCancer
+    from SysP_Followup import Followup
+    from SysP_Terminal import Terminal
+
+    entity = Entity()
+    entity.Scenario_Prev = scenario['Prevention']
+    entity.Scenario_Screen = scenario['Screen']
+    entity.Scenario_Surg = scenario['Surg']
+    entity.Scenario_Chemo = scenario['Chemo']
+    entity.Scenario_HPV = scenario['HPV']
+    entity.scenario_desc = []
+    natHist = []
+    QALY = []
+
+    while True:
+        if entity.stateNum == 0.0:
+            ApplyInit(estimates).Process(entity)
+            if scenario['Prevention'] == 1:
+                Prevention(alt_estimates).Process(entity)
+            NatHistOCa(estimates, regcoeffs).Process(entity, natHist)
+            entity.OPLflag = 1 if entity.hasOPL == 1 else 0
+        if entity.stateNum == 0.1:
+            entity.altscen = Alt_Scenario
+            if entity.hasDentist == 1:
+                entity.stateNum = 1.0
+            elif entity.hasDentist == 0:
+                entity.stateNum = 1.8
+        CheckTime(entity, estimates, natHist, QALY)
+        if entity.stateNum == 1.0:
+            if scenario['Screen'] == 1:
+                ScreenApptScen(estimates, regcoeffs, alt_estimates).Process(entity)
+            else:
+                ScreenAppt(estimates, regcoeffs).Process(entity)
+        if entity.stateNum == 1.8:
+            entity.time_Sysp += 1000
+        if entity.stateNum == 2.0:
+            OPLManage(estimates, regcoeffs).Process(entity)
+        if entity.stateNum == 3.0:
+            if scenario['Surg'] == 1:
+                entity.RR_Surgery = alt_estimates.RR_Surgery.sample()
+            if scenario['Chemo'] == 1:
+                entity.RR_Chemo = alt_estimates.RR_Chemo.sample()
+            IncidentCancer(estimates, regcoeffs).Process(entity)
+        if entity.stateNum == 4.0:
+            Followup(estimates, regcoeffs).Process(entity)
+        if entity.stateNum == 4.8:
+            entity.allTime = entity.natHist_deathAge + 0.0001
+        if entity.stateNum == 5.0:
+            Terminal(estimates, regcoeffs).Process(entity)
+        if entity.stateNum == 100:
+            entity.utility.append(('Dead', 0, entity.allTime))
+            if entity.death_type == 1:
+                entity.horizon_censor = 0
+            if entity.horizon_censor == 1:
+                entity.death_type = 'Censored'
+            break
+        if entity.stateNum == 99:
+            break
+    return entity
+
+def Summary(entity):
+    return (list(entity.resources), list(entity.events), list(entity.utility), entity.stateNum,
+            entity.time_death, entity.death_type)
+
+@pytest.mark.parametrize('Alt_Scenario', [0, 1])
+@pytest.mark.parametrize('scenario', SCENARIOS)
+def test_checktime_matches_sequencer(inputs, seed, scenario, Alt_Scenario):
+    from Glb_SimEntity import SimEntity
+    estimates, regcoeffs, alt_estimates = inputs['estimates'], inputs['regcoeffs'], inputs['alt_estimates']
+    sim = SimEntity(estimates, regcoeffs, alt_estimates, scenario)
+
+    seed(3)
+    entities = [sim.Run(i, Alt_Scenario) for i in range(N)]
+    seed(3)
+    expected = [SequencerEntity(estimates, regcoeffs, alt_estimates, scenario, Alt_Scenario)
+                for i in range(N)]
+
+    for i, (entity, other) in enumerate(zip(entities, expected)):
+        assert Summary(entity) == Summary(other), i
+
+def test_queue_runs_every_entity(inputs):
+    from Glb_SimEntity import SimEntity
+    estimates, regcoeffs, alt_estimates = inputs['estimates'], inputs['regcoeffs'], inputs['alt_estimates']
+    checktime = SimEntity(estimates, regcoeffs, alt_estimates, SCENARIOS[0])
+    queue = SimEntity(estimates, regcoeffs, alt_estimates, SCENARIOS[0], scheduler='queue')
+    # With common random numbers, entity 'i' has the same characteristics and natural history
+    #   with either scheduler; the schedulers only differ after those are drawn
+    checktime.CommonRandomNumbers(4)
+    queue.CommonRandomNumbers(4)
+    entities = [queue.Run(i, 1) for i in range(N)]
+    expected = [checktime.Run(i, 1) for i in range(N)]
+
+    for entity, other in zip(entities, expected):
+        assert entity.stateNum == 100
+        assert (entity.startAge, entity.sex, entity.natHist_deathAge) == \
+               (other.startAge, other.sex, other.natHist_deathAge)
+        assert entity.natHist == other.natHist
+
+def test_unknown_scheduler(inputs):
+    from Glb_SimEntity import SimEntity
+    with pytest.raises(ValueError):
+        SimEntity(inputs['estimates'], inputs['regcoeffs'], inputs['alt_estimates'], SCENARIOS[0],
+                  scheduler='poll')
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Copy-on-write snapshots of a population ('Glb_Snapshot.py').
+
+The arms of a snapshot must be isolated from each other and from the frozen population: changes
+to a working copy of an entity are only kept once it is stored, and then only in its own arm.
+
+"""
+
+import pickle
+
+def Population(inputs, seed, count=40):
+    from Glb_SimEntity import SimEntity
+    scenario = {'Prevention': 1, 'Screen': 1, 'Surg': 0, 'Chemo': 1, 'HPV': 0}
+    sim = SimEntity(inputs['estimates'], inputs['regcoeffs'], inputs['alt_estimates'], scenario)
+    seed(32)
+    return [sim.Run(i, 0) for i in range(count)]
+
+def State(entity):
+    return (entity.stateNum, entity.currentState, list(entity.natHist), list(entity.resources),
+            list(entity.events), list(entity.utility), entity.startAge)
+
+def test_arms_are_isolated(inputs, seed):
+    from Glb_Snapshot import Snapshot
+    entities = Population(inputs, seed)
+    before = [State(x) for x in entities]
+    snapshot = Snapshot(entities)
+    arms = [snapshot.Arm(), snapshot.Arm()]
+    assert [State(x) for x in arms[0]] == before
+
+    # A working copy can be changed without changing anything else
+    entity = arms[0].Entity(3)
+    entity.stateNum = 4.0
+    entity.natHist.append(('OPL', 1, 100.0))
+    entity.resources.append(("Biopsy", 101.0))
+    entity.utility.append(("Detected OPL", 0.8, 102.0))
+    assert State(arms[0][3]) == before[3]
+    assert State(entities[3]) == before[3]
+
+    # Once it is stored, only its own arm has the changes
+    arms[0].Store(3, entity)
+    assert State(arms[0][3]) == State(entity)
+    assert State(arms[1][3]) == before[3]
+    assert State(snapshot.Entity(3)) == before[3]
+    assert [State(x) for x in entities] == before
+    assert arms[0].Column('stateNum')[3] == 4.0
+    assert arms[1].Column('stateNum') == [x[0] for x in before]
+
+    # The working copies of a stored entity are copies too
+    copy = arms[0][3]
+    copy.resources.append(("Biopsy", 200.0))
+    copy.natHist.append(('Cancer', 2, 300.0))
+    assert State(arms[0][3]) == State(entity)
+
+def test_overlay_only_holds_changes(inputs, seed):
+    from Glb_Snapshot import Snapshot
+    entities = Population(inputs, seed, 10)
+    arm = Snapshot(entities).Arm(range(2, 8))
+    assert len(arm) == 6
+    for j in range(len(arm)):
+        arm.Store(j, arm.Entity(j))
+    assert arm.overlay == {}
+
+    entity = arm.Entity(1)
+    entity.allTime = 1234.5
+    arm.Store(1, entity)
+    assert list(arm.overlay) == ['allTime']
+    # Storing the frozen value again undoes the change
+    entity.allTime = entities[3].allTime
+    arm.Store(1, entity)
+    assert arm.Column('allTime') == [x.allTime for x in entities[2:8]]
+
+def test_arms_saved_together(inputs, seed):
+    from Glb_Snapshot import Snapshot
+    entities = Population(inputs, seed, 10)
+    snapshot = Snapshot(entities)
+    arms = [snapshot.Arm(), snapshot.Arm()]
+    entity = arms[1].Entity(0)
+    entity.stateNum = 99
+    arms[1].Store(0, entity)
+
+    loaded = pickle.loads(pickle.dumps(arms))
+    # The frozen columns are saved once, and still shared by the arms
+    assert loaded[0].snapshot is loaded[1].snapshot
+    assert [State(x) for x in loaded[0]] == [State(x) for x in entities]
+    assert loaded[1][0].stateNum == 99
+    assert [State(x) for x in loaded[1]][1:] == [State(x) for x in entities][1:]